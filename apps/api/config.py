@@ -6,7 +6,7 @@ import json
 import os
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 SUPPORTED_PROVIDERS = {"openai", "gemini"}
 _DEFAULT_PROVIDER = os.getenv("AUTOEDA_DEFAULT_LLM_PROVIDER", "openai").lower()
@@ -186,10 +186,21 @@ def set_active_provider(provider: str) -> None:
     _save_llm_section(section)
 
 
+_RESET_HOOKS: List[Callable[[], None]] = []
+
+
+def register_reset_hook(fn: Callable[[], None]) -> None:
+    """Register a callback run by ``reset_cache`` (e.g. to drop pooled LLM clients)."""
+    if fn not in _RESET_HOOKS:
+        _RESET_HOOKS.append(fn)
+
+
 def reset_cache() -> None:
     get_openai_api_key.cache_clear()
     get_gemini_api_key.cache_clear()
     get_llm_provider.cache_clear()
+    for hook in list(_RESET_HOOKS):
+        hook()
 
 
 __all__ = [
@@ -201,5 +212,6 @@ __all__ = [
     "is_provider_configured",
     "set_llm_credentials",
     "set_openai_api_key",
+    "register_reset_hook",
     "reset_cache",
 ]
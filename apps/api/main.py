@@ -2,13 +2,18 @@ from datetime import datetime
 import time
 from typing import List, Literal, Optional, Dict, Any
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, status
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 from .services import tools
 from .services import evaluator
 from .services import orchestrator
+from .services import llm_cache
+from .services import report_store
 from .services import metrics
+from .services import prometheus
+from .services import profiling
 from .services import charts as chartsvc
 from .services import sandbox
 from . import config as app_config
@@ -17,6 +22,7 @@ from .services import charts_store
 from .services.security import redact
 import os as _os
 import json as _json
+import hmac as _hmac
 
 
 class Reference(BaseModel):
@@ -241,8 +247,8 @@ def log_event(event_name: str, properties: dict) -> None:
         **properties,
     }
     metrics.record_event(event_name, **properties)
+    # 永続化はバックグラウンドライター経由（リクエスト経路でファイル I/O しない）
     metrics.persist_event(payload)
-    print(payload)
 
 
 app = FastAPI(title="AutoEDA API")
@@ -255,6 +261,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+# ルート毎のリクエスト数/レイテンシ/in-flight を /metrics へ
+app.add_middleware(prometheus.PrometheusMiddleware)
 
 
 @app.get("/health")
@@ -262,13 +270,49 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics_exposition() -> Response:
+    """Prometheus text exposition of HTTP, charts queue and sandbox metrics."""
+    return Response(content=prometheus.render(), media_type=prometheus.CONTENT_TYPE)
+
+
+@app.get("/api/admin/profile", include_in_schema=False)
+def admin_profile(
+    seconds: float = 5.0,
+    interval_ms: float = 10.0,
+    idle: bool = False,
+    x_admin_token: Optional[str] = Header(default=None),
+) -> Response:
+    """Run a time-boxed sampling profiler over the live process; returns collapsed stacks.
+
+    - 無効時（AUTOEDA_ADMIN_PROFILER!=1）と AUTOEDA_ADMIN_TOKEN 未設定時は 404（トークン無しでは公開しない）。
+    - `X-Admin-Token` が AUTOEDA_ADMIN_TOKEN と一致しなければ 403。
+    - 同時実行は 1 本まで（409）。
+    """
+    token = _os.environ.get("AUTOEDA_ADMIN_TOKEN")
+    if _os.environ.get("AUTOEDA_ADMIN_PROFILER", "0") not in {"1", "true", "TRUE"} or not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not _hmac.compare_digest(token, x_admin_token or ""):
+        raise HTTPException(status_code=403, detail="invalid admin token")
+    try:
+        result = profiling.sample_stacks(seconds, interval_ms, include_idle=idle)
+    except profiling.ProfilerBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    headers = {"X-Profile-Samples": str(result["samples"]), "X-Profile-Duration-Sec": str(result["duration_sec"])}
+    return Response(content=result["collapsed"], media_type="text/plain; charset=utf-8", headers=headers)
+
+
 @app.get("/api/metrics/slo")
-def metrics_slo(dataset_id: Optional[str] = None) -> Dict[str, Any]:
+def metrics_slo(dataset_id: Optional[str] = None, window: Optional[str] = None) -> Dict[str, Any]:
     """Return in-memory SLO snapshot with simple threshold evaluation.
 
     - Optionally accepts `dataset_id` to scope Charts KPIs.
+    - Optionally accepts `window` (1m/5m/1h) to evaluate only recent events.
     """
-    snapshot = metrics.slo_snapshot()
+    try:
+        snapshot = metrics.slo_snapshot(window)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     thresholds = {
         "EDAReportGenerated": {"p95": 5000, "groundedness": 0.9},
         "ChartJobFinished": {"p95": 2000},
@@ -283,10 +327,10 @@ def metrics_slo(dataset_id: Optional[str] = None) -> Dict[str, Any]:
                 thresholds.update(env_cfg)
     except Exception:
         pass
-    evaluation = metrics.detect_violations(thresholds)
+    evaluation = metrics.detect_violations(thresholds, window)
     # H 系 KPI 要約（served%/avg_wait）— 最近 N 件から（必要に応じ dataset_id でスコープ）
     charts = metrics.charts_summary(limit=12, dataset_id=dataset_id)
-    return {"snapshot": snapshot, "evaluation": evaluation, "thresholds": thresholds, "charts_summary": charts, "dataset_id": dataset_id}
+    return {"snapshot": snapshot, "evaluation": evaluation, "thresholds": thresholds, "charts_summary": charts, "dataset_id": dataset_id, "window": window}
 
 
 @app.get("/api/metrics/charts/snapshots")
@@ -334,11 +378,16 @@ def datasets_list() -> List[dict]:
 
 
 @app.post("/api/eda", response_model=EDAReport)
-def eda(req: EDARequest) -> EDAReport:
+def eda(req: EDARequest, response: Response, x_debug_timing: Optional[str] = Header(default=None)) -> EDAReport:
     t0 = time.perf_counter()
-    report_payload, evaluation = orchestrator.generate_eda_report(req.dataset_id, req.sample_ratio)
-    report = EDAReport(**report_payload)
+    with profiling.record("eda") as timing_root:
+        report_payload, evaluation = orchestrator.generate_eda_report(req.dataset_id, req.sample_ratio)
+        report = EDAReport(**report_payload)
     dur = int((time.perf_counter() - t0) * 1000)
+    timing = timing_root.to_dict()
+    # デバッグ用: `X-Debug-Timing: 1` もしくは AUTOEDA_DEBUG_TIMING=1 で Server-Timing を返す
+    if (x_debug_timing or _os.environ.get("AUTOEDA_DEBUG_TIMING", "0")) in {"1", "true", "TRUE"}:
+        response.headers["Server-Timing"] = profiling.server_timing(timing)
     log_event(
         "EDAReportGenerated",
         {
@@ -350,7 +399,10 @@ def eda(req: EDARequest) -> EDAReport:
             "llm_latency_ms": evaluation.get("llm_latency_ms"),
             "llm_error": evaluation.get("llm_error"),
             "fallback_applied": evaluation.get("fallback_applied"),
+            "llm_cache": evaluation.get("llm_cache"),
+            "prompt_tokens": evaluation.get("prompt_tokens"),
             "duration_ms": dur,
+            "timing": timing,
         },
     )
     return report
@@ -383,6 +435,43 @@ def qna(req: QnARequest) -> QnAResponse:
     return QnAResponse(answers=answers, references=refs)
 
 
+@app.post("/api/qna/stream")
+def qna_stream(req: QnARequest) -> StreamingResponse:
+    """NDJSON で回答を逐次返す（1 行 1 イベント: delta / answer / done）。"""
+
+    def events():
+        t0 = time.perf_counter()
+        first_answer_ms: Optional[int] = None
+        coverage: Optional[float] = None
+        done: Dict[str, Any] = {}
+        for event in orchestrator.stream_qna(req.dataset_id, req.question):
+            if event["type"] == "answer":
+                try:
+                    event = {"type": "answer", "answer": Answer(**event["answer"]).dict()}
+                except Exception:
+                    continue  # スキーマ外の回答は送らない
+                if first_answer_ms is None:
+                    first_answer_ms = int((time.perf_counter() - t0) * 1000)
+                    coverage = event["answer"]["coverage"]
+            elif event["type"] == "done":
+                done = event
+            yield _json.dumps(event, ensure_ascii=False) + "\n"
+        log_event(
+            "EDAQueryAnswered",
+            {
+                "dataset_id": req.dataset_id,
+                "coverage": coverage or 0.0,
+                "duration_ms": int((time.perf_counter() - t0) * 1000),
+                "first_answer_ms": first_answer_ms,
+                "streamed": True,
+                "fallback_applied": done.get("fallback"),
+                "llm_cache": done.get("llm_cache"),
+            },
+        )
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @app.post("/api/followup", response_model=QnAResponse)
 def followup(req: FollowupRequest) -> QnAResponse:
     t0 = time.perf_counter()
@@ -423,6 +512,9 @@ def pii_scan(req: PIIScanRequest) -> PIIScanResult:
 @app.post("/api/pii/apply", response_model=PIIApplyResult)
 def pii_apply(req: PIIApplyRequest) -> PIIApplyResult:
     result = tools.apply_pii_policy(req.dataset_id, req.mask_policy, req.columns)
+    # ポリシー変更後の応答・レポートを古いキャッシュで返さない
+    llm_cache.invalidate_dataset(req.dataset_id)
+    report_store.invalidate(req.dataset_id)
     log_event(
         "PIIPolicyApplied",
         {
@@ -445,6 +537,8 @@ def leakage_scan(req: LeakageScanRequest) -> LeakageScanResult:
 @app.post("/api/leakage/resolve", response_model=LeakageScanResult)
 def leakage_resolve(req: LeakageResolveRequest) -> LeakageScanResult:
     updated = tools.resolve_leakage(req.dataset_id, req.action, req.columns)
+    llm_cache.invalidate_dataset(req.dataset_id)
+    report_store.invalidate(req.dataset_id)
     res = LeakageScanResult(**updated)
     log_event(
         "LeakageResolutionApplied",
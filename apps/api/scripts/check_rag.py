@@ -1,21 +1,36 @@
 #!/usr/bin/env python3
-"""RAG ゴールデンセット検証スクリプト."""
+"""RAG ゴールデンセット検証スクリプト.
+
+- 既定: ゴールデンセットを並列（``--workers``）に検索し、カバレッジ（漏れがあれば非 0 終了）に加えて
+  クエリ毎の検索レイテンシ p50/p95/p99、recall@k、MRR を出力する
+- ``--bench``: 合成コーパス（``--bench-docs`` 件）で各バックエンドの索引構築時間・常駐メモリ増分・
+  クエリスループット・自己ヒット率（クエリ元の文書が top-k に入る割合）を計測する。
+  バックエンドは ``bm25``（インメモリ）/ ``local``（ローカル埋め込み + IVF）/ ``chroma``
+  （Chroma の HNSW。OpenAI を呼ばないようローカル埋め込みを使う、chromadb がある場合のみ）
+"""
 
 from __future__ import annotations
 
+import argparse
+import gc
 import json
 import os
+import random
 import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, List, Optional
 
 ROOT = Path(__file__).resolve().parents[3]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from apps.api.services import rag  # noqa: E402
+from apps.api.services import local_embeddings, metrics, rag  # noqa: E402
 
 OUTPUT_ENV = "AUTOEDA_RAG_OUTPUT"
+BENCH_BACKENDS = ("bm25", "local", "chroma")
 
 
 def load_queries(path: Path) -> List[Dict[str, Any]]:
@@ -24,17 +39,205 @@ def load_queries(path: Path) -> List[Dict[str, Any]]:
     return json.loads(path.read_text(encoding="utf-8"))
 
 
-def run_checks(path: Path) -> Dict[str, Any]:
+def latency_summary(latencies_ms: List[float]) -> Dict[str, Any]:
+    hist = metrics.LogHistogram()
+    for ms in latencies_ms:
+        hist.add(ms)
+    if not hist.count:
+        return {"count": 0}
+    return {
+        "count": hist.count,
+        "p50": round(hist.quantile(0.5), 3),
+        "p95": round(hist.quantile(0.95), 3),
+        "p99": round(hist.quantile(0.99), 3),
+        "max": round(hist.max, 3),
+    }
+
+
+def _score_query(spec: Dict[str, Any], top_k: int) -> Dict[str, Any]:
+    expected = {src for src in spec.get("expects", []) if src}
+    start = time.perf_counter()
+    results = rag.retrieve(spec.get("query", ""), top_k=top_k)
+    latency_ms = (time.perf_counter() - start) * 1000
+    sources = [(res.get("metadata") or {}).get("source") for res in results]
+    found = {src for src in sources if src}
+    rank = next((i + 1 for i, src in enumerate(sources) if src in expected), None)
+    return {
+        "id": str(spec.get("id") or spec.get("query")),
+        "matched": sorted(expected & found),
+        "found": sorted(found),
+        "recall": round(len(expected & found) / len(expected), 4) if expected else None,
+        "rank": rank,
+        "latency_ms": round(latency_ms, 3),
+    }
+
+
+def evaluate(queries: List[Dict[str, Any]], *, top_k: int = 5, workers: int = 4) -> Dict[str, Any]:
+    """Run the golden queries concurrently; coverage report (``missing``/``coverage``) + retrieval metrics."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        rows = list(pool.map(lambda spec: _score_query(spec, top_k), queries))
+    missing = [row["id"] for row, spec in zip(rows, queries) if spec.get("expects") and not row["matched"]]
+    scored = [row for row in rows if row["recall"] is not None]
+    return {
+        "missing": missing,
+        "coverage": {row["id"]: {"matched": row["matched"], "found": row["found"]} for row in rows},
+        "metrics": {
+            "top_k": top_k,
+            "workers": workers,
+            f"recall@{top_k}": round(sum(r["recall"] for r in scored) / len(scored), 4) if scored else None,
+            "mrr": round(sum(1.0 / r["rank"] for r in scored if r["rank"]) / len(scored), 4) if scored else None,
+            "latency_ms": latency_summary([row["latency_ms"] for row in rows]),
+            "per_query": {row["id"]: {k: row[k] for k in ("recall", "rank", "latency_ms")} for row in rows},
+        },
+    }
+
+
+def run_checks(path: Path, *, top_k: int = 5, workers: int = 4) -> Dict[str, Any]:
     rag.load_default_corpus()
     queries = load_queries(path)
-    report = rag.evaluate_golden_queries(queries)
+    report = evaluate(queries, top_k=top_k, workers=workers)
     return {
         "queries": queries,
-        "report": report,
+        "report": {"missing": report["missing"], "coverage": report["coverage"]},
+        "metrics": report["metrics"],
         "golden_path": str(path),
     }
 
 
+# --- 合成コーパスでのベンチマーク -----------------------------------------------
+
+_BENCH_TERMS = ["欠損", "外れ値", "相関", "分布", "品質", "閾値", "整合性", "リーク", "マスキング", "引用", "被覆率"]
+
+
+def synthetic_corpus(n_docs: int, n_queries: int, *, seed: int = 7) -> tuple:
+    """(docs, queries) — クエリは対象文書から語を抜き出したもので、``target`` に元文書の ID を持つ。"""
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(max(100, n_docs // 5))] + _BENCH_TERMS
+    docs = []
+    for i in range(n_docs):
+        words = [rng.choice(vocab) for _ in range(40)]
+        docs.append({"id": f"syn{i}", "text": " ".join(words), "metadata": {"source": f"syn{i % 50}.md"}})
+    queries = []
+    for _ in range(n_queries):
+        doc = docs[rng.randrange(n_docs)]
+        words = doc["text"].split()
+        queries.append({"query": " ".join(rng.sample(words, 4)), "target": doc["id"]})
+    return docs, queries
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size (Linux ``/proc``); None where unavailable."""
+    try:
+        resident = int(Path("/proc/self/statm").read_text().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def _chroma_search(docs: List[Dict[str, Any]], workdir: Path) -> Callable[[str, int], List[str]]:
+    if rag.chromadb is None or not local_embeddings.available():
+        raise RuntimeError("chromadb / numpy not installed")
+    from chromadb.config import Settings  # type: ignore
+
+    client = rag.chromadb.PersistentClient(path=str(workdir / "chroma"), settings=Settings(anonymized_telemetry=False))
+    collection = client.create_collection(name="bench", metadata={"hnsw:space": "ip"})
+    step = 2000
+    for start in range(0, len(docs), step):
+        batch = docs[start:start + step]
+        collection.add(
+            ids=[d["id"] for d in batch],
+            documents=[d["text"] for d in batch],
+            metadatas=[d["metadata"] for d in batch],
+            embeddings=local_embeddings.embed([d["text"] for d in batch]).tolist(),
+        )
+
+    def search(query: str, top_k: int) -> List[str]:
+        res = collection.query(query_embeddings=local_embeddings.embed([query]).tolist(), n_results=top_k)
+        return list(res["ids"][0])
+
+    return search
+
+
+def _rag_search(backend: str, docs: List[Dict[str, Any]], workdir: Path) -> Callable[[str, int], List[str]]:
+    os.environ["AUTOEDA_RAG_BACKEND"] = backend
+    os.environ["AUTOEDA_RAG_LOCAL_DIR"] = str(workdir / "local")
+    os.environ["AUTOEDA_RAG_CACHE"] = "0"  # 計測対象は索引そのもの
+    os.environ["AUTOEDA_EMBEDDING_CACHE"] = "0"
+    rag._in_memory_store = []
+    rag._local_store = None
+    rag.ingest(docs)
+
+    def search(query: str, top_k: int) -> List[str]:
+        return [doc["id"] for doc in rag.retrieve(query, top_k=top_k)]
+
+    return search
+
+
+def bench_backend(
+    backend: str,
+    docs: List[Dict[str, Any]],
+    queries: List[Dict[str, Any]],
+    *,
+    top_k: int = 5,
+    workers: int = 4,
+) -> Dict[str, Any]:
+    saved_env = {k: os.environ.get(k) for k in ("AUTOEDA_RAG_BACKEND", "AUTOEDA_RAG_LOCAL_DIR", "AUTOEDA_RAG_CACHE", "AUTOEDA_EMBEDDING_CACHE")}
+    saved_store, saved_local = rag._in_memory_store, rag._local_store
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            gc.collect()
+            rss_before = _rss_mb()
+            start = time.perf_counter()
+            if backend == "chroma":
+                search = _chroma_search(docs, Path(tmp))
+            else:
+                search = _rag_search(backend, docs, Path(tmp))
+            search(queries[0]["query"], top_k)  # 遅延構築（BM25 正規化項 / IVF 学習）まで含める
+            build_sec = time.perf_counter() - start
+            gc.collect()
+            rss_after = _rss_mb()
+
+            def timed(spec: Dict[str, Any]) -> tuple:
+                t0 = time.perf_counter()
+                ids = search(spec["query"], top_k)
+                return (time.perf_counter() - t0) * 1000, spec["target"] in ids
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                rows = list(pool.map(timed, queries))
+            elapsed = time.perf_counter() - start
+    except Exception as exc:
+        return {"backend": backend, "error": str(exc)}
+    finally:
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        rag._in_memory_store, rag._local_store = saved_store, saved_local
+    return {
+        "backend": backend,
+        "docs": len(docs),
+        "queries": len(queries),
+        "build_sec": round(build_sec, 3),
+        # 索引を保持したままの常駐メモリ増分（概算。先行バックエンドの解放分で小さく出ることがある）
+        "memory_mb": round(rss_after - rss_before, 2) if rss_before is not None and rss_after is not None else None,
+        "qps": round(len(queries) / elapsed, 1) if elapsed else None,
+        "latency_ms": latency_summary([ms for ms, _ in rows]),
+        f"self_hit@{top_k}": round(sum(1 for _, hit in rows if hit) / len(rows), 4) if rows else None,
+    }
+
+
+def run_benchmark(
+    backends: List[str], *, n_docs: int, n_queries: int, top_k: int = 5, workers: int = 4
+) -> Dict[str, Any]:
+    docs, queries = synthetic_corpus(n_docs, max(1, n_queries))
+    return {
+        "benchmark": {"docs": n_docs, "queries": len(queries), "top_k": top_k, "workers": workers},
+        "backends": [bench_backend(b, docs, queries, top_k=top_k, workers=workers) for b in backends],
+    }
+
+
 def default_golden_path() -> Path:
     return Path(os.getenv("AUTOEDA_RAG_GOLDEN_PATH", "docs/rag_golden.json"))
 
@@ -48,9 +251,27 @@ def write_output(payload: Dict[str, Any], destination: str | None) -> None:
 
 
 def main(argv: List[str] | None = None) -> int:
-    argv = argv or sys.argv[1:]
-    target = Path(argv[0]) if argv else default_golden_path()
-    result = run_checks(target)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("golden", nargs="?", help="ゴールデンセット JSON（既定: AUTOEDA_RAG_GOLDEN_PATH）")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4, help="並列に投げるクエリ数（既定 4）")
+    parser.add_argument("--bench", action="store_true", help="合成コーパスでバックエンド別ベンチマークを行う")
+    parser.add_argument("--bench-docs", type=int, default=20000)
+    parser.add_argument("--bench-queries", type=int, default=500)
+    parser.add_argument("--backends", default=",".join(BENCH_BACKENDS), help="カンマ区切り（bm25,local,chroma）")
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+
+    if args.bench:
+        backends = [b.strip() for b in args.backends.split(",") if b.strip() in BENCH_BACKENDS]
+        result = run_benchmark(
+            backends, n_docs=args.bench_docs, n_queries=args.bench_queries, top_k=args.top_k, workers=args.workers
+        )
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        write_output(result, os.getenv(OUTPUT_ENV))
+        return 0
+
+    target = Path(args.golden) if args.golden else default_golden_path()
+    result = run_checks(target, top_k=args.top_k, workers=args.workers)
     print(json.dumps(result, ensure_ascii=False, indent=2))
     write_output(result, os.getenv(OUTPUT_ENV))
     missing = result["report"].get("missing", [])
@@ -12,7 +12,7 @@ ROOT = Path(__file__).resolve().parents[3]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from apps.api.services import metrics
+from apps.api.services import metrics, profiling
 
 # 既定閾値（docs/requirements.md A1/B1に準拠）
 SLO_THRESHOLDS = {
@@ -20,18 +20,74 @@ SLO_THRESHOLDS = {
     "EDAQueryAnswered": {"p95": 4_000, "groundedness": 0.8},
 }
 
+# 段階別 p95 予算（ms）。イベントの `timing` ツリーを平坦化して評価する。
+# AUTOEDA_SLO_STAGE_BUDGETS='{"EDAReportGenerated": {"llm.invoke_agent": 5000}}' で上書き/追加。
+STAGE_BUDGETS_MS = {
+    "EDAReportGenerated": {
+        "profile": 4_000,
+        "profile.read_csv": 2_000,
+        "profile.datetime_scan": 1_500,
+        "pii_scan": 1_000,
+        "leakage_scan": 1_000,
+        "rag.retrieve_context": 1_000,
+        "llm.invoke_agent": 8_000,
+        "finalize": 500,
+    },
+}
+
 OUTPUT_ENV = "AUTOEDA_SLO_OUTPUT"
+STAGE_BUDGETS_ENV = "AUTOEDA_SLO_STAGE_BUDGETS"
 
 
 def load_events(path: Path) -> list[dict]:
+    # ローテーション済みセグメント（events.jsonl.<timestamp>-<seq>）も古い順に読む
     events = []
-    if not path.exists():
+    if not metrics.event_log_segments(path):
         return events
     for record in metrics.load_event_log(path):
         events.append(record)
     return events
 
 
+def stage_budgets() -> dict:
+    budgets = {name: dict(stages) for name, stages in STAGE_BUDGETS_MS.items()}
+    raw = os.getenv(STAGE_BUDGETS_ENV)
+    if raw:
+        try:
+            override = json.loads(raw)
+        except json.JSONDecodeError:
+            override = {}
+        for name, stages in (override if isinstance(override, dict) else {}).items():
+            if isinstance(stages, dict):
+                budgets.setdefault(name, {}).update(stages)
+    return budgets
+
+
+def evaluate_stages(events: list[dict], budgets: dict) -> dict:
+    """{event: {stage: {"count", "p95", "budget", "exceeded"}}}（timing の無いイベントは対象外）。"""
+    hists: dict = {}
+    for event in events:
+        name = event.get("event_name")
+        if name not in budgets or not isinstance(event.get("timing"), dict):
+            continue
+        for stage, ms in profiling.flatten_timing(event["timing"]).items():
+            hists.setdefault(name, {}).setdefault(stage, metrics.LogHistogram()).add(ms)
+    result: dict = {}
+    for name, stages in budgets.items():
+        for stage, budget in stages.items():
+            hist = hists.get(name, {}).get(stage)
+            if hist is None or hist.count == 0:
+                continue
+            p95 = round(hist.quantile(0.95), 2)
+            result.setdefault(name, {})[stage] = {
+                "count": hist.count,
+                "p95": p95,
+                "budget": budget,
+                "exceeded": p95 > float(budget),
+            }
+    return result
+
+
 def write_output(payload: dict, destination: str | None) -> None:
     if not destination:
         return
@@ -45,12 +101,18 @@ def main(argv: list[str] | None = None) -> int:
     target = Path(argv[0]) if argv else metrics.get_event_log_path()
     events = load_events(target)
     metrics.bootstrap_from_events(events)
+    # compact_events.py で時間別集計へ畳み込まれた期間も全期間の p95 / groundedness に含める
+    metrics.merge_hourly_aggregates(metrics.load_hourly_aggregates(target))
     violations = metrics.detect_violations(SLO_THRESHOLDS)
+    budgets = stage_budgets()
+    stages = evaluate_stages(events, budgets)
 
     output = {
         "slo_thresholds": SLO_THRESHOLDS,
         "snapshot": metrics.slo_snapshot(),
         "violations": violations,
+        "stage_budgets": budgets,
+        "stage_violations": stages,
         "event_log": str(target),
     }
     print(json.dumps(output, ensure_ascii=False, indent=2))
@@ -58,6 +120,8 @@ def main(argv: list[str] | None = None) -> int:
 
     has_violation = any(
         any(result.values()) for result in violations.values()
+    ) or any(
+        stage["exceeded"] for per_event in stages.values() for stage in per_event.values()
     )
     return 1 if has_violation else 0
 
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""イベントログ圧縮: ローテーション済みの古いセグメントを時間別集計へまとめるスクリプト。"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[3]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from apps.api.services import metrics
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("event_log", nargs="?", help="events.jsonl のパス（既定: AUTOEDA_METRICS_LOG）")
+    parser.add_argument("--older-than-hours", type=float, default=24.0, help="この時間より古いセグメントを圧縮（既定 24）")
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+
+    target = Path(args.event_log) if args.event_log else metrics.get_event_log_path()
+    result = metrics.compact_segments(target, older_than_sec=int(args.older_than_hours * 3600))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
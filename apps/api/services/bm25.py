@@ -0,0 +1,90 @@
+"""In-process BM25 inverted index for the RAG in-memory fallback.
+
+- トークナイザ: NFKC + 小文字化の上で、英数字（``0.95`` のような小数を含む）は語単位、
+  日本語などの非 ASCII 連続部分は文字 bi-gram（1 文字だけの部分は uni-gram）。分かち書き辞書なしで
+  「整合性」「引用被覆率」のような複合語の部分一致を拾える。
+- ``add`` は postings へ追記するだけ（増分更新）。文書長の正規化項は件数が変わった後の最初の
+  ``search`` で 1 度だけ再計算する。
+- ``search`` はクエリ語の postings だけを走査し、上位 k 件を ``heapq.nlargest`` で取る。開始時点の
+  文書数（正規化項の長さ）に固定するので、ロック無しで ``add`` と並行に呼んでも壊れない。
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Tuple
+
+_ASCII_RE = re.compile(r"[a-z0-9_]+(?:\.[0-9]+)*")
+_CJK_RE = re.compile(r"[^\x00-\x7f\s　-〿！-／：-＠]+")
+
+
+def tokenize(text: str) -> List[str]:
+    norm = unicodedata.normalize("NFKC", text or "").lower()
+    tokens = _ASCII_RE.findall(norm)
+    for run in _CJK_RE.findall(norm):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25Index:
+    __slots__ = ("k1", "b", "_postings", "_doc_len", "_total_len", "_norm")
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._doc_len: List[int] = []
+        self._total_len = 0
+        self._norm: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def add(self, text: str) -> int:
+        """Index ``text`` and return its document number (0-based, insertion order)."""
+        doc = len(self._doc_len)
+        tf = Counter(tokenize(text))
+        for term, n in tf.items():
+            self._postings.setdefault(term, []).append((doc, n))
+        length = sum(tf.values())
+        self._doc_len.append(length)
+        self._total_len += length
+        return doc
+
+    def _norms(self) -> List[float]:
+        if len(self._norm) != len(self._doc_len):
+            avgdl = (self._total_len / len(self._doc_len)) or 1.0
+            k1, b = self.k1, self.b
+            self._norm = [k1 * (1.0 - b + b * dl / avgdl) for dl in self._doc_len]
+        return self._norm
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """Return ``[(doc, score), ...]`` for docs matching at least one query term, best first."""
+        if not self._doc_len or top_k <= 0:
+            return []
+        norms = self._norms()
+        # rag はロック外で検索するため、並行 add で増えた文書は無視してこの時点の件数に固定する
+        n_docs = len(norms)
+        k1p1 = self.k1 + 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            while df and postings[df - 1][0] >= n_docs:  # postings は doc 昇順
+                df -= 1
+            if not df:
+                continue
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc, tf in itertools.islice(postings, df):
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * k1p1 / (tf + norms[doc])
+        # 同点は挿入順（doc の小さい方）を優先
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
@@ -0,0 +1,399 @@
+"""Data-bound chart rendering with pixel-budgeted downsampling.
+
+標準ライブラリのみ（json/csv/math/mmap/typing）で実装する。サンドボックス内の生成コードへ
+ソースをそのまま埋め込むため、``from __future__`` やパッケージ相対 import は使わないこと。
+
+- line: LTTB（大規模系列は min-max で前処理してから LTTB）
+- bar: 数値列はビン集計（ヒストグラム）、カテゴリ列は上位カテゴリの件数
+- scatter: 予算内は生の点、超過時は 2-D ビニング（rect + count）
+
+入力は CSV（``read_columns``）か、ホストが用意した読み取り専用カラムナスナップショット
+（``read_snapshot``、形式は ``colstore`` を参照）のいずれか。
+"""
+
+import csv
+import json
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_WIDTH_PX = 360
+DEFAULT_HEIGHT_PX = 240
+_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+
+Point = Tuple[float, float]
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        f = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(f) or math.isinf(f):
+        return None
+    return f
+
+
+def read_columns(csv_path: str, columns: Optional[Sequence[str]] = None, *, need: int = 2, max_rows: Optional[int] = None) -> Dict[str, List[str]]:
+    """Stream the CSV once and keep only the requested columns (raw strings).
+
+    columns 未指定時は先頭 50 行のサンプルから数値列を最大 ``need`` 列選ぶ（なければ先頭列）。
+    """
+    with open(csv_path, "r", encoding="utf-8", errors="ignore", newline="") as f:
+        rdr = csv.reader(f)
+        header = next(rdr, None) or []
+        head_rows: List[List[str]] = []
+        for row in rdr:
+            head_rows.append(row)
+            if len(head_rows) >= 50:
+                break
+        wanted = [c for c in (columns or []) if c in header]
+        if not wanted:
+            numeric = []
+            for j, name in enumerate(header):
+                cells = [r[j] for r in head_rows if j < len(r) and r[j] != ""]
+                if cells and all(_to_float(c) is not None for c in cells):
+                    numeric.append(name)
+            wanted = (numeric or header[:1])[:need]
+        idx = [header.index(c) for c in wanted]
+        out: Dict[str, List[str]] = {c: [] for c in wanted}
+        n = 0
+        for row in _chain(head_rows, rdr):
+            if max_rows is not None and n >= max_rows:
+                break
+            n += 1
+            for c, j in zip(wanted, idx):
+                out[c].append(row[j] if j < len(row) else "")
+    return out
+
+
+class _StrColumn:
+    """Lazy UTF-8 string column backed by a snapshot mmap (int64 offsets + blob)."""
+
+    def __init__(self, buf: memoryview, offsets_at: int, data_at: int, n: int) -> None:
+        self._offs = buf[offsets_at: offsets_at + 8 * (n + 1)].cast("q")
+        self._data = buf[data_at:]
+        self._n = n
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: Any) -> Any:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return bytes(self._data[self._offs[i]: self._offs[i + 1]]).decode("utf-8")
+
+
+def read_snapshot(path: str, columns: Optional[Sequence[str]] = None, *, need: int = 2, max_rows: Optional[int] = None) -> Dict[str, Sequence[Any]]:
+    """Map a columnar snapshot read-only; numeric columns are zero-copy ``memoryview('d')``.
+
+    欠損値は NaN。columns 未指定時は先頭の数値列を最大 ``need`` 列選ぶ。
+    """
+    import mmap
+
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:8] != b"AEDSNAP1":
+        raise ValueError("not a dataset snapshot")
+    head_len = int.from_bytes(mm[8:12], "little")
+    header = json.loads(mm[12: 12 + head_len].decode("utf-8"))
+    n = header["rows"] if max_rows is None else min(header["rows"], max_rows)
+    metas = {c["name"]: c for c in header["columns"]}
+    wanted = [c for c in (columns or []) if c in metas]
+    if not wanted:
+        numeric = [c["name"] for c in header["columns"] if c["type"] == "f64"]
+        wanted = (numeric or [c["name"] for c in header["columns"]][:1])[:need]
+    buf = memoryview(mm)
+    out: Dict[str, Sequence[Any]] = {}
+    for name in wanted:
+        m = metas[name]
+        if m["type"] == "f64":
+            out[name] = buf[m["offset"]: m["offset"] + 8 * n].cast("d")
+        else:
+            out[name] = _StrColumn(buf, m["offset"], m["data_offset"], n)
+    return out
+
+
+def _chain(first: List[List[str]], rest: Any) -> Any:
+    for row in first:
+        yield row
+    for row in rest:
+        yield row
+
+
+def min_max_downsample(points: Sequence[Point], n_buckets: int) -> List[Point]:
+    """Keep the min and max y of each x-ordered bucket (O(n), preserves spikes)."""
+    n = len(points)
+    if n_buckets <= 0 or n <= n_buckets * 2:
+        return list(points)
+    size = n / float(n_buckets)
+    out: List[Point] = []
+    for b in range(n_buckets):
+        lo, hi = int(b * size), min(n, int((b + 1) * size))
+        if lo >= hi:
+            continue
+        i_min = i_max = lo
+        for i in range(lo + 1, hi):
+            y = points[i][1]
+            if y < points[i_min][1]:
+                i_min = i
+            elif y > points[i_max][1]:
+                i_max = i
+        if i_min == i_max:
+            out.append(points[i_min])
+        else:
+            a, c = (i_min, i_max) if i_min < i_max else (i_max, i_min)
+            out.append(points[a])
+            out.append(points[c])
+    return out
+
+
+def lttb(points: Sequence[Point], threshold: int) -> List[Point]:
+    """Largest-Triangle-Three-Buckets downsampling (points must be x-ordered)."""
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+    sampled: List[Point] = [points[0]]
+    every = (n - 2) / float(threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        nxt_start, nxt_end = end, min(n, int((i + 2) * every) + 1)
+        if nxt_start >= nxt_end:
+            nxt_start, nxt_end = n - 1, n
+        avg_x = avg_y = 0.0
+        for j in range(nxt_start, nxt_end):
+            avg_x += points[j][0]
+            avg_y += points[j][1]
+        cnt = float(nxt_end - nxt_start)
+        avg_x /= cnt
+        avg_y /= cnt
+        ax, ay = points[a]
+        best, best_area = start, -1.0
+        for j in range(start, min(end, n - 1)):
+            px, py = points[j]
+            area = abs((ax - avg_x) * (py - ay) - (ax - px) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def _axis(lo: float, hi: float, n: int) -> Tuple[float, float]:
+    """Return ``(scale, width)`` for ``n`` equal bins over ``[lo, hi]``.
+
+    hi - lo が float の範囲を超える（±1e308 等）ときは値を半分に縮めて幅と位置を計算する
+    （位置は ``(v * scale - lo * scale) / width``、境界は ``(lo * scale + k * width) / scale``）。
+    """
+    scale = 1.0 if math.isfinite(hi - lo) else 0.5
+    return scale, ((hi * scale - lo * scale) / n) or 1.0
+
+
+def histogram(values: Sequence[float], bins: int) -> List[Dict[str, Any]]:
+    values = [v for v in values if math.isfinite(v)]
+    if not values:
+        return []
+    lo, hi = min(values), max(values)
+    if lo == hi:
+        return [{"bin_start": lo, "bin_end": hi, "count": len(values)}]
+    scale, width = _axis(lo, hi, bins)
+    counts = [0] * bins
+    for v in values:
+        k = int((v * scale - lo * scale) / width)
+        counts[k if k < bins else bins - 1] += 1
+    return [
+        {
+            "bin_start": round((lo * scale + k * width) / scale, 6),
+            "bin_end": round((lo * scale + (k + 1) * width) / scale, 6),
+            "count": c,
+        }
+        for k, c in enumerate(counts)
+    ]
+
+
+def bin2d(points: Sequence[Point], nx: int, ny: int) -> List[Dict[str, Any]]:
+    """Rectangular 2-D binning; returns non-empty cells only."""
+    points = [(x, y) for x, y in points if math.isfinite(x) and math.isfinite(y)]
+    if not points:
+        return []
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    x_lo, x_hi, y_lo, y_hi = min(xs), max(xs), min(ys), max(ys)
+    sx, wx = _axis(x_lo, x_hi, nx)
+    sy, wy = _axis(y_lo, y_hi, ny)
+    cells: Dict[Tuple[int, int], int] = {}
+    for x, y in points:
+        i = min(nx - 1, int((x * sx - x_lo * sx) / wx))
+        j = min(ny - 1, int((y * sy - y_lo * sy) / wy))
+        cells[(i, j)] = cells.get((i, j), 0) + 1
+    return [
+        {
+            "x0": round((x_lo * sx + i * wx) / sx, 6), "x1": round((x_lo * sx + (i + 1) * wx) / sx, 6),
+            "y0": round((y_lo * sy + j * wy) / sy, 6), "y1": round((y_lo * sy + (j + 1) * wy) / sy, 6),
+            "count": c,
+        }
+        for (i, j), c in sorted(cells.items())
+    ]
+
+
+def _pairs(xs: Sequence[Optional[float]], ys: Sequence[Optional[float]]) -> List[Point]:
+    return [(x, y) for x, y in zip(xs, ys) if x is not None and y is not None]
+
+
+def render(kind: str, data: Dict[str, Sequence[Any]], *, width_px: int = DEFAULT_WIDTH_PX, height_px: int = DEFAULT_HEIGHT_PX) -> Dict[str, Any]:
+    """Aggregate/downsample ``data`` (column -> raw strings or floats) into a small Vega-Lite spec.
+
+    Returns ``{"spec": ..., "values": [...], "meta": {...}}``. ``values`` は SVG プレビュー用。
+    """
+    kind = (kind or "bar").lower()
+    names = list(data.keys())
+    rows = len(data[names[0]]) if names else 0
+    width_px = max(32, int(width_px))
+    height_px = max(32, int(height_px))
+    enc: Dict[str, Any]
+    if kind == "line":
+        if len(names) >= 2:
+            x_name, y_name = names[0], names[1]
+            pts = _pairs([_to_float(v) for v in data[x_name]], [_to_float(v) for v in data[y_name]])
+            pts.sort(key=lambda p: p[0])
+        else:
+            x_name, y_name = "index", (names[0] if names else "y")
+            ys = [_to_float(v) for v in data.get(y_name, [])]
+            pts = [(float(i), y) for i, y in enumerate(ys) if y is not None]
+        budget = width_px
+        method = "none"
+        if len(pts) > budget * 8:
+            pts = min_max_downsample(pts, budget * 2)
+            method = "minmax+lttb"
+        if len(pts) > budget:
+            pts = lttb(pts, budget)
+            method = "lttb" if method == "none" else method
+        values = [{"x": x, "y": y} for x, y in pts]
+        mark: Any = "line"
+        enc = {
+            "x": {"field": "x", "type": "quantitative", "title": x_name},
+            "y": {"field": "y", "type": "quantitative", "title": y_name},
+        }
+    elif kind == "scatter":
+        x_name = names[0] if names else "x"
+        y_name = names[1] if len(names) >= 2 else x_name
+        pts = _pairs([_to_float(v) for v in data.get(x_name, [])], [_to_float(v) for v in data.get(y_name, [])])
+        if len(pts) <= width_px * 2:
+            method = "none"
+            values = [{"x": x, "y": y} for x, y in pts]
+            mark = "point"
+            enc = {
+                "x": {"field": "x", "type": "quantitative", "title": x_name},
+                "y": {"field": "y", "type": "quantitative", "title": y_name},
+            }
+        else:
+            method = "bin2d"
+            values = bin2d(pts, max(4, width_px // 12), max(4, height_px // 12))
+            mark = "rect"
+            enc = {
+                "x": {"field": "x0", "type": "quantitative", "bin": {"binned": True}, "title": x_name},
+                "x2": {"field": "x1"},
+                "y": {"field": "y0", "type": "quantitative", "bin": {"binned": True}, "title": y_name},
+                "y2": {"field": "y1"},
+                "color": {"field": "count", "type": "quantitative"},
+            }
+    else:
+        kind = "bar"
+        col = names[0] if names else "value"
+        raw = data.get(col, [])
+        nums = [_to_float(v) for v in raw]
+        # 欠損（"" / NaN）を除いた実データで数値列かカテゴリ列かを判定する
+        present = [v for v, f in zip(raw, nums) if v != "" and not (f is None and isinstance(v, float))]
+        if present and sum(1 for v in nums if v is not None) < len(present):
+            # カテゴリ列: 上位カテゴリの件数
+            counts: Dict[str, int] = {}
+            for v in present:
+                counts[v] = counts.get(v, 0) + 1
+            top = sorted(counts.items(), key=lambda kv: -kv[1])[: max(5, width_px // 24)]
+            method = "category_counts"
+            values = [{"category": k, "count": c} for k, c in top]
+            enc = {
+                "x": {"field": "category", "type": "nominal", "sort": "-y", "title": col},
+                "y": {"field": "count", "type": "quantitative"},
+            }
+        else:
+            method = "histogram"
+            values = histogram([v for v in nums if v is not None], max(5, min(60, width_px // 12)))
+            enc = {
+                "x": {"field": "bin_start", "type": "quantitative", "bin": {"binned": True}, "title": col},
+                "x2": {"field": "bin_end"},
+                "y": {"field": "count", "type": "quantitative"},
+            }
+        mark = "bar"
+    spec = {
+        "$schema": _SCHEMA,
+        "mark": mark,
+        "width": width_px,
+        "height": height_px,
+        "data": {"name": "data"},
+        "encoding": enc,
+        "datasets": {"data": values},
+        "description": f"{kind} chart ({method}: {rows} rows -> {len(values)} marks)",
+    }
+    meta = {"columns": names, "rows": rows, "points": len(values), "downsample": method}
+    return {"spec": spec, "values": values, "meta": meta}
+
+
+def _xml_escape(text: Any) -> str:
+    # html モジュールは生成チャートの import allowlist 外のため自前で置換する
+    return (
+        str(text).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+    )
+
+
+def render_svg(kind: str, values: List[Dict[str, Any]], title: str, *, width_px: int = DEFAULT_WIDTH_PX, height_px: int = 120) -> str:
+    """Small static SVG preview of already-aggregated ``values``."""
+    pad_l, pad_t, pad_b = 10, 24, 12
+    w, h = width_px - pad_l * 2, height_px - pad_t - pad_b
+    body = ""
+    if values:
+        if "bin_start" in values[0] or "category" in values[0]:
+            peak = max(v["count"] for v in values) or 1
+            bw = w / len(values)
+            body = "".join(
+                f'<rect x="{pad_l + i * bw:.1f}" y="{pad_t + h - h * v["count"] / peak:.1f}" width="{max(1.0, bw - 1):.1f}" height="{h * v["count"] / peak:.1f}" fill="#60a5fa" />'
+                for i, v in enumerate(values)
+            )
+        else:
+            xk, yk = ("x0", "y0") if "x0" in values[0] else ("x", "y")
+            xs = [v[xk] for v in values]
+            ys = [v[yk] for v in values]
+            x_lo, x_hi, y_lo, y_hi = min(xs), max(xs), min(ys), max(ys)
+            sx = w / ((x_hi - x_lo) or 1.0)
+            sy = h / ((y_hi - y_lo) or 1.0)
+            pts = [(pad_l + (x - x_lo) * sx, pad_t + h - (y - y_lo) * sy) for x, y in zip(xs, ys)]
+            if kind == "line":
+                d = "M " + " L ".join(f"{x:.1f} {y:.1f}" for x, y in pts)
+                body = f'<path d="{d}" fill="none" stroke="#34d399" stroke-width="1.5" />'
+            else:
+                body = "".join(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="2" fill="#f97316" fill-opacity="0.6" />' for x, y in pts)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width_px}" height="{height_px}" viewBox="0 0 {width_px} {height_px}">'
+        f'<text x="10" y="16" font-size="12" fill="#0f172a">{_xml_escape(title)}</text>'
+        f'<line x1="{pad_l}" y1="{pad_t + h}" x2="{pad_l + w}" y2="{pad_t + h}" stroke="#94a3b8" stroke-width="1" />'
+        f"{body}"
+        f"</svg>"
+    )
+
+
+def render_csv(kind: str, csv_path: str, columns: Optional[Sequence[str]] = None, *, width_px: int = DEFAULT_WIDTH_PX, height_px: int = DEFAULT_HEIGHT_PX, max_rows: Optional[int] = None) -> Dict[str, Any]:
+    need = 1 if (kind or "bar").lower() not in ("line", "scatter") else 2
+    data = read_columns(csv_path, columns, need=need, max_rows=max_rows)
+    return render(kind, data, width_px=width_px, height_px=height_px)
+
+
+def render_snapshot(kind: str, snapshot_path: str, columns: Optional[Sequence[str]] = None, *, width_px: int = DEFAULT_WIDTH_PX, height_px: int = DEFAULT_HEIGHT_PX, max_rows: Optional[int] = None) -> Dict[str, Any]:
+    need = 1 if (kind or "bar").lower() not in ("line", "scatter") else 2
+    data = read_snapshot(snapshot_path, columns, need=need, max_rows=max_rows)
+    return render(kind, data, width_px=width_px, height_px=height_px)
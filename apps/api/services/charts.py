@@ -12,8 +12,8 @@ import time
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 from uuid import uuid4
-from . import metrics
-from .sandbox import SandboxRunner, SandboxError
+from . import chart_render, colstore, metrics, prometheus, storage
+from .sandbox import SandboxRunner, SandboxError, pool_enabled
 from .security import redact
 
 _DATA_DIR = Path("data/charts")
@@ -31,11 +31,25 @@ _BATCH_WAIT_SUM: Dict[str, int] = {}
 _BATCH_WAIT_COUNT: Dict[str, int] = {}
 _LAST_SERVED_BATCH: Optional[str] = None
 
+# Prometheus: キュー長・ワーカー稼働率はスクレイプ時に読むだけ、実行時間はシャード済みヒストグラム
+_WORKERS_BUSY = prometheus.gauge("autoeda_charts_workers_busy", "Chart workers currently running a job.")
+_SANDBOX_SECONDS = prometheus.histogram("autoeda_charts_sandbox_seconds", "Chart sandbox run time by backend mode.", ("mode",))
+prometheus.gauge_fn("autoeda_charts_queue_depth", "Chart jobs waiting in the async queue.", lambda: len(_QUEUE))
+prometheus.gauge_fn("autoeda_charts_worker_utilization", "Busy chart workers / AUTOEDA_CHARTS_PARALLELISM.", lambda: _WORKERS_BUSY.value() / _PARALLEL)
+
 
 def _ensure_dir() -> None:
     _DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def _timed_run(mode: str, fn: Any, **kwargs: Any) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        return fn(**kwargs)
+    finally:
+        _SANDBOX_SECONDS.observe(time.perf_counter() - started, (mode,))
+
+
 def _start_worker_once() -> None:
     global _WORKER_STARTED
     if _WORKER_STARTED:
@@ -58,6 +72,7 @@ def _start_worker_once() -> None:
                             break
                 job = _QUEUE.pop(job_idx)
             job_id = job["job_id"]
+            busy = False
             _JOBS[job_id]["status"] = "running"
             _JOBS[job_id]["stage"] = "generating"
             try:
@@ -85,20 +100,22 @@ def _start_worker_once() -> None:
                         _JOBS[job_id]["t_start"] = time.perf_counter()
                 except Exception:
                     pass
+                _WORKERS_BUSY.inc()
+                busy = True
                 runner = SandboxRunner()
                 # stage: generating -> running -> rendering
                 _JOBS[job_id]["stage"] = "generating"
                 exec_mode = os.environ.get("AUTOEDA_SANDBOX_EXECUTE", "0") in {"1", "true", "TRUE"}
                 if exec_mode:
                     jid = job_id
-                    result = runner.run_generated_chart(job_id=jid, spec_hint=item.get("spec_hint"), dataset_id=item.get("dataset_id"), cancel_check=lambda: bool(_CANCEL_FLAGS.get(jid)))
+                    result = _timed_run("generated", runner.run_generated_chart, job_id=jid, spec_hint=item.get("spec_hint"), dataset_id=item.get("dataset_id"), columns=item.get("columns"), cancel_check=lambda: bool(_CANCEL_FLAGS.get(jid)))
                 else:
                     if os.environ.get("AUTOEDA_SANDBOX_SUBPROCESS", "0") in {"1", "true", "TRUE"}:
                         jid = job_id
-                        result = runner.run_template_subprocess(spec_hint=item.get("spec_hint"), dataset_id=item.get("dataset_id"), cancel_check=lambda: bool(_CANCEL_FLAGS.get(jid)))
+                        result = _timed_run("subprocess", runner.run_template_subprocess, spec_hint=item.get("spec_hint"), dataset_id=item.get("dataset_id"), columns=item.get("columns"), cancel_check=lambda: bool(_CANCEL_FLAGS.get(jid)))
                     else:
                         jid = job_id
-                        result = runner.run_template(spec_hint=item.get("spec_hint"), dataset_id=item.get("dataset_id"), cancel_check=lambda: bool(_CANCEL_FLAGS.get(jid)))
+                        result = _timed_run(_sandbox_mode(), runner.run_template, spec_hint=item.get("spec_hint"), dataset_id=item.get("dataset_id"), columns=item.get("columns"), cancel_check=lambda: bool(_CANCEL_FLAGS.get(jid)))
                 _JOBS[job_id]["stage"] = "rendering"
                 outdir = _DATA_DIR / job_id
                 outdir.mkdir(parents=True, exist_ok=True)
@@ -249,6 +266,8 @@ def _start_worker_once() -> None:
                     })
                 except Exception:
                     pass
+            if busy:
+                _WORKERS_BUSY.dec()
             # small yield
             time.sleep(0.01)
             # decrement running counter for batch
@@ -303,26 +322,57 @@ def _svg_scatter(title: str = "Scatter Plot") -> str:
     )
 
 
-def _template_result(spec_hint: Optional[str], dataset_id: Optional[str] = None) -> Dict[str, Any]:
+def _sandbox_mode() -> str:
+    if os.environ.get("AUTOEDA_SANDBOX_SUBPROCESS", "0") in {"1", "true", "TRUE"}:
+        return "subprocess"
+    return _template_mode()
+
+
+def _template_mode() -> str:
+    """run_template が実際に使うバックエンド（autoeda_charts_sandbox_seconds の mode ラベル）。"""
+    return "pool" if pool_enabled() else "inline"
+
+
+def _template_result(spec_hint: Optional[str], dataset_id: Optional[str] = None, columns: Optional[List[str]] = None) -> Dict[str, Any]:
     kind = (spec_hint or "bar").lower()
-    if kind == "line":
-        svg = _svg_line("Line (template)")
-    elif kind == "scatter":
-        svg = _svg_scatter("Scatter (template)")
+    rendered: Optional[Dict[str, Any]] = None
+    if dataset_id:
+        path = storage.dataset_path(dataset_id)
+        if path.exists():
+            try:
+                snap = colstore.ensure_snapshot(str(path))
+                if snap:
+                    rendered = chart_render.render_snapshot(kind, snap, columns)
+                    rendered["meta"]["source"] = "snapshot"
+                else:
+                    rendered = chart_render.render_csv(kind, str(path), columns)
+                    rendered["meta"]["source"] = "csv"
+            except Exception:
+                rendered = None
+    if rendered is not None:
+        # データ連動: 画素予算に合わせて集計/間引き済みの値のみを spec に載せる
+        vega_spec = rendered["spec"]
+        title = f"{kind.capitalize()} ({', '.join(rendered['meta']['columns'])})"
+        svg = chart_render.render_svg(kind, rendered["values"], title)
     else:
-        svg = _svg_bar("Bar (template)")
-    # minimal vega-lite like spec (for docs/preview purposes)
-    vega_spec = {
-        "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-        "mark": kind if kind in {"bar", "line"} else "point",
-        "data": {"name": "data"},
-        "encoding": {
-            "x": {"field": "x", "type": "quantitative"},
-            "y": {"field": "y", "type": "quantitative"},
-        },
-        "datasets": {"data": [{"x": i, "y": v} for i, v in enumerate([1, 3, 2, 5, 4])]},
-        "description": f"template {kind} chart",
-    }
+        if kind == "line":
+            svg = _svg_line("Line (template)")
+        elif kind == "scatter":
+            svg = _svg_scatter("Scatter (template)")
+        else:
+            svg = _svg_bar("Bar (template)")
+        # minimal vega-lite like spec (for docs/preview purposes)
+        vega_spec = {
+            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+            "mark": kind if kind in {"bar", "line"} else "point",
+            "data": {"name": "data"},
+            "encoding": {
+                "x": {"field": "x", "type": "quantitative"},
+                "y": {"field": "y", "type": "quantitative"},
+            },
+            "datasets": {"data": [{"x": i, "y": v} for i, v in enumerate([1, 3, 2, 5, 4])]},
+            "description": f"template {kind} chart",
+        }
     code = (
         "# template-only preview (MVP)\n"
         "import json\n"
@@ -338,7 +388,7 @@ def _template_result(spec_hint: Optional[str], dataset_id: Optional[str] = None)
             "dataset_id": dataset_id,
             "hint": spec_hint,
             "engine": "template",
-            "sandbox": os.environ.get("AUTOEDA_SANDBOX_SUBPROCESS", "0") in {"1", "true", "TRUE"} and "subprocess" or "inline",
+            "sandbox": _sandbox_mode(),
             "parallelism": _PARALLEL,
         },
         "outputs": [
@@ -346,6 +396,8 @@ def _template_result(spec_hint: Optional[str], dataset_id: Optional[str] = None)
             {"type": "vega", "mime": "application/json", "content": vega_spec},
         ],
     }
+    if rendered is not None:
+        result["meta"].update(rendered["meta"])
     return result
 
 
@@ -375,9 +427,10 @@ def generate(item: Dict[str, Any]) -> Dict[str, Any]:
         try:
             if exec_mode:
                 jid = job_id
-                result = runner.run_generated_chart(job_id=jid, spec_hint=item.get("spec_hint"), dataset_id=item.get("dataset_id"), cancel_check=lambda: False)
+                result = _timed_run("generated", runner.run_generated_chart, job_id=jid, spec_hint=item.get("spec_hint"), dataset_id=item.get("dataset_id"), columns=item.get("columns"), cancel_check=lambda: False)
             else:
-                result = runner.run_template(spec_hint=item.get("spec_hint"), dataset_id=item.get("dataset_id"))
+                # 同期パスは subprocess 設定でも run_template（pool or inline）で実行する
+                result = _timed_run(_template_mode(), runner.run_template, spec_hint=item.get("spec_hint"), dataset_id=item.get("dataset_id"), columns=item.get("columns"))
         except Exception:
             # CH-13: fallback with a single retry by default
             retries = 0
@@ -430,6 +483,8 @@ def get_job(job_id: str) -> Optional[Dict[str, Any]]:
 
 def generate_batch(items: List[Dict[str, Any]], parallelism: int = 3) -> Dict[str, Any]:
     batch_id = uuid4().hex[:12]
+    # 同一データセットを共有するジョブ向けに読み取り専用スナップショットを先行作成（1 バッチ 1 回）
+    colstore.prefetch(str(storage.dataset_path(it["dataset_id"])) for it in items if it.get("dataset_id"))
     job_items: List[Dict[str, Any]] = []
     results: List[Dict[str, Any]] = []
 
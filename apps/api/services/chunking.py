@@ -0,0 +1,123 @@
+"""Markdown chunker for RAG ingestion.
+
+ファイル丸ごとではなく見出し単位のセクションに分割し、長いセクションは重なり付きの
+スライディングウィンドウで切る。プロンプトに入るのは質問に関係する節になる。
+
+- 見出し（``#``〜``######``、コードフェンス内は除く）でセクションを区切る
+- ウィンドウ幅 ``AUTOEDA_RAG_CHUNK_CHARS``（既定 400 = プロンプトの文書抜粋幅）、
+  重なり ``AUTOEDA_RAG_CHUNK_OVERLAP``（既定 80）。切れ目は幅の後半にある改行/句点を優先
+- 2 つ目以降のウィンドウには見出し行を前置し、単独でも節の文脈が分かるようにする
+- チャンク ID は ``<source>#<sha1(見出しパス + 本文)[:12]>``。内容が変わらない限り安定
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_BREAKS = ("\n\n", "\n", "。", ". ", "、", " ")
+
+
+def _env_int(name: str, default: int, minimum: int) -> int:
+    try:
+        return max(minimum, int(os.environ.get(name, str(default)) or default))
+    except ValueError:
+        return default
+
+
+def chunk_chars() -> int:
+    return _env_int("AUTOEDA_RAG_CHUNK_CHARS", 400, 50)
+
+
+def chunk_overlap() -> int:
+    return _env_int("AUTOEDA_RAG_CHUNK_OVERLAP", 80, 0)
+
+
+def split_sections(text: str) -> List[Tuple[List[str], str]]:
+    """Split markdown into ``[(heading_path, body), ...]``; body starts with its heading line."""
+    sections: List[Tuple[List[str], str]] = []
+    path: List[Tuple[int, str]] = []
+    current: List[str] = []
+    current_path: List[str] = []
+    in_fence = False
+
+    def flush() -> None:
+        body = "\n".join(current).strip()
+        if body:
+            sections.append((current_path, body))
+
+    for line in (text or "").splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_RE.match(line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            path = [p for p in path if p[0] < level] + [(level, match.group(2))]
+            current, current_path = [line], [title for _, title in path]
+        else:
+            current.append(line)
+    flush()
+    return sections
+
+
+def _windows(body: str, size: int, overlap: int) -> List[str]:
+    if len(body) <= size:
+        return [body]
+    overlap = min(overlap, size // 2)
+    out: List[str] = []
+    start = 0
+    while start < len(body):
+        end = min(len(body), start + size)
+        if end < len(body):
+            window = body[start:end]
+            for sep in _BREAKS:
+                cut = window.rfind(sep, size // 2)
+                if cut > 0:
+                    end = start + cut + len(sep)
+                    break
+        piece = body[start:end].strip()
+        if piece:
+            out.append(piece)
+        if end >= len(body):
+            break
+        # 次のウィンドウは重なり区間内の最初の区切りの直後から始める（語/文の途中で始めない）
+        nxt = end - overlap
+        for sep in _BREAKS:
+            cut = body.find(sep, nxt, end)
+            if cut >= 0:
+                nxt = cut + len(sep)
+                break
+        start = max(start + 1, nxt)
+    return out
+
+
+def chunk_markdown(
+    text: str,
+    *,
+    source: str,
+    size: Optional[int] = None,
+    overlap: Optional[int] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Return ``[{"id", "text", "metadata"}, ...]`` ready for ``rag.ingest``."""
+    size = size or chunk_chars()
+    overlap = chunk_overlap() if overlap is None else max(0, overlap)
+    chunks: List[Dict[str, Any]] = []
+    seen = set()
+    for heading_path, body in split_sections(text):
+        heading_line = body.splitlines()[0] if heading_path else ""
+        section = " > ".join(heading_path)
+        for idx, piece in enumerate(_windows(body, size, overlap)):
+            if idx and heading_line and not piece.startswith(heading_line):
+                piece = f"{heading_line}\n{piece}"
+            digest = hashlib.sha1(f"{section}\n{piece}".encode("utf-8")).hexdigest()[:12]
+            if digest in seen:  # 同一節内の完全重複は 1 つにまとめる（upsert の ID 衝突回避）
+                continue
+            seen.add(digest)
+            meta = dict(metadata or {}, source=source, section=section, chunk=len(chunks))
+            chunks.append({"id": f"{source}#{digest}", "text": piece, "metadata": meta})
+    return chunks
@@ -0,0 +1,208 @@
+"""Read-only columnar dataset snapshots shared with sandbox processes.
+
+ホスト側で CSV を 1 度だけパースし、共有 tmpfs（/dev/shm、無ければ一時ディレクトリ）へ
+バイナリのカラムナ形式で書き出す。サンドボックス側は ``chart_render.read_snapshot`` で
+mmap(ACCESS_READ) するだけなので、チャート毎の CSV 再パースが不要になる。
+
+ファイル形式（リトルエンディアン、ブロックは 8 byte 境界）::
+
+    b"AEDSNAP1" | u32 header_len | header(JSON) | pad | column blocks...
+
+header = {"rows": n, "columns": [{"name", "type": "f64", "offset"} |
+                                  {"name", "type": "str", "offset", "data_offset", "data_nbytes"}]}
+
+- f64: n 個の double（欠損は NaN）
+- str: (n+1) 個の int64 オフセット + UTF-8 連結バイト列
+
+ファイル名は (CSV パス, mtime_ns, size) から決まるため、プールワーカー等の別プロセスからも
+同じスナップショットを再利用できる。CSV が更新されると別名で再生成し、古いものは削除する。
+"""
+from __future__ import annotations
+
+import contextlib
+import csv
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b"AEDSNAP1"
+_SUFFIX = ".aeds"
+_CACHE: Dict[str, Tuple[int, int, str]] = {}
+_LOCKS: Dict[str, threading.Lock] = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+def enabled() -> bool:
+    """スナップショット共有が有効か（ENV: AUTOEDA_SANDBOX_SNAPSHOT、既定 on）。"""
+    return os.environ.get("AUTOEDA_SANDBOX_SNAPSHOT", "1") in {"1", "true", "TRUE"}
+
+
+def snapshot_dir() -> Path:
+    override = os.environ.get("AUTOEDA_SNAPSHOT_DIR")
+    if override:
+        base = Path(override)
+    elif os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        base = Path("/dev/shm") / "autoeda_colstore"
+    else:
+        base = Path(tempfile.gettempdir()) / "autoeda_colstore"
+    base.mkdir(parents=True, exist_ok=True)
+    return base
+
+
+def _lock_for(key: str) -> threading.Lock:
+    with _LOCKS_GUARD:
+        lock = _LOCKS.get(key)
+        if lock is None:
+            lock = _LOCKS[key] = threading.Lock()
+        return lock
+
+
+def _parse_float(cell: str) -> Optional[float]:
+    if cell == "":
+        return math.nan
+    try:
+        return float(cell)
+    except ValueError:
+        return None
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def build_snapshot(csv_path: str, out_path: str) -> Dict[str, object]:
+    """Parse ``csv_path`` once and write the columnar snapshot to ``out_path`` (atomic)."""
+    with open(csv_path, "r", encoding="utf-8", errors="ignore", newline="") as f:
+        rdr = csv.reader(f)
+        header = next(rdr, None) or []
+        cells: List[List[str]] = [[] for _ in header]
+        for row in rdr:
+            for j, col in enumerate(cells):
+                col.append(row[j] if j < len(row) else "")
+    rows = len(cells[0]) if cells else 0
+
+    blocks: List[Tuple[Dict[str, object], List[bytes]]] = []
+    for name, raw in zip(header, cells):
+        nums = array("d")
+        numeric = any(c != "" for c in raw)
+        for c in raw:
+            v = _parse_float(c)
+            if v is None:
+                numeric = False
+                break
+            nums.append(v)
+        if numeric:
+            blocks.append(({"name": name, "type": "f64"}, [nums.tobytes()]))
+        else:
+            offsets = array("q", [0])
+            parts: List[bytes] = []
+            pos = 0
+            for c in raw:
+                b = c.encode("utf-8")
+                parts.append(b)
+                pos += len(b)
+                offsets.append(pos)
+            blocks.append(({"name": name, "type": "str"}, [offsets.tobytes(), b"".join(parts)]))
+
+    # ヘッダ長とオフセットは相互依存するため、余白付きで収束するまで再計算する
+    def _layout(header_len: int) -> int:
+        pos = _align(len(MAGIC) + 4 + header_len)
+        for meta, chunks in blocks:
+            meta["offset"] = pos
+            pos = _align(pos + len(chunks[0]))
+            if meta["type"] == "str":
+                meta["data_offset"] = pos
+                meta["data_nbytes"] = len(chunks[1])
+                pos = _align(pos + len(chunks[1]))
+        return pos
+
+    head_len = 0
+    while True:
+        _layout(head_len)
+        encoded = json.dumps({"rows": rows, "columns": [m for m, _ in blocks]}).encode("utf-8")
+        if len(encoded) <= head_len:
+            break
+        head_len = len(encoded) + 64
+    head = encoded.ljust(head_len)
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(out_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(MAGIC)
+            out.write(len(head).to_bytes(4, "little"))
+            out.write(head)
+            for meta, chunks in blocks:
+                out.write(b"\0" * (int(meta["offset"]) - out.tell()))
+                out.write(chunks[0])
+                if meta["type"] == "str":
+                    out.write(b"\0" * (int(meta["data_offset"]) - out.tell()))
+                    out.write(chunks[1])
+        os.chmod(tmp, 0o444)
+        os.replace(tmp, out_path)
+    except Exception:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+    return {"rows": rows, "columns": [m["name"] for m, _ in blocks]}
+
+
+def ensure_snapshot(csv_path: Optional[str]) -> Optional[str]:
+    """Return the snapshot path for ``csv_path``, building it once per file version.
+
+    無効化時・CSV 不在時・失敗時は None（呼び出し側は CSV 直読みにフォールバック）。
+    """
+    if not csv_path or not enabled():
+        return None
+    try:
+        st = os.stat(csv_path)
+    except OSError:
+        return None
+    key = os.path.abspath(csv_path)
+    cached = _CACHE.get(key)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size and os.path.exists(cached[2]):
+        return cached[2]
+    with _lock_for(key):
+        cached = _CACHE.get(key)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size and os.path.exists(cached[2]):
+            return cached[2]
+        stem = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        out = snapshot_dir() / f"{stem}-{st.st_mtime_ns}-{st.st_size}{_SUFFIX}"
+        if not out.exists():
+            try:
+                build_snapshot(key, str(out))
+            except Exception:
+                return None
+        # 同一 CSV の古い版を掃除
+        for old in out.parent.glob(f"{stem}-*{_SUFFIX}"):
+            if old != out:
+                with contextlib.suppress(OSError):
+                    old.unlink()
+        _CACHE[key] = (st.st_mtime_ns, st.st_size, str(out))
+        return str(out)
+
+
+def prefetch(csv_paths: Iterable[Optional[str]]) -> None:
+    """バッチ投入時に対象データセットのスナップショットをバックグラウンドで用意する。"""
+    paths = sorted({p for p in csv_paths if p})
+    if not paths or not enabled():
+        return
+
+    def _run() -> None:
+        for p in paths:
+            ensure_snapshot(p)
+
+    threading.Thread(target=_run, name="colstore-prefetch", daemon=True).start()
+
+
+def clear() -> None:
+    """テスト用: キャッシュとスナップショットファイルを破棄する。"""
+    for _, _, path in list(_CACHE.values()):
+        with contextlib.suppress(OSError):
+            os.remove(path)
+    _CACHE.clear()
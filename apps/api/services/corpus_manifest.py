@@ -0,0 +1,59 @@
+"""Manifest of corpus chunks already ingested into each persistent vector store.
+
+``rag.replace_source`` は source（``design.md`` 等）ごとに「どのチャンク ID をどの本文ハッシュで
+投入済みか」をここへ記録し、次回起動時は差分（新規/変更チャンクの投入と消えたチャンクの削除）
+だけを行う。ストア単位のキー（バックエンド・コレクション・埋め込みモデル）で分けるので、
+モデルや保存先を切り替えた場合は全件投入し直しになる。
+
+保存先: ``data/rag/manifest.json``（``AUTOEDA_RAG_MANIFEST`` で変更可）。
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+_DEFAULT_PATH = Path("data/rag/manifest.json")
+_LOCK = threading.Lock()
+
+
+def manifest_path() -> Path:
+    override = os.environ.get("AUTOEDA_RAG_MANIFEST")
+    return Path(override) if override else _DEFAULT_PATH
+
+
+def _read() -> Dict[str, Any]:
+    try:
+        data = json.loads(manifest_path().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"stores": {}}
+    return data if isinstance(data.get("stores"), dict) else {"stores": {}}
+
+
+def load_source(store: str, source: str) -> Optional[Dict[str, str]]:
+    """Return ``{chunk_id: text_hash}`` recorded for ``source`` in ``store`` (None if never ingested)."""
+    with _LOCK:
+        entry = _read()["stores"].get(store, {}).get(source)
+    return dict(entry["chunks"]) if entry and isinstance(entry.get("chunks"), dict) else None
+
+
+def record(store: str, source: str, chunks: Dict[str, str]) -> None:
+    path = manifest_path()
+    with _LOCK:
+        data = _read()
+        data["stores"].setdefault(store, {})[source] = {"chunks": chunks, "updated_at": time.time()}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, path)
+        except Exception:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+            raise
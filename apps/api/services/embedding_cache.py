@@ -0,0 +1,132 @@
+"""Disk cache of document embeddings keyed by (model, text hash).
+
+コーパスの再インデックス時に、変わっていないチャンクの埋め込み API 呼び出しを省く。
+
+- 保存先: ``data/rag/embeddings/<model>.npz``（``AUTOEDA_EMBEDDING_CACHE_DIR`` で変更可）。
+  キー = テキストの sha1、値 = float32 ベクトル。``AUTOEDA_EMBEDDING_CACHE=0`` で無効
+- 未キャッシュ分は ``AUTOEDA_EMBEDDING_BATCH``（既定 64）件ずつまとめて埋め込み関数へ渡す
+- NumPy が無い環境ではキャッシュせずバッチ呼び出しのみ行う
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+try:  # pragma: no cover - optional dependency import
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+EmbedFn = Callable[[List[str]], Any]
+
+_DEFAULT_DIR = Path("data/rag/embeddings")
+_LOCK = threading.Lock()
+# (キャッシュファイルのパス) -> {text_hash: vector}
+_MEMO: Dict[str, Dict[str, Any]] = {}
+_STATS = {"hits": 0, "misses": 0, "batches": 0}
+
+
+def enabled() -> bool:
+    return np is not None and os.environ.get("AUTOEDA_EMBEDDING_CACHE", "1") in {"1", "true", "TRUE"}
+
+
+def cache_dir() -> Path:
+    override = os.environ.get("AUTOEDA_EMBEDDING_CACHE_DIR")
+    return Path(override) if override else _DEFAULT_DIR
+
+
+def batch_size() -> int:
+    try:
+        return max(1, int(os.environ.get("AUTOEDA_EMBEDDING_BATCH", "64") or "64"))
+    except ValueError:
+        return 64
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+def _path(model: str) -> Path:
+    return cache_dir() / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}.npz"
+
+
+def _entries(path: Path) -> Dict[str, Any]:
+    key = str(path)
+    entries = _MEMO.get(key)
+    if entries is None:
+        entries = {}
+        try:
+            with np.load(path) as data:
+                entries = dict(zip(data["keys"].tolist(), data["vectors"]))
+        except (OSError, ValueError, KeyError):
+            pass
+        _MEMO[key] = entries
+    return entries
+
+
+def _save(path: Path, entries: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    keys = list(entries)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, keys=np.asarray(keys), vectors=np.asarray([entries[k] for k in keys], dtype=np.float32))
+        os.replace(tmp, path)
+    except Exception:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def _batched(texts: List[str], embed_fn: EmbedFn) -> List[Any]:
+    out: List[Any] = []
+    size = batch_size()
+    for start in range(0, len(texts), size):
+        out.extend(list(embed_fn(texts[start:start + size])))
+        with _LOCK:
+            _STATS["batches"] += 1
+    return out
+
+
+def embed(texts: Sequence[str], *, model: str, embed_fn: EmbedFn) -> List[List[float]]:
+    """Embed ``texts`` with ``embed_fn``, reusing cached vectors for unchanged text."""
+    texts = list(texts)
+    if not texts:
+        return []
+    if not enabled():
+        return [list(map(float, vec)) for vec in _batched(texts, embed_fn)]
+
+    path = _path(model)
+    hashes = [text_hash(t) for t in texts]
+    with _LOCK:
+        entries = _entries(path)
+        pending = {h: t for h, t in zip(hashes, texts) if h not in entries}
+    if pending:
+        vectors = _batched(list(pending.values()), embed_fn)
+        with _LOCK:
+            entries = _entries(path)
+            for h, vec in zip(pending, vectors):
+                entries[h] = np.asarray(vec, dtype=np.float32)
+            _save(path, entries)
+    with _LOCK:
+        _STATS["hits"] += len(texts) - len(pending)
+        _STATS["misses"] += len(pending)
+        return [entries[h].tolist() for h in hashes]
+
+
+def stats() -> Dict[str, int]:
+    with _LOCK:
+        return dict(_STATS)
+
+
+def clear() -> None:
+    """Drop the in-memory copies and counters (cache files are left as is)."""
+    with _LOCK:
+        _MEMO.clear()
+        _STATS.update(hits=0, misses=0, batches=0)
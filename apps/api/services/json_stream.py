@@ -0,0 +1,76 @@
+"""Incremental JSON extraction for streamed LLM output.
+
+LLM は ``{"answers": [{...}, {...}]}`` を 1 トークンずつ返すため、全文を待ってから
+``json.loads`` すると最初の回答までの待ち時間 = 生成時間全体になる。
+``AnswerStreamParser`` は文字列/エスケープ/括弧の深さだけを追う軽量な走査器で、
+answers 配列（または最上位の配列）の要素オブジェクトが閉じた時点でそれを返す。
+前置きの文章や ```json フェンスは括弧の外なので無視される。
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+_ANSWERS_KEY_RE = re.compile(r'"answers"\s*:\s*$')
+
+
+class AnswerStreamParser:
+    def __init__(self) -> None:
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_str = False
+        self._escape = False
+        # answers 配列の深さ（= その配列を積んだ後の stack 長）と走査中の要素の開始位置
+        self._array_depth: Optional[int] = None
+        self._start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        return self._buf
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Append ``chunk`` and return every answer object completed by it."""
+        self._buf += chunk
+        buf = self._buf
+        out: List[Dict[str, Any]] = []
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+                continue
+            if ch == '"':
+                if self._stack:
+                    self._in_str = True
+            elif ch == "[":
+                if self._array_depth is None and (
+                    not self._stack or _ANSWERS_KEY_RE.search(buf[max(0, i - 64):i])
+                ):
+                    self._array_depth = len(self._stack) + 1
+                self._stack.append(ch)
+            elif ch == "{":
+                if self._array_depth is not None and len(self._stack) == self._array_depth:
+                    self._start = i
+                self._stack.append(ch)
+            elif ch in "]}":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "]" and self._array_depth is not None and len(self._stack) < self._array_depth:
+                    # 配列が閉じた（前置き文の [..] 等）→ 次の answers 配列を待つ
+                    self._array_depth = None
+                if ch == "}" and self._start is not None and len(self._stack) == self._array_depth:
+                    try:
+                        obj = json.loads(buf[self._start:i + 1])
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        out.append(obj)
+                    self._start = None
+        self._pos = len(buf)
+        return out
@@ -0,0 +1,184 @@
+"""Persistent LLM response cache (disk, LRU + TTL, per-dataset invalidation).
+
+キー = sha256(provider, model, temperature, データセットの版, 正規化プロンプト)。
+正規化は意味を変えない差分だけを吸収する（NFKC、空白の畳み込み、``updated_at`` の時刻）。
+エントリは ``<cache_dir>/<dataset_id>/<key>.json`` に置くため、データセット単位の無効化は
+ディレクトリ削除で済む。LRU 順はメモリ上の索引で持ち（初回に mtime 順で復元）、ヒット時に
+mtime を更新してプロセス再起動後も順序を保つ。
+
+ENV: AUTOEDA_LLM_CACHE=1（0 で無効）/ AUTOEDA_LLM_CACHE_DIR / AUTOEDA_LLM_CACHE_TTL_SEC=86400 /
+AUTOEDA_LLM_CACHE_MAX_ENTRIES=2000
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from . import storage
+
+_DEFAULT_DIR = Path(__file__).resolve().parents[2] / "data" / "llm_cache"
+_UPDATED_AT_RE = re.compile(r'"updated_at":\s*(?:"[^"]*"|null)')
+_WS_RE = re.compile(r"[ \t　]+")
+_BLANK_LINES_RE = re.compile(r"\n{2,}")
+
+_LOCK = threading.Lock()
+_INDEX: "OrderedDict[Tuple[str, str], Path]" = OrderedDict()
+_INDEX_DIR: Optional[Path] = None
+_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def enabled() -> bool:
+    return os.environ.get("AUTOEDA_LLM_CACHE", "1") in {"1", "true", "TRUE"}
+
+
+def cache_dir() -> Path:
+    override = os.environ.get("AUTOEDA_LLM_CACHE_DIR")
+    return Path(override) if override else _DEFAULT_DIR
+
+
+def _ttl_sec() -> float:
+    try:
+        return float(os.environ.get("AUTOEDA_LLM_CACHE_TTL_SEC", "86400") or "86400")
+    except ValueError:
+        return 86400.0
+
+
+def _max_entries() -> int:
+    try:
+        return max(1, int(os.environ.get("AUTOEDA_LLM_CACHE_MAX_ENTRIES", "2000") or "2000"))
+    except ValueError:
+        return 2000
+
+
+def normalize_prompt(prompt: Dict[str, str]) -> str:
+    parts = []
+    for role in sorted(prompt):
+        text = unicodedata.normalize("NFKC", str(prompt[role] or ""))
+        text = _UPDATED_AT_RE.sub('"updated_at": null', text)
+        lines = [_WS_RE.sub(" ", line).strip() for line in text.replace("\r\n", "\n").split("\n")]
+        parts.append(f"[{role}]\n" + _BLANK_LINES_RE.sub("\n", "\n".join(lines)).strip())
+    return "\n".join(parts)
+
+
+def make_key(provider: str, model: str, temperature: float, prompt: Dict[str, str], dataset_id: Optional[str] = None) -> str:
+    h = hashlib.sha256()
+    for part in (provider, model, repr(float(temperature)), storage.dataset_version(dataset_id), normalize_prompt(prompt)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _bucket(dataset_id: Optional[str]) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", dataset_id) if dataset_id else "_global"
+
+
+def _ensure_index() -> None:
+    """Load the LRU index from disk (oldest mtime first) when the cache directory changes."""
+    global _INDEX_DIR
+    base = cache_dir()
+    if _INDEX_DIR == base:
+        return
+    _INDEX.clear()
+    entries = []
+    if base.exists():
+        for path in base.glob("*/*.json"):
+            with contextlib.suppress(OSError):
+                entries.append((path.stat().st_mtime, path))
+    for _, path in sorted(entries):
+        _INDEX[(path.parent.name, path.stem)] = path
+    _INDEX_DIR = base
+
+
+def get(dataset_id: Optional[str], key: str) -> Optional[str]:
+    if not enabled():
+        return None
+    bucket = _bucket(dataset_id)
+    with _LOCK:
+        _ensure_index()
+        path = _INDEX.get((bucket, key))
+        if path is None:
+            _STATS["misses"] += 1
+            return None
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            entry = None
+        if not entry or time.time() - float(entry.get("created_at", 0)) > _ttl_sec():
+            _INDEX.pop((bucket, key), None)
+            with contextlib.suppress(OSError):
+                path.unlink()
+            _STATS["misses"] += 1
+            return None
+        _INDEX.move_to_end((bucket, key))
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        _STATS["hits"] += 1
+        return entry.get("text")
+
+
+def put(dataset_id: Optional[str], key: str, text: str, **meta: Any) -> None:
+    if not enabled() or not text:
+        return
+    bucket = _bucket(dataset_id)
+    target_dir = cache_dir() / bucket
+    target_dir.mkdir(parents=True, exist_ok=True)
+    payload = json.dumps({"created_at": time.time(), "text": text, **meta}, ensure_ascii=False)
+    fd, tmp = tempfile.mkstemp(dir=target_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(payload)
+        path = target_dir / f"{key}.json"
+        os.replace(tmp, path)
+    except Exception:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+    with _LOCK:
+        _ensure_index()
+        _INDEX[(bucket, key)] = path
+        _INDEX.move_to_end((bucket, key))
+        limit = _max_entries()
+        while len(_INDEX) > limit:
+            _, old = _INDEX.popitem(last=False)
+            _STATS["evictions"] += 1
+            with contextlib.suppress(OSError):
+                old.unlink()
+
+
+def invalidate_dataset(dataset_id: str) -> int:
+    """Drop every cached response for ``dataset_id``; returns the number of entries removed."""
+    bucket = _bucket(dataset_id)
+    with _LOCK:
+        _ensure_index()
+        keys = [k for k in _INDEX if k[0] == bucket]
+        for k in keys:
+            _INDEX.pop(k, None)
+        shutil.rmtree(cache_dir() / bucket, ignore_errors=True)
+    return len(keys)
+
+
+def stats() -> Dict[str, int]:
+    with _LOCK:
+        _ensure_index()
+        return {"entries": len(_INDEX), **_STATS}
+
+
+def clear() -> None:
+    """テスト用: キャッシュディレクトリと索引・統計を破棄する。"""
+    global _INDEX_DIR
+    with _LOCK:
+        shutil.rmtree(cache_dir(), ignore_errors=True)
+        _INDEX.clear()
+        _INDEX_DIR = None
+        _STATS.update(hits=0, misses=0, evictions=0)
@@ -0,0 +1,124 @@
+"""Process-wide LLM client registry (one client per provider + API key).
+
+リクエスト毎に ``OpenAI(api_key=...)`` / ``genai.configure`` を作り直すと HTTP コネクション
+プールと TLS セッションが毎回捨てられる。ここで (provider, key) 単位にクライアントを保持し、
+keep-alive 付きのプールとタイムアウトを設定して再利用する。
+
+- ``config.reset_cache()``（資格情報の更新時にも呼ばれる）でクライアントは破棄・close される
+- ENV: AUTOEDA_LLM_MAX_CONNECTIONS=20 / AUTOEDA_LLM_MAX_KEEPALIVE=10 /
+  AUTOEDA_LLM_KEEPALIVE_SEC=30 / AUTOEDA_LLM_CONNECT_TIMEOUT_SEC=5 /
+  AUTOEDA_LLM_TIMEOUT_SEC=60（1 呼び出しあたり）/ AUTOEDA_LLM_MAX_RETRIES=2
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from apps.api import config
+
+_CLIENTS: Dict[Tuple[str, str, int], Any] = {}
+_GEMINI_KEY: Dict[int, str] = {}
+_LOCK = threading.Lock()
+_STATS = {"created": 0, "reused": 0}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+def call_timeout() -> float:
+    """1 回の LLM 呼び出しのタイムアウト（秒）。"""
+    return _env_float("AUTOEDA_LLM_TIMEOUT_SEC", 60.0)
+
+
+def _http_client() -> Optional[Any]:
+    try:
+        import httpx  # type: ignore
+        import openai  # type: ignore
+
+        factory = getattr(openai, "DefaultHttpxClient", None)
+        if factory is None:
+            return None
+        return factory(
+            limits=httpx.Limits(
+                max_connections=_env_int("AUTOEDA_LLM_MAX_CONNECTIONS", 20),
+                max_keepalive_connections=_env_int("AUTOEDA_LLM_MAX_KEEPALIVE", 10),
+                keepalive_expiry=_env_float("AUTOEDA_LLM_KEEPALIVE_SEC", 30.0),
+            ),
+            timeout=httpx.Timeout(call_timeout(), connect=_env_float("AUTOEDA_LLM_CONNECT_TIMEOUT_SEC", 5.0)),
+        )
+    except Exception:
+        return None
+
+
+def openai_client(api_key: str, factory: Callable[..., Any]) -> Any:
+    """Return the shared OpenAI client for ``api_key`` (``factory`` は通常 ``openai.OpenAI``)."""
+    key = ("openai", api_key, id(factory))
+    client = _CLIENTS.get(key)
+    if client is not None:
+        _STATS["reused"] += 1
+        return client
+    with _LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            kwargs: Dict[str, Any] = {
+                "api_key": api_key,
+                "timeout": call_timeout(),
+                "max_retries": _env_int("AUTOEDA_LLM_MAX_RETRIES", 2),
+            }
+            http_client = _http_client()
+            if http_client is not None:
+                kwargs["http_client"] = http_client
+            client = _CLIENTS[key] = factory(**kwargs)
+            _STATS["created"] += 1
+        else:
+            _STATS["reused"] += 1
+        return client
+
+
+def gemini_model(genai: Any, api_key: str, model_name: str, system_instruction: Optional[str]) -> Any:
+    """``genai.configure`` は鍵が変わった時だけ行い（内部トランスポートを保持）、モデルを返す。
+
+    GenerativeModel 自体は軽量なラッパで system_instruction がプロンプト毎に変わるため毎回生成する。
+    """
+    with _LOCK:
+        if _GEMINI_KEY.get(id(genai)) != api_key:
+            genai.configure(api_key=api_key)
+            _GEMINI_KEY[id(genai)] = api_key
+            _STATS["created"] += 1
+        else:
+            _STATS["reused"] += 1
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+
+def stats() -> Dict[str, int]:
+    return {"clients": len(_CLIENTS), **_STATS}
+
+
+def reset() -> None:
+    """Drop (and close) every cached client. ``config.reset_cache`` から呼ばれる。"""
+    with _LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+        _GEMINI_KEY.clear()
+        _STATS.update(created=0, reused=0)
+    for client in clients:
+        close = getattr(client, "close", None)
+        if callable(close):
+            with contextlib.suppress(Exception):
+                close()
+
+
+config.register_reset_hook(reset)
@@ -0,0 +1,212 @@
+"""Hedged LLM requests: race a secondary provider when the primary is slow.
+
+一次プロバイダが直近レイテンシの分位点（既定 p95）を過ぎても応答しない場合に限り、同じ
+プロンプトを二次プロバイダへも投げ、先に「妥当な JSON」を返した方を採用する。負けた側には
+キャンセル（``threading.Event``）を通知し、呼び出し側はストリームを閉じて生成を打ち切る。
+一次が分位点内に返る通常時は追加コストが発生しない（テールだけをヘッジする）。
+待ち時間は一次がワーカーで実際に走り始めてから数える（プールの待ち行列の時間は含めない）。
+
+- ``race(primary, secondary, call)``: ``call(provider, cancel_event)`` を実行し (勝者, 結果, hedged) を返す。
+  ``cancel_event`` は ``CancelEvent``。``add_callback(close)`` で登録した関数は勝敗確定時に決着側の
+  スレッドから呼ばれるので、最初のチャンク前で止まっている負け側の HTTP ストリームも即座に閉じられる
+- 一次が ``AUTOEDA_LLM_HEDGE_QUEUE_SEC`` 以内にプールで走り始めない（ワーカーが埋まっている）場合は
+  キューから取り下げ、ヘッジせず呼び出しスレッドで直接実行する
+- メトリクス: ``autoeda_llm_hedge_calls_total`` / ``autoeda_llm_hedge_fired_total`` /
+  ``autoeda_llm_hedge_wins_total{role}``（/metrics）と ``stats()`` の hedge_rate / win_rate
+- ENV: AUTOEDA_LLM_HEDGE=0（1 で有効）/ AUTOEDA_LLM_HEDGE_SECONDARY（既定はもう一方のプロバイダ）/
+  AUTOEDA_LLM_HEDGE_QUANTILE=0.95 / AUTOEDA_LLM_HEDGE_MIN_SAMPLES=20 /
+  AUTOEDA_LLM_HEDGE_DELAY_SEC=5（サンプル不足時の待ち時間）/ AUTOEDA_LLM_HEDGE_WINDOW=200 /
+  AUTOEDA_LLM_HEDGE_QUEUE_SEC=0.5
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from apps.api import config
+
+from . import prometheus
+
+T = TypeVar("T")
+
+_CALLS = prometheus.counter("autoeda_llm_hedge_calls_total", "LLM calls eligible for hedging.", ("primary",))
+_FIRED = prometheus.counter("autoeda_llm_hedge_fired_total", "Hedge requests sent to the secondary provider.", ("primary",))
+_WINS = prometheus.counter("autoeda_llm_hedge_wins_total", "Winner of hedged races.", ("role",))
+
+_LOCK = threading.Lock()
+_LATENCIES: Dict[str, Deque[float]] = {}
+_STATS = {"calls": 0, "hedged": 0, "direct": 0, "primary_wins": 0, "secondary_wins": 0}
+_POOL: Optional[ThreadPoolExecutor] = None
+
+
+class Cancelled(RuntimeError):
+    """Raised inside a losing call once the race has been decided."""
+
+
+class CancelEvent(threading.Event):
+    """``threading.Event`` that also runs registered callbacks (e.g. closing a stream) when set."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._callbacks: List[Callable[[], None]] = []
+        self._callbacks_lock = threading.Lock()
+
+    def add_callback(self, fn: Callable[[], None]) -> None:
+        """Run ``fn`` on ``set()`` (immediately if already set)."""
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(fn)
+                return
+        with contextlib.suppress(Exception):
+            fn()
+
+    def set(self) -> None:
+        with self._callbacks_lock:
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            with contextlib.suppress(Exception):
+                fn()
+
+
+def enabled() -> bool:
+    return os.environ.get("AUTOEDA_LLM_HEDGE", "0") in {"1", "true", "TRUE"}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+def secondary_for(primary: str) -> Optional[str]:
+    """Configured hedge target for ``primary`` (None when hedging is impossible)."""
+    name = (os.environ.get("AUTOEDA_LLM_HEDGE_SECONDARY") or "").lower()
+    if not name:
+        others = sorted(config.SUPPORTED_PROVIDERS - {primary})
+        name = others[0] if others else ""
+    if not name or name == primary or not config.is_provider_configured(name):
+        return None
+    return name
+
+
+def record_latency(provider: str, seconds: float) -> None:
+    window = max(1, int(_env_float("AUTOEDA_LLM_HEDGE_WINDOW", 200)))
+    with _LOCK:
+        buf = _LATENCIES.get(provider)
+        if buf is None or buf.maxlen != window:
+            buf = _LATENCIES[provider] = deque(buf or (), maxlen=window)
+        buf.append(seconds)
+
+
+def hedge_delay(provider: str) -> float:
+    """Seconds to wait for ``provider`` before hedging: recent latency quantile."""
+    with _LOCK:
+        samples = sorted(_LATENCIES.get(provider) or ())
+    if len(samples) < max(1, int(_env_float("AUTOEDA_LLM_HEDGE_MIN_SAMPLES", 20))):
+        return _env_float("AUTOEDA_LLM_HEDGE_DELAY_SEC", 5.0)
+    q = min(1.0, max(0.0, _env_float("AUTOEDA_LLM_HEDGE_QUANTILE", 0.95)))
+    return samples[min(len(samples) - 1, int(q * (len(samples) - 1) + 0.5))]
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        with _LOCK:
+            if _POOL is None:
+                _POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+    return _POOL
+
+
+def race(primary: str, secondary: str, call: Callable[[str, CancelEvent], T]) -> Tuple[str, T, bool]:
+    """Run ``call(primary)``; if it is still running after ``hedge_delay(primary)`` also run
+    ``call(secondary)`` and return the first success as ``(provider, result, hedged)``.
+
+    ``call`` は失敗（不正 JSON 含む）で例外を投げること。両方失敗した場合は一次の例外を送出する。
+    """
+    cancels = {primary: CancelEvent(), secondary: CancelEvent()}
+    running = {primary: threading.Event(), secondary: threading.Event()}
+    results: "queue.Queue[Tuple[str, Any, Optional[BaseException]]]" = queue.Queue()
+
+    def run(name: str) -> None:
+        running[name].set()
+        started = time.perf_counter()
+        try:
+            res = call(name, cancels[name])
+        except BaseException as exc:  # noqa: BLE001 - forwarded to the waiting caller
+            results.put((name, None, exc))
+            return
+        record_latency(name, time.perf_counter() - started)
+        results.put((name, res, None))
+
+    def submit(name: str) -> Future:
+        ctx = contextvars.copy_context()
+        return _pool().submit(ctx.run, run, name)
+
+    _CALLS.inc((primary,))
+    with _LOCK:
+        _STATS["calls"] += 1
+    fut = submit(primary)
+    # プール待ちの時間はヘッジ待ちに含めない（record_latency と同じく実行開始から数える）。
+    # 混雑時に不要なヘッジを撃つと、二次も同じプールで待つだけでコストだけが増える。
+    # 負け側がワーカーを握ったままプールが埋まっていても無期限には待たず、直接実行へ切り替える
+    if not running[primary].wait(_env_float("AUTOEDA_LLM_HEDGE_QUEUE_SEC", 0.5)) and fut.cancel():
+        with _LOCK:
+            _STATS["direct"] += 1
+        started = time.perf_counter()
+        res = call(primary, cancels[primary])
+        record_latency(primary, time.perf_counter() - started)
+        return primary, res, False
+    pending = {primary}
+    hedged = False
+    try:
+        first: Optional[Tuple[str, Any, Optional[BaseException]]] = results.get(timeout=hedge_delay(primary))
+    except queue.Empty:
+        first = None
+        hedged = True
+        _FIRED.inc((primary,))
+        with _LOCK:
+            _STATS["hedged"] += 1
+        submit(secondary)
+        pending.add(secondary)
+
+    errors: Dict[str, BaseException] = {}
+    while True:
+        name, res, exc = first if first is not None else results.get()
+        first = None
+        pending.discard(name)
+        if exc is None:
+            for other in pending:
+                cancels[other].set()
+            role = "primary" if name == primary else "secondary"
+            if hedged:
+                _WINS.inc((role,))
+                with _LOCK:
+                    _STATS[f"{role}_wins"] += 1
+            return name, res, hedged
+        errors[name] = exc
+        if not pending:
+            raise errors.get(primary) or exc
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        snap: Dict[str, Any] = dict(_STATS)
+    snap["hedge_rate"] = round(snap["hedged"] / snap["calls"], 4) if snap["calls"] else 0.0
+    snap["win_rate"] = round(snap["secondary_wins"] / snap["hedged"], 4) if snap["hedged"] else 0.0
+    return snap
+
+
+def reset() -> None:
+    """テスト用: レイテンシ履歴と統計を破棄する。"""
+    with _LOCK:
+        _LATENCIES.clear()
+        _STATS.update(calls=0, hedged=0, direct=0, primary_wins=0, secondary_wins=0)
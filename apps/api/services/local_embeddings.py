@@ -0,0 +1,89 @@
+"""Offline embedding function: signed feature hashing of n-grams into a dense vector.
+
+OpenAI の鍵が無い（エアギャップ）環境でもベクトル検索できるよう、外部モデル無しで埋め込みを作る。
+
+- 特徴量は ``bm25.tokenize`` と同じ n-gram（英数字は語、日本語は文字 bi-gram）に、英数字語の
+  文字 tri-gram を加えたもの。重みは 1 + log(tf)
+- 各特徴を crc32 で ``dim`` 次元のいずれかへ ±1 の符号付きで写す（ランダム射影と等価）。
+  プロセスや PYTHONHASHSEED に依らず同じベクトルになる
+- 行列はバッチ単位で ``np.add.at`` により一括構築し、行ごとに L2 正規化（内積 = cos 類似度）
+
+次元は ``AUTOEDA_LOCAL_EMBEDDING_DIM``（既定 256）。NumPy が無い環境では ``available()`` が False。
+"""
+from __future__ import annotations
+
+import math
+import os
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Sequence, Tuple
+
+from . import bm25
+
+try:  # pragma: no cover - optional dependency import
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+# 特徴 -> (次元, 符号)。コーパスの語彙は有限なので上限付きで使い回す
+_SLOTS: Dict[Tuple[int, str], Tuple[int, float]] = {}
+_SLOTS_MAX = 200_000
+
+
+def available() -> bool:
+    return np is not None
+
+
+def dim() -> int:
+    try:
+        return max(16, int(os.environ.get("AUTOEDA_LOCAL_EMBEDDING_DIM", "256") or "256"))
+    except ValueError:
+        return 256
+
+
+def model_name() -> str:
+    return f"local-hash-{dim()}"
+
+
+def _features(text: str) -> Counter:
+    tokens = bm25.tokenize(text)
+    feats = Counter(tokens)
+    for token in tokens:
+        if token.isascii() and len(token) > 3:
+            padded = f"<{token}>"
+            feats.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return feats
+
+
+def _slot(feature: str, size: int) -> Tuple[int, float]:
+    key = (size, feature)
+    hit = _SLOTS.get(key)
+    if hit is None:
+        h = zlib.crc32(feature.encode("utf-8"))
+        hit = (h % size, 1.0 if (h >> 31) & 1 else -1.0)
+        if len(_SLOTS) < _SLOTS_MAX:
+            _SLOTS[key] = hit
+    return hit
+
+
+def embed(texts: Sequence[str]) -> Any:
+    """Return a float32 ``(len(texts), dim)`` array of L2-normalised embeddings."""
+    if np is None:
+        raise RuntimeError("numpy is required for local embeddings")
+    size = dim()
+    rows: List[int] = []
+    cols: List[int] = []
+    vals: List[float] = []
+    for row, text in enumerate(texts):
+        for feature, tf in _features(text or "").items():
+            col, sign = _slot(feature, size)
+            rows.append(row)
+            cols.append(col)
+            vals.append(sign * (1.0 + math.log(tf)))
+    out = np.zeros((len(texts), size), dtype=np.float32)
+    if rows:
+        np.add.at(out, (np.asarray(rows), np.asarray(cols)), np.asarray(vals, dtype=np.float32))
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return out / norms
+
@@ -1,103 +1,561 @@
-"""Lightweight in-memory metrics aggregation for NFR監視."""
+"""Lightweight in-memory metrics aggregation for NFR監視.
+
+duration_ms は値を保持せず、イベント毎の対数バケット・ヒストグラム（HDR 風、相対誤差 ~1%）で
+集計する。メモリはバケット数で上限が決まり、パーセンタイルは O(バケット数) で求まる。
+直近 1m/5m/1h の窓集計用に 1 分単位のスロットを最大 60 個保持する。
+"""
 
 from __future__ import annotations
 
+import atexit
 import json
+import math
 import os
 import threading
-from math import floor
+import time
+from collections import deque
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, MutableMapping
+from typing import Any, Deque, Dict, Iterable, List, MutableMapping, Optional
 
 _LOCK = threading.Lock()
-_STORE: MutableMapping[str, Dict[str, List[float]]] = {}
 _EVENT_LOG_PATH = Path(os.getenv("AUTOEDA_METRICS_LOG", "data/metrics/events.jsonl"))
 
+_GAMMA = 1.02  # バケット幅（隣接境界の比）。代表値の相対誤差は (γ-1)/(γ+1) ≒ 1%
+_LOG_GAMMA = math.log(_GAMMA)
+_MIN_TRACKED = 1e-3  # これ未満（0 含む）はゼロバケット
+WINDOWS = {"1m": 1, "5m": 5, "1h": 60}
+_SLOT_HORIZON = max(WINDOWS.values())
+
+
+class LogHistogram:
+    """Mergeable log-bucketed histogram with exact count/min/max."""
+
+    __slots__ = ("counts", "zero", "count", "min", "max")
+
+    def __init__(self) -> None:
+        self.counts: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, n: int = 1) -> None:
+        if not math.isfinite(value):  # NaN/inf はバケットを決められないため捨てる
+            return
+        if value < _MIN_TRACKED:
+            self.zero += n
+        else:
+            key = math.ceil(math.log(value) / _LOG_GAMMA)
+            self.counts[key] = self.counts.get(key, 0) + n
+        self.count += n
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LogHistogram") -> None:
+        for key, n in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + n
+        self.zero += other.zero
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "zero": self.zero,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "buckets": {str(k): n for k, n in sorted(self.counts.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LogHistogram":
+        h = cls()
+        h.counts = {int(k): int(n) for k, n in (data.get("buckets") or {}).items()}
+        h.zero = int(data.get("zero") or 0)
+        h.count = int(data.get("count") or 0)
+        if h.count:
+            h.min = float(data["min"])
+            h.max = float(data["max"])
+        return h
+
+    def _ranks(self, ranks: List[int]) -> List[float]:
+        """Values at the given (ascending) 0-based ranks, by one walk over the buckets."""
+        out: List[float] = []
+        pending = list(ranks)
+        seen = 0
+        buckets = [(None, self.zero)] + sorted(self.counts.items())
+        for key, n in buckets:
+            seen += n
+            while pending and pending[0] < seen:
+                rank = pending.pop(0)
+                if rank == 0:
+                    out.append(self.min)
+                elif rank == self.count - 1:
+                    out.append(self.max)
+                elif key is None:
+                    out.append(max(self.min, 0.0))
+                else:
+                    rep = 2.0 * _GAMMA ** key / (_GAMMA + 1.0)
+                    out.append(min(self.max, max(self.min, rep)))
+            if not pending:
+                break
+        return out
+
+    def quantile(self, q: float) -> float:
+        """Interpolated quantile (same definition as the former sorted-list version)."""
+        if self.count == 0:
+            return 0.0
+        if self.count == 1:
+            return self.min
+        q = max(0.0, min(1.0, q))
+        pos = (self.count - 1) * q
+        lower = math.floor(pos)
+        upper = min(lower + 1, self.count - 1)
+        lo_v, hi_v = self._ranks([lower, upper]) if upper != lower else self._ranks([lower]) * 2
+        return lo_v + (hi_v - lo_v) * (pos - lower)
+
+
+class _Slot:
+    __slots__ = ("minute", "duration", "grounded_min", "grounded_count")
+
+    def __init__(self, minute: int) -> None:
+        self.minute = minute
+        self.duration = LogHistogram()
+        self.grounded_min = math.inf
+        self.grounded_count = 0
+
+
+class _EventStats:
+    """Lifetime aggregate plus per-minute slots for sliding windows."""
+
+    def __init__(self) -> None:
+        self.total = _Slot(-1)
+        self.slots: Deque[_Slot] = deque()
+
+    def add(self, minute: int, duration: Optional[float], groundedness: Optional[float]) -> None:
+        targets = [self.total]
+        newest = self.slots[-1].minute if self.slots else None
+        if newest is None or minute >= newest - _SLOT_HORIZON:
+            slot = next((s for s in reversed(self.slots) if s.minute == minute), None)
+            if slot is None:
+                slot = _Slot(minute)
+                self.slots.append(slot)
+                if newest is not None and minute < newest:
+                    # 過去時刻のイベント（ログ再生など）は順序を保って挿入
+                    self.slots = deque(sorted(self.slots, key=lambda s: s.minute))
+            targets.append(slot)
+        latest = self.slots[-1].minute if self.slots else minute
+        while self.slots and self.slots[0].minute <= latest - _SLOT_HORIZON:
+            self.slots.popleft()
+        for t in targets:
+            if duration is not None:
+                t.duration.add(duration)
+            if groundedness is not None:
+                t.grounded_min = min(t.grounded_min, groundedness)
+                t.grounded_count += 1
+
+    def view(self, minutes: Optional[int], now_minute: int) -> _Slot:
+        if minutes is None:
+            return self.total
+        merged = _Slot(now_minute)
+        for slot in self.slots:
+            if slot.minute > now_minute - minutes:
+                merged.duration.merge(slot.duration)
+                merged.grounded_min = min(merged.grounded_min, slot.grounded_min)
+                merged.grounded_count += slot.grounded_count
+        return merged
+
+
+_STORE: MutableMapping[str, _EventStats] = {}
+
 
 def reset() -> None:
     with _LOCK:
         _STORE.clear()
 
 
+def _event_minute(properties: Dict[str, Any]) -> int:
+    """イベント時刻（timestamp: epoch 秒 or ISO8601）を分単位に。無ければ現在時刻。"""
+    ts = properties.get("timestamp")
+    if isinstance(ts, (int, float)):
+        return int(ts // 60)
+    if isinstance(ts, str) and ts:
+        try:
+            return int(datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp() // 60)
+        except ValueError:
+            pass
+    return int(time.time() // 60)
+
+
 def record_event(event_name: str, **properties: Any) -> None:
     duration = _coerce_float(properties.get("duration_ms"))
     groundedness = _coerce_float(properties.get("groundedness"))
+    minute = _event_minute(properties)
     with _LOCK:
-        bucket = _STORE.setdefault(event_name, {"duration_ms": [], "groundedness": []})
-        if duration is not None:
-            bucket["duration_ms"].append(duration)
-        if groundedness is not None:
-            bucket["groundedness"].append(groundedness)
+        stats = _STORE.get(event_name)
+        if stats is None:
+            stats = _STORE[event_name] = _EventStats()
+        stats.add(minute, duration, groundedness)
 
 
-def persist_event(payload: Dict[str, Any]) -> None:
-    path = get_event_log_path()
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)) or default)
+    except ValueError:
+        return default
 
 
-def load_event_log(path: Path | str | None = None) -> Iterable[Dict[str, Any]]:
-    target = Path(path) if path else get_event_log_path()
-    if not target.exists():
+def _env_flag(name: str, default: str) -> bool:
+    return os.environ.get(name, default) in {"1", "true", "TRUE"}
+
+
+def rotated_segments(path: Path) -> List[Path]:
+    """Rotated segments of ``path`` (``<name>.<UTC timestamp>-<seq>``) in chronological order."""
+    if not path.parent.exists():
         return []
-    with target.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
+    return sorted(p for p in path.parent.glob(path.name + ".*") if not p.name.endswith(".tmp"))
+
+
+def event_log_segments(path: Path) -> List[Path]:
+    segs = rotated_segments(path)
+    if path.exists():
+        segs.append(path)
+    return segs
+
+
+class _EventWriter:
+    """Background JSONL writer: ring buffer + batched (optionally fsync'ed) appends + rotation.
+
+    - persist_event はバッファへ積むだけ（リクエスト経路でファイル I/O をしない）
+    - バッファ上限（AUTOEDA_METRICS_BUFFER）超過時は古いものから捨て、dropped を数える
+    - AUTOEDA_METRICS_FLUSH_MS 毎、または AUTOEDA_METRICS_BATCH 件溜まった時点で書き出す
+    - 書き出し前に AUTOEDA_METRICS_ROTATE_BYTES / AUTOEDA_METRICS_ROTATE_SEC を超えていればローテーション
+    """
+
+    def __init__(self) -> None:
+        self._cv = threading.Condition()
+        self._io_lock = threading.RLock()
+        self._buf: Deque[tuple] = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._segment_started: Dict[str, float] = {}
+        self.dropped = 0
+
+    def submit(self, path: Path, payload: Dict[str, Any]) -> None:
+        cap = max(1, _env_int("AUTOEDA_METRICS_BUFFER", 10_000))
+        with self._cv:
+            if len(self._buf) >= cap:
+                self._buf.popleft()
+                self.dropped += 1
+            self._buf.append((path, payload))
+            if len(self._buf) >= max(1, _env_int("AUTOEDA_METRICS_BATCH", 256)):
+                self._cv.notify()
+            self._ensure_thread()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                self._cv.wait(timeout=max(1, _env_int("AUTOEDA_METRICS_FLUSH_MS", 200)) / 1000.0)
             try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
-                continue
+                self.flush()
+            except Exception:
+                pass
+
+    def flush(self) -> None:
+        with self._io_lock:
+            with self._cv:
+                batch = list(self._buf)
+                self._buf.clear()
+            if not batch:
+                return
+            grouped: Dict[Path, List[Dict[str, Any]]] = {}
+            for path, payload in batch:
+                grouped.setdefault(path, []).append(payload)
+            for path, payloads in grouped.items():
+                self.write(path, payloads)
+
+    def write(self, path: Path, payloads: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(p, ensure_ascii=False) + "\n" for p in payloads)
+        with self._io_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._maybe_rotate(path)
+            with path.open("a", encoding="utf-8") as f:
+                f.write(data)
+                if _env_flag("AUTOEDA_METRICS_FSYNC", "0"):
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def _maybe_rotate(self, path: Path) -> None:
+        key = str(path.absolute())
+        now = time.time()
+        started = self._segment_started.setdefault(key, now)
+        try:
+            size = path.stat().st_size
+        except OSError:
+            self._segment_started[key] = now
+            return
+        max_bytes = _env_int("AUTOEDA_METRICS_ROTATE_BYTES", 16 * 1024 * 1024)
+        max_age = _env_int("AUTOEDA_METRICS_ROTATE_SEC", 3600)
+        if size == 0 or not ((max_bytes > 0 and size >= max_bytes) or (max_age > 0 and now - started >= max_age)):
+            return
+        stamp = datetime.utcfromtimestamp(now).strftime("%Y%m%dT%H%M%S")
+        seq = 0
+        while True:
+            target = path.with_name(f"{path.name}.{stamp}-{seq:04d}")
+            if not target.exists():
+                break
+            seq += 1
+        os.replace(path, target)
+        self._segment_started[key] = now
+
+
+_WRITER = _EventWriter()
+atexit.register(lambda: _WRITER.flush())
+
+
+def persist_event(payload: Dict[str, Any]) -> None:
+    """Append an event to the JSONL log (AUTOEDA_METRICS_ASYNC=0 で同期書き込み)."""
+    path = get_event_log_path()
+    if _env_flag("AUTOEDA_METRICS_ASYNC", "1"):
+        _WRITER.submit(path, dict(payload))
+    else:
+        _WRITER.write(path, [payload])
 
 
-def slo_snapshot() -> Dict[str, Any]:
+def flush_events() -> None:
+    """バッファ済みイベントを書き出す（読み出し前やシャットダウン時に呼ぶ）。"""
+    _WRITER.flush()
+
+
+def load_event_log(path: Path | str | None = None) -> Iterable[Dict[str, Any]]:
+    """Yield events from ``path`` and its rotated segments (oldest first)."""
+    flush_events()
+    target = Path(path) if path else get_event_log_path()
+    for seg in event_log_segments(target):
+        try:
+            f = seg.open("r", encoding="utf-8")
+        except OSError:
+            continue
+        with f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def slo_snapshot(window: Optional[str] = None) -> Dict[str, Any]:
     """Return in-memory percentiles plus lightweight status breakdown from event log.
 
-    - events: p95/groundedness_min/count (in-memory)
+    - events: p95/groundedness_min/count (in-memory; window=1m/5m/1h で直近のみ、None は全期間)
     - breakdown: for key events, success_rate and failure reasons (from persisted JSONL)
     """
+    minutes = _window_minutes(window)
+    now_minute = int(time.time() // 60)
     with _LOCK:
-        events = {name: _summarize(m) for name, m in _STORE.items()}
+        events = {name: _summarize(stats.view(minutes, now_minute)) for name, stats in _STORE.items()}
     breakdown = _status_breakdown(["ChartJobFinished", "ChartBatchFinished"])
     return {"events": events, "breakdown": breakdown}
 
 
+_OK_STATUSES = {"succeeded", "success", "ok"}
+_FAILED_STATUSES = {"failed", "error", "cancelled"}
+
+
+def _snapshot_ring_size() -> int:
+    try:
+        return max(1, int(os.environ.get("AUTOEDA_METRICS_SNAPSHOT_RING", "200") or "200"))
+    except ValueError:
+        return 200
+
+
+class _EventLogIndex:
+    """Incremental reader of the JSONL event log.
+
+    保存済みバイトオフセットから追記分だけを読み、イベント毎のステータス件数と
+    データセット毎の ChartBatchSnapshot リングバッファを更新する。初回はローテーション済み
+    セグメントも含めて構築し、ローテーション（inode 変化）時は旧セグメントの残りを読み切って
+    から新ファイルへ移る。差し替え（先頭バイト変化・縮小）を検知したら全体を読み直す。
+    """
+
+    _HEAD_BYTES = 64
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._primed = False
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self.offset = 0
+        self.inode: Optional[int] = None
+        self.head = b""
+        self.status: Dict[str, Dict[str, Any]] = {}
+        # None キー = 全データセット
+        self.snapshots: Dict[Optional[str], List[Dict[str, Any]]] = {}
+
+    def _rebuild(self) -> None:
+        self._reset_state()
+        # compact_segments で畳み込まれた古い期間の件数を先に積む（元セグメントは削除済み）
+        for rec in load_hourly_aggregates(self.path):
+            self._apply_hourly(rec)
+        for seg in rotated_segments(self.path):
+            self._consume(seg, 0)
+        self._primed = True
+
+    def _consume(self, path: Path, offset: int) -> int:
+        """Apply complete lines of ``path`` after ``offset``; returns the new offset."""
+        try:
+            with path.open("rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return offset
+        end = data.rfind(b"\n")
+        if end < 0:
+            return offset  # 行が完結するまで待つ
+        for raw in data[: end + 1].splitlines():
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                rec = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(rec, dict):
+                self._apply(rec)
+        return offset + end + 1
+
+    def _segments_since(self, inode: int) -> Optional[List[Path]]:
+        """Rotated segments starting at the one holding ``inode`` (None if it is gone)."""
+        segs = rotated_segments(self.path)
+        for i in range(len(segs) - 1, -1, -1):
+            try:
+                if segs[i].stat().st_ino == inode:
+                    return segs[i:]
+            except OSError:
+                continue
+        return None
+
+    def refresh(self) -> None:
+        with self._lock:
+            if not self._primed:
+                self._rebuild()
+            try:
+                st = self.path.stat()
+            except OSError:
+                st = None
+            if self.inode is not None and (st is None or st.st_ino != self.inode):
+                segs = self._segments_since(self.inode)
+                if segs is None:
+                    self._rebuild()
+                else:
+                    # 旧セグメントの残り + その後に回った全セグメントを読んでから新ファイルへ
+                    self._consume(segs[0], self.offset)
+                    for seg in segs[1:]:
+                        self._consume(seg, 0)
+                    self.offset, self.inode, self.head = 0, None, b""
+            if st is None:
+                return
+            with self.path.open("rb") as f:
+                head = f.read(self._HEAD_BYTES)
+            if st.st_size < self.offset or head[: len(self.head)] != self.head:
+                self._rebuild()
+            self.inode = st.st_ino
+            if len(self.head) < self._HEAD_BYTES:
+                self.head = head
+            if st.st_size != self.offset:
+                self.offset = self._consume(self.path, self.offset)
+
+    def _apply(self, rec: Dict[str, Any]) -> None:
+        name = rec.get("event_name")
+        if not name:
+            return
+        c = self.status.get(name)
+        if c is None:
+            c = self.status[name] = {"total": 0, "ok": 0, "failures": 0, "by_code": {}}
+        c["total"] += 1
+        status = str(rec.get("status") or "").lower()
+        if status in _OK_STATUSES:
+            c["ok"] += 1
+        elif status in _FAILED_STATUSES:
+            c["failures"] += 1
+            code = str(rec.get("error_code") or rec.get("error") or "unknown")
+            c["by_code"][code] = c["by_code"].get(code, 0) + 1
+        if name == "ChartBatchSnapshot":
+            cap = _snapshot_ring_size()
+            for key in {None, rec.get("dataset_id")}:
+                ring = self.snapshots.setdefault(key, [])
+                # timestamp 順を保つ（通常は末尾追加で O(1)）
+                ts = str(rec.get("timestamp", ""))
+                i = len(ring)
+                while i > 0 and str(ring[i - 1].get("timestamp", "")) > ts:
+                    i -= 1
+                ring.insert(i, rec)
+                if len(ring) > cap:
+                    del ring[: len(ring) - cap]
+
+    def _apply_hourly(self, rec: Dict[str, Any]) -> None:
+        c = self.status.setdefault(rec["event_name"], {"total": 0, "ok": 0, "failures": 0, "by_code": {}})
+        c["total"] += int(rec.get("count") or 0)
+        for status, n in (rec.get("status") or {}).items():
+            if status in _OK_STATUSES:
+                c["ok"] += int(n)
+            elif status in _FAILED_STATUSES:
+                c["failures"] += int(n)
+        for code, n in (rec.get("error_codes") or {}).items():
+            c["by_code"][code] = c["by_code"].get(code, 0) + int(n)
+
+    def status_counts(self, event_name: str) -> Dict[str, Any]:
+        with self._lock:
+            c = self.status.get(event_name) or {"total": 0, "ok": 0, "failures": 0, "by_code": {}}
+            return {**c, "by_code": dict(c["by_code"])}
+
+    def recent_snapshots(self, limit: int, dataset_id: Optional[str]) -> List[Dict[str, Any]]:
+        with self._lock:
+            ring = self.snapshots.get(dataset_id) or []
+            return list(ring[-limit:]) if limit > 0 else []
+
+
+_INDEXES: Dict[str, _EventLogIndex] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+def _event_index() -> _EventLogIndex:
+    flush_events()
+    path = get_event_log_path()
+    key = str(path.absolute())
+    with _INDEX_LOCK:
+        idx = _INDEXES.get(key)
+        if idx is None:
+            idx = _INDEXES[key] = _EventLogIndex(path)
+    idx.refresh()
+    return idx
+
+
 def _status_breakdown(event_names: List[str]) -> Dict[str, Any]:
+    idx = _event_index()
     counters: Dict[str, Any] = {}
     for ev in event_names:
-        total = 0
-        ok = 0
-        failures = 0
-        by_code: Dict[str, int] = {}
-        for rec in load_event_log():
-            if rec.get("event_name") != ev:
-                continue
-            total += 1
-            status = str(rec.get("status") or "").lower()
-            if status in {"succeeded", "success", "ok"}:
-                ok += 1
-            elif status in {"failed", "error", "cancelled"}:
-                failures += 1
-                code = str(rec.get("error_code") or rec.get("error") or "unknown")
-                by_code[code] = by_code.get(code, 0) + 1
-        rate = (ok / total) if total else 0.0
-        counters[ev] = {"total": total, "success_rate": round(rate, 3), "failures": failures, "failure_by_code": by_code}
+        c = idx.status_counts(ev)
+        total = c["total"]
+        rate = (c["ok"] / total) if total else 0.0
+        counters[ev] = {"total": total, "success_rate": round(rate, 3), "failures": c["failures"], "failure_by_code": c["by_code"]}
     return counters
 
 
 def recent_batch_snapshots(limit: int = 12, dataset_id: str | None = None) -> List[Dict[str, Any]]:
     """Return latest N ChartBatchSnapshot events (optionally filtered by dataset_id)."""
-    events: List[Dict[str, Any]] = []
-    for rec in load_event_log():
-        if rec.get("event_name") != "ChartBatchSnapshot":
-            continue
-        if dataset_id and rec.get("dataset_id") != dataset_id:
-            continue
-        events.append(rec)
-    events.sort(key=lambda r: str(r.get("timestamp", "")))
-    return events[-limit:]
+    return _event_index().recent_snapshots(limit, dataset_id)
 
 
 def charts_summary(limit: int = 12, dataset_id: str | None = None) -> Dict[str, Any]:
@@ -121,8 +579,8 @@ def charts_summary(limit: int = 12, dataset_id: str | None = None) -> Dict[str,
     return {"served_pct": served_pct_list[-1] if served_pct_list else 0, "avg_wait_ms": avg_wait, "series": served_pct_list}
 
 
-def detect_violations(slo_config: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, bool]]:
-    snapshot = slo_snapshot()["events"]
+def detect_violations(slo_config: Dict[str, Dict[str, float]], window: Optional[str] = None) -> Dict[str, Dict[str, bool]]:
+    snapshot = slo_snapshot(window)["events"]
     report: Dict[str, Dict[str, bool]] = {}
     for name, thresholds in slo_config.items():
         summary = snapshot.get(name, {"count": 0, "p95": 0.0, "groundedness_min": 1.0})
@@ -137,6 +595,7 @@ def detect_violations(slo_config: Dict[str, Dict[str, float]]) -> Dict[str, Dict
 
 def set_event_log_path(path: Path | str) -> None:
     global _EVENT_LOG_PATH
+    flush_events()
     _EVENT_LOG_PATH = Path(path)
 
 
@@ -158,37 +617,139 @@ def bootstrap_from_events(events: Iterable[Dict[str, Any]]) -> None:
         record_event(name, **props)
 
 
-def _summarize(metrics: Dict[str, List[float]]) -> Dict[str, Any]:
-    durations = metrics.get("duration_ms", [])
-    grounded = metrics.get("groundedness", [])
-    count = len(durations) or len(grounded)
-    summary: Dict[str, Any] = {"count": count, "p95": 0.0, "groundedness_min": 1.0}
-    if durations:
-        summary["p95"] = _percentile(durations, 0.95)
-    if grounded:
-        summary["groundedness_min"] = min(grounded)
-    return summary
+def hourly_aggregate_path(path: Path | str | None = None) -> Path:
+    target = Path(path) if path else get_event_log_path()
+    return target.with_name(f"{target.stem}.hourly.jsonl")
 
 
-def _percentile(values: List[float], percentile: float) -> float:
-    if not values:
-        return 0.0
-    percentile = max(0.0, min(1.0, percentile))
-    ordered = sorted(values)
-    if len(ordered) == 1:
-        return ordered[0]
-    pos = (len(ordered) - 1) * percentile
-    lower_index = floor(pos)
-    upper_index = min(lower_index + 1, len(ordered) - 1)
-    fraction = pos - lower_index
-    interpolated = ordered[lower_index] + (ordered[upper_index] - ordered[lower_index]) * fraction
-    return round(interpolated)
+def load_hourly_aggregates(path: Path | str | None = None) -> List[Dict[str, Any]]:
+    """Rows written by :func:`compact_segments` for ``path`` (empty if nothing was compacted)."""
+    out_path = hourly_aggregate_path(path)
+    if not out_path.exists():
+        return []
+    return [rec for rec in load_event_log(out_path) if isinstance(rec, dict) and rec.get("event_name")]
+
+
+def merge_hourly_aggregates(rows: Iterable[Dict[str, Any]]) -> None:
+    """Fold compacted hourly rows into the lifetime totals (1m/5m/1h の窓には入れない)."""
+    with _LOCK:
+        for rec in rows:
+            name = rec.get("event_name")
+            if not name:
+                continue
+            stats = _STORE.get(name)
+            if stats is None:
+                stats = _STORE[name] = _EventStats()
+            stats.total.duration.merge(LogHistogram.from_dict((rec.get("duration_ms") or {}).get("histogram") or {}))
+            grounded = _coerce_float(rec.get("groundedness_min"))
+            if grounded is not None:
+                stats.total.grounded_min = min(stats.total.grounded_min, grounded)
+                stats.total.grounded_count += int(rec.get("groundedness_count") or 1)
+
+
+def compact_segments(path: Path | str | None = None, *, older_than_sec: int = 86_400, now: Optional[float] = None) -> Dict[str, Any]:
+    """Roll rotated segments older than ``older_than_sec`` into per-hour aggregates.
+
+    集計は ``<stem>.hourly.jsonl`` に (hour, event_name) 毎の 1 行で保持し、既存行とマージする
+    （duration_ms はヒストグラムごと保存するため p95 等を再計算できる）。処理済みセグメントは削除し、
+    以後は ``load_hourly_aggregates`` 経由で check_slo（``merge_hourly_aggregates``）とステータス内訳が読む。
+    """
+    flush_events()
+    target = Path(path) if path else get_event_log_path()
+    out_path = hourly_aggregate_path(target)
+    cutoff = (time.time() if now is None else now) - older_than_sec
+    segments = [seg for seg in rotated_segments(target) if seg.stat().st_mtime <= cutoff]
+
+    aggregates: Dict[tuple, Dict[str, Any]] = {}
+    if out_path.exists():
+        for rec in load_event_log(out_path):
+            key = (rec.get("hour"), rec.get("event_name"))
+            rec["_hist"] = LogHistogram.from_dict((rec.get("duration_ms") or {}).get("histogram") or {})
+            aggregates[key] = rec
+
+    events = 0
+    for seg in segments:
+        fallback_hour = datetime.utcfromtimestamp(seg.stat().st_mtime).strftime("%Y-%m-%dT%H:00:00Z")
+        with seg.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                name = rec.get("event_name") if isinstance(rec, dict) else None
+                if not name:
+                    continue
+                events += 1
+                hour = fallback_hour
+                minute = _event_minute(rec) if rec.get("timestamp") else None
+                if minute is not None:
+                    hour = datetime.utcfromtimestamp(minute * 60).strftime("%Y-%m-%dT%H:00:00Z")
+                agg = aggregates.get((hour, name))
+                if agg is None:
+                    agg = aggregates[(hour, name)] = {
+                        "hour": hour, "event_name": name, "count": 0, "status": {}, "error_codes": {},
+                        "groundedness_min": None, "groundedness_count": 0, "_hist": LogHistogram(),
+                    }
+                agg["count"] += 1
+                status = str(rec.get("status") or "").lower()
+                if status:
+                    agg["status"][status] = agg["status"].get(status, 0) + 1
+                if status in _FAILED_STATUSES:
+                    code = str(rec.get("error_code") or rec.get("error") or "unknown")
+                    agg["error_codes"][code] = agg["error_codes"].get(code, 0) + 1
+                duration = _coerce_float(rec.get("duration_ms"))
+                if duration is not None:
+                    agg["_hist"].add(duration)
+                grounded = _coerce_float(rec.get("groundedness"))
+                if grounded is not None:
+                    prev = agg["groundedness_min"]
+                    agg["groundedness_min"] = grounded if prev is None else min(prev, grounded)
+                    agg["groundedness_count"] = int(agg.get("groundedness_count") or 0) + 1
+
+    if segments:
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out_path.with_name(out_path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for key in sorted(aggregates):
+                agg = dict(aggregates[key])
+                hist: LogHistogram = agg.pop("_hist")
+                agg["duration_ms"] = {
+                    "count": hist.count,
+                    "p50": round(hist.quantile(0.5)) if hist.count else None,
+                    "p95": round(hist.quantile(0.95)) if hist.count else None,
+                    "max": hist.max if hist.count else None,
+                    "histogram": hist.to_dict(),
+                }
+                f.write(json.dumps(agg, ensure_ascii=False) + "\n")
+        os.replace(tmp, out_path)
+        for seg in segments:
+            seg.unlink()
+    return {"segments": [str(seg) for seg in segments], "events": events, "hours": len(aggregates), "output": str(out_path)}
+
+
+def _window_minutes(window: Optional[str]) -> Optional[int]:
+    if window is None or window == "":
+        return None
+    if window not in WINDOWS:
+        raise ValueError(f"unsupported window: {window} (expected one of {', '.join(WINDOWS)})")
+    return WINDOWS[window]
+
+
+def _summarize(slot: _Slot) -> Dict[str, Any]:
+    count = slot.duration.count or slot.grounded_count
+    summary: Dict[str, Any] = {"count": count, "p95": 0.0, "groundedness_min": 1.0}
+    if slot.duration.count:
+        summary["p95"] = round(slot.duration.quantile(0.95))
+    if slot.grounded_count:
+        summary["groundedness_min"] = slot.grounded_min
+    return summary
 
 
 def _coerce_float(value: Any) -> float | None:
     if value is None:
         return None
     try:
-        return float(value)
+        f = float(value)
     except (TypeError, ValueError):
         return None
+    return f if math.isfinite(f) else None
@@ -7,16 +7,18 @@ LLM 失敗時にはツールの結果のみを基に安全なレスポンスへ
 
 from __future__ import annotations
 
+import contextvars
 import json
 import logging
 import os
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Tuple
 import threading
 
 from apps.api import config
 
-from . import rag, tools
+from . import json_stream, llm_cache, llm_clients, llm_hedge, profiling, prompt_budget, rag, report_store, singleflight, tools
 
 try:
     from openai import OpenAI  # type: ignore
@@ -44,9 +46,16 @@ _REQUIRED_KEYS: Tuple[str, ...] = (
 OrchestrationResult = Tuple[Dict[str, Any], Dict[str, Any]]
 
 _rag_seeded = False
+# 直近の LLM 呼び出しがキャッシュヒットしたか（"hit" / "miss" / None=未使用・無効）
+_LLM_CACHE_STATUS: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("autoeda_llm_cache", default=None)
+# 直近に組み立てたプロンプトのトークン数と取捨の内訳（prompt_budget.build_user_prompt の stats）
+_PROMPT_STATS: "contextvars.ContextVar[Optional[Dict[str, Any]]]" = contextvars.ContextVar("autoeda_prompt_stats", default=None)
+# 実際に応答したプロバイダとヘッジの有無（llm_hedge.race 使用時は勝者）
+_LLM_ROUTE: "contextvars.ContextVar[Optional[Dict[str, Any]]]" = contextvars.ContextVar("autoeda_llm_route", default=None)
 _rag_seed_lock = threading.Lock()
 
 
+@singleflight.coalesce("eda", lambda dataset_id, sample_ratio=None: (dataset_id, sample_ratio))
 def generate_eda_report(dataset_id: str, sample_ratio: Optional[float] = None) -> OrchestrationResult:
     """Compose the high-level EDA report required by A1 with RAG/LLM support."""
 
@@ -57,21 +66,23 @@ def generate_eda_report(dataset_id: str, sample_ratio: Optional[float] = None) -
                 rag.load_default_corpus()
                 _rag_seeded = True
 
-    profile = tools.profile_api(dataset_id, sample_ratio)
-    pii = _safe_tool_call(lambda: tools.pii_scan(dataset_id))
-    leakage = _safe_tool_call(lambda: tools.leakage_scan(dataset_id))
-
-    report = _ensure_defaults(profile)
-    report = _enrich_references(report, pii, leakage)
+    if _fanout_enabled():
+        report, pii, leakage, context = _gather_concurrent(dataset_id, sample_ratio)
+    else:
+        report, pii, leakage, context = _gather_sequential(dataset_id, sample_ratio)
 
     llm_payload: Optional[Dict[str, Any]] = None
     llm_latency_ms: Optional[int] = None
     llm_error: Optional[str] = None
     fallback_applied = False
+    context_docs: Optional[List[Dict[str, Any]]] = None
 
+    _LLM_CACHE_STATUS.set(None)
+    _PROMPT_STATS.set(None)
+    _LLM_ROUTE.set(None)
     try:
         t0 = time.perf_counter()
-        context_docs = _retrieve_context(report)
+        context_docs = context()
         llm_payload = _invoke_llm_agent(dataset_id, report, pii, leakage, context_docs)
         llm_latency_ms = int((time.perf_counter() - t0) * 1000)
         if llm_payload:
@@ -83,15 +94,82 @@ def generate_eda_report(dataset_id: str, sample_ratio: Optional[float] = None) -
         fallback_applied = True
 
     if not llm_payload:
-        report = _tool_only_enrichment(report, pii, leakage)
+        report = _tool_only_enrichment(report, pii, leakage, context_docs)
         fallback_applied = True if llm_error or llm_payload is None else fallback_applied
 
-    report = _finalize_report(report)
-    evaluation = _evaluate(report, llm_latency_ms, llm_error, fallback_applied)
+    with profiling.span("finalize"):
+        report = _finalize_report(report)
+        evaluation = _evaluate(
+            report,
+            llm_latency_ms,
+            llm_error,
+            fallback_applied,
+            llm_cache=_LLM_CACHE_STATUS.get(),
+            prompt_stats=_PROMPT_STATS.get(),
+            llm_route=_LLM_ROUTE.get(),
+        )
 
+    # QnA / followup / plan / recipes が再利用する（PII/リーク状態の変更で失効）
+    report_store.save(
+        dataset_id,
+        report,
+        evaluation,
+        pii=pii,
+        leakage=leakage,
+        context_docs=context_docs,
+        sample_ratio=sample_ratio,
+    )
     return report, evaluation
 
 
+_Gathered = Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[Dict[str, Any]], Callable[[], List[Dict[str, Any]]]]
+
+
+def _fanout_enabled() -> bool:
+    return os.environ.get("AUTOEDA_EDA_CONCURRENT", "1") in {"1", "true", "TRUE"}
+
+
+def _profile_stage(dataset_id: str, sample_ratio: Optional[float]) -> Dict[str, Any]:
+    with profiling.span("profile"):
+        return tools.profile_api(dataset_id, sample_ratio)
+
+
+def _gather_sequential(dataset_id: str, sample_ratio: Optional[float]) -> _Gathered:
+    profile = _profile_stage(dataset_id, sample_ratio)
+    pii = _safe_tool_call(lambda: tools.pii_scan(dataset_id))
+    leakage = _safe_tool_call(lambda: tools.leakage_scan(dataset_id))
+    report = _enrich_references(_ensure_defaults(profile), pii, leakage)
+    return report, pii, leakage, lambda: _retrieve_context(report)
+
+
+def _gather_concurrent(dataset_id: str, sample_ratio: Optional[float]) -> _Gathered:
+    """profile / pii / leakage を並行実行し、profile 完了時点で RAG 取得を先行開始する。
+
+    - データセットは 1 度だけパースして profile_api と pii_scan で共有（tools.shared_dataset_scope）
+    - 各タスクは contextvars を引き継ぐ（span がリクエストのタイミングツリーに載る）
+    - 依存待ちのデッドロックを避けるため、タスク数分のワーカーを持つリクエスト専用プールを使う
+    """
+    pool = ThreadPoolExecutor(max_workers=5, thread_name_prefix="eda-fanout")
+
+    def submit(fn: Callable[..., Any], *args: Any) -> Any:
+        return pool.submit(contextvars.copy_context().run, fn, *args)
+
+    try:
+        with tools.shared_dataset_scope():
+            tools.prefetch_dataset(dataset_id, sample_ratio, submit)
+            profile_f = submit(_profile_stage, dataset_id, sample_ratio)
+            pii_f = submit(_safe_tool_call, lambda: tools.pii_scan(dataset_id))
+            leakage_f = submit(_safe_tool_call, lambda: tools.leakage_scan(dataset_id))
+            report = _ensure_defaults(profile_f.result())
+            # RAG の検索語は summary/issues だけに依存するので pii/leakage を待たずに開始
+            context_f = submit(_retrieve_context, report)
+            pii, leakage = pii_f.result(), leakage_f.result()
+        report = _enrich_references(report, pii, leakage)
+    finally:
+        pool.shutdown(wait=False)
+    return report, pii, leakage, context_f.result
+
+
 # ---------------------------------------------------------------------------
 # QnA (B1)
 # ---------------------------------------------------------------------------
@@ -102,6 +180,136 @@ def answer_qna(dataset_id: str, question: str) -> List[Dict[str, Any]]:
     Falls back to tool-only stats_qna when LLM is unavailable or fails.
     """
     try:
+        provider, api_key, model_name, prompt = _prepare_qna(dataset_id, question)
+        cache_key = llm_cache.make_key(provider, model_name, 0.2, prompt, dataset_id)
+        cached = llm_cache.get(dataset_id, cache_key)
+
+        text: Optional[str] = cached
+        if cached is None:
+            if provider == "gemini":
+                if genai is None:
+                    raise RuntimeError("Gemini client library not installed")
+                model = llm_clients.gemini_model(genai, api_key, model_name, prompt["system"])
+                response = model.generate_content(
+                    prompt["user"],
+                    generation_config=_gemini_config(0.2, 800),
+                    request_options={"timeout": llm_clients.call_timeout()},
+                )
+                text = _extract_gemini_text(response)
+                if not text:
+                    msg = _gemini_block_message(response)
+                    if msg:
+                        raise RuntimeError(msg)
+            else:
+                if OpenAI is None:
+                    raise RuntimeError("OpenAI client library not installed")
+                client = llm_clients.openai_client(api_key, OpenAI)
+                response = client.responses.create(**_openai_request(model_name, prompt))
+                text = _extract_text(response)
+
+        if not text:
+            raise RuntimeError("empty response from LLM")
+
+        result = _parse_qna_answers(text)
+        if not result:
+            raise RuntimeError("LLM returned empty answers")
+
+        if cached is None:
+            llm_cache.put(dataset_id, cache_key, text, provider=provider, model=model_name, kind="qna")
+        return result
+    except Exception:
+        LOGGER.warning("QnA LLM failed; falling back to tool-only answer", exc_info=True)
+        return tools.stats_qna(dataset_id, question)
+
+
+def stream_qna(dataset_id: str, question: str) -> Iterator[Dict[str, Any]]:
+    """Streaming variant of :func:`answer_qna` (NDJSON 用のイベント列を返す).
+
+    - ``{"type": "delta", "text": ...}``: LLM のトークン片をそのまま転送
+    - ``{"type": "answer", "answer": {...}}``: answers 配列の要素が閉じた時点で 1 件ずつ
+    - ``{"type": "done", "fallback": bool, "llm_cache": ..., "error": ...}``: 終端
+
+    ストリームが失敗した場合のみ tool-only（stats_qna）へフォールバックする。既に回答を
+    送出済みなら重複させず、エラーを done に載せて終える。
+    """
+    emitted = 0
+    cache_status: Optional[str] = None
+    _PROMPT_STATS.set(None)
+    try:
+        provider, api_key, model_name, prompt = _prepare_qna(dataset_id, question)
+        cache_key = llm_cache.make_key(provider, model_name, 0.2, prompt, dataset_id)
+        cached = llm_cache.get(dataset_id, cache_key)
+        cache_status = "hit" if cached is not None else ("miss" if llm_cache.enabled() else None)
+        chunks = iter([cached]) if cached is not None else _stream_llm_text(provider, api_key, model_name, prompt)
+
+        parser = json_stream.AnswerStreamParser()
+        for chunk in chunks:
+            if not chunk:
+                continue
+            yield {"type": "delta", "text": chunk}
+            for ans in parser.feed(chunk):
+                emitted += 1
+                yield {"type": "answer", "answer": _normalize_answer(ans)}
+        if not parser.text:
+            raise RuntimeError("empty response from LLM")
+        if not emitted:
+            # 単一オブジェクト等、配列要素として拾えない形は全文で解釈する
+            for ans in _parse_qna_answers(parser.text):
+                emitted += 1
+                yield {"type": "answer", "answer": ans}
+        if not emitted:
+            raise RuntimeError("LLM returned empty answers")
+        if cached is None:
+            llm_cache.put(dataset_id, cache_key, parser.text, provider=provider, model=model_name, kind="qna")
+        yield {"type": "done", "fallback": False, "llm_cache": cache_status, "error": None, "prompt_tokens": _prompt_tokens()}
+    except Exception as exc:
+        LOGGER.warning("QnA LLM stream failed", exc_info=True)
+        if emitted:
+            yield {"type": "done", "fallback": False, "llm_cache": cache_status, "error": str(exc), "prompt_tokens": _prompt_tokens()}
+            return
+        for ans in tools.stats_qna(dataset_id, question):
+            yield {"type": "answer", "answer": ans}
+        yield {"type": "done", "fallback": True, "llm_cache": cache_status, "error": str(exc), "prompt_tokens": _prompt_tokens()}
+
+
+def _prompt_tokens() -> Optional[int]:
+    return (_PROMPT_STATS.get() or {}).get("prompt_tokens")
+
+
+def _gemini_config(temperature: float, max_output_tokens: int) -> Dict[str, Any]:
+    return {
+        "temperature": temperature,
+        "max_output_tokens": max_output_tokens,
+        "response_mime_type": "application/json",
+    }
+
+
+def _openai_request(
+    model_name: str, prompt: Dict[str, str], *, temperature: float = 0.2, max_output_tokens: int = 800
+) -> Dict[str, Any]:
+    return {
+        "model": model_name,
+        "input": [
+            {"role": "system", "content": prompt["system"]},
+            {"role": "user", "content": prompt["user"]},
+        ],
+        "temperature": temperature,
+        "max_output_tokens": max_output_tokens,
+        "timeout": llm_clients.call_timeout(),
+    }
+
+
+def _prepare_qna(dataset_id: str, question: str) -> Tuple[str, str, str, Dict[str, str]]:
+    """Gather tool context and resolve (provider, api_key, model_name, prompt) for QnA.
+
+    直前の /api/eda のスナップショットがあればそれを使い、ツールと RAG を再実行しない。
+    """
+    snapshot = report_store.load(dataset_id)
+    if snapshot is not None:
+        report = snapshot["report"]
+        pii, leakage = snapshot.get("pii"), snapshot.get("leakage")
+        context_docs = snapshot.get("context_docs") or []
+    else:
         # Build a light-weight context using EDA tools (no heavy profiling)
         profile = tools.profile_api(dataset_id)
         pii = _safe_tool_call(lambda: tools.pii_scan(dataset_id))
@@ -109,77 +317,106 @@ def answer_qna(dataset_id: str, question: str) -> List[Dict[str, Any]]:
         report = _ensure_defaults(profile)
         context_docs = _retrieve_context(report)
 
-        provider = config.get_llm_provider()
+    provider = config.get_llm_provider()
+    if provider == "gemini":
+        api_key = config.get_gemini_api_key()
+        model_name = os.getenv("AUTOEDA_GEMINI_MODEL", "gemini-2.5-flash")
+    else:
+        api_key = config.get_openai_api_key()
+        model_name = os.getenv("AUTOEDA_LLM_MODEL", "gpt-5-nano")
+    prompt = _build_qna_prompt(dataset_id, question, report, pii, leakage, context_docs, model=model_name)
+    return provider, api_key, model_name, prompt
+
+
+def _stream_llm_text(
+    provider: str,
+    api_key: str,
+    model_name: str,
+    prompt: Dict[str, str],
+    *,
+    temperature: float = 0.2,
+    max_output_tokens: int = 800,
+    on_open: Optional[Callable[[Callable[[], None]], None]] = None,
+) -> Generator[str, None, None]:
+    """Yield response text fragments as the provider streams them (close() で接続も閉じる).
+
+    ``on_open`` には接続確立直後に「下層ストリームを閉じる関数」を渡す。ジェネレータの close() は
+    実行中の別スレッドからは呼べないため、ヘッジの決着側スレッドはこちらで接続を切る。
+    """
+    if provider == "gemini":
+        if genai is None:
+            raise RuntimeError("Gemini client library not installed")
+        model = llm_clients.gemini_model(genai, api_key, model_name, prompt["system"])
+        response = model.generate_content(
+            prompt["user"],
+            generation_config=_gemini_config(temperature, max_output_tokens),
+            request_options={"timeout": llm_clients.call_timeout()},
+            stream=True,
+        )
+        if on_open is not None:
+            on_open(_closer(response))
+        got_text = False
+        for chunk in response:
+            text = _extract_gemini_text(chunk)
+            if text:
+                got_text = True
+                yield text
+        if not got_text:
+            msg = _gemini_block_message(response)
+            if msg:
+                raise RuntimeError(msg)
+        return
+    if OpenAI is None:
+        raise RuntimeError("OpenAI client library not installed")
+    client = llm_clients.openai_client(api_key, OpenAI)
+    stream = client.responses.create(
+        **_openai_request(model_name, prompt, temperature=temperature, max_output_tokens=max_output_tokens),
+        stream=True,
+    )
+    if on_open is not None:
+        on_open(_closer(stream))
+    try:
+        for event in stream:
+            etype = getattr(event, "type", "")
+            if etype == "response.output_text.delta":
+                yield getattr(event, "delta", "") or ""
+            elif etype in {"response.failed", "error"}:
+                err = getattr(event, "error", None) or getattr(getattr(event, "response", None), "error", None)
+                raise RuntimeError(f"LLM stream failed: {getattr(err, 'message', err) or etype}")
+    finally:
+        close = getattr(stream, "close", None)
+        if callable(close):
+            close()
 
-        prompt = _build_qna_prompt(dataset_id, question, report, pii, leakage, context_docs)
 
-        text: Optional[str] = None
-        if provider == "gemini":
-            api_key = config.get_gemini_api_key()
-            if genai is None:
-                raise RuntimeError("Gemini client library not installed")
-            genai.configure(api_key=api_key)
-            model_name = os.getenv("AUTOEDA_GEMINI_MODEL", "gemini-2.5-flash")
-            generation_config = {
-                "temperature": 0.2,
-                "max_output_tokens": 800,
-                "response_mime_type": "application/json",
-            }
-            model = genai.GenerativeModel(model_name, system_instruction=prompt["system"])
-            response = model.generate_content(prompt["user"], generation_config=generation_config)
-            text = _extract_gemini_text(response)
-            if not text:
-                msg = _gemini_block_message(response)
-                if msg:
-                    raise RuntimeError(msg)
-        else:
-            api_key = config.get_openai_api_key()
-            if OpenAI is None:
-                raise RuntimeError("OpenAI client library not installed")
-            model_name = os.getenv("AUTOEDA_LLM_MODEL", "gpt-5-nano")
-            client = OpenAI(api_key=api_key)
-            response = client.responses.create(
-                model=model_name,
-                input=[
-                    {"role": "system", "content": prompt["system"]},
-                    {"role": "user", "content": prompt["user"]},
-                ],
-                temperature=0.2,
-                max_output_tokens=800,
-            )
-            text = _extract_text(response)
+def _closer(stream: Any) -> Callable[[], None]:
+    close = getattr(stream, "close", None)
+    return close if callable(close) else (lambda: None)
 
-        if not text:
-            raise RuntimeError("empty response from LLM")
 
-        try:
-            obj = json.loads(text)
-        except json.JSONDecodeError:
-            from re import search, DOTALL
-            m = search(r"\{.*\}\s*$", text, DOTALL) or search(r"\{.*\}", text, DOTALL)
-            if not m:
-                raise
-            obj = json.loads(m.group(0))
-
-        answers = obj.get("answers") or obj
-        if isinstance(answers, dict):
-            answers = [answers]
-        result: List[Dict[str, Any]] = []
-        for ans in answers or []:
-            text = ans.get("text") or ans.get("answer")
-            refs = ans.get("references") or []
-            cov = float(ans.get("coverage", 0.85))
-            if not isinstance(refs, list):
-                refs = []
-            result.append({"text": text or "", "references": refs, "coverage": cov})
+def _parse_qna_answers(text: str) -> List[Dict[str, Any]]:
+    try:
+        obj = json.loads(text)
+    except json.JSONDecodeError:
+        from re import search, DOTALL
+        m = search(r"\{.*\}\s*$", text, DOTALL) or search(r"\{.*\}", text, DOTALL)
+        if not m:
+            raise
+        obj = json.loads(m.group(0))
 
-        if not result:
-            raise RuntimeError("LLM returned empty answers")
+    answers = obj.get("answers") or obj if isinstance(obj, dict) else obj
+    if isinstance(answers, dict):
+        answers = [answers]
+    return [_normalize_answer(ans) for ans in answers or [] if isinstance(ans, dict)]
 
-        return result
-    except Exception:
-        LOGGER.warning("QnA LLM failed; falling back to tool-only answer", exc_info=True)
-        return tools.stats_qna(dataset_id, question)
+
+def _normalize_answer(ans: Dict[str, Any]) -> Dict[str, Any]:
+    text = ans.get("text") or ans.get("answer")
+    refs = ans.get("references") or []
+    cov = float(ans.get("coverage", 0.85))
+    if not isinstance(refs, list):
+        refs = []
+    return {"text": text or "", "references": refs, "coverage": cov}
 
 
 def _build_qna_prompt(
@@ -189,6 +426,7 @@ def _build_qna_prompt(
     pii: Optional[Dict[str, Any]],
     leakage: Optional[Dict[str, Any]],
     context_docs: List[Dict[str, Any]],
+    model: Optional[str] = None,
 ) -> Dict[str, str]:
     system_prompt = (
         "あなたはAutoEDAのQ&Aアシスタントです。データの統計/品質レポートとRAG文書を根拠に、"
@@ -197,25 +435,26 @@ def _build_qna_prompt(
     )
     summary = report.get("summary", {})
     issues = report.get("data_quality_report", {}).get("issues", [])
-    context_parts = [
-        f"dataset_id: {dataset_id}",
-        f"question: {question}",
-        f"rows: {summary.get('rows')}",
-        f"cols: {summary.get('cols')}",
-        f"missing_rate: {summary.get('missing_rate')}",
-        f"issues: {json.dumps(issues, ensure_ascii=False)}",
-        f"pii: {json.dumps(pii, ensure_ascii=False)}",
-        f"leakage: {json.dumps(leakage, ensure_ascii=False)}",
-    ]
-    context_excerpt = "\n".join(
-        f"- {doc.get('text', '')[:400]}" for doc in context_docs if doc.get("text")
-    )
-    user_prompt = (
-        "\n".join(context_parts)
-        + "\n関連ドキュメント:\n"
-        + context_excerpt
-        + "\n返却形式: {\"answers\": [{\"text\": string, \"references\": Reference[], \"coverage\": number(0..1)}]}"
+    user_prompt, stats = prompt_budget.build_user_prompt(
+        [
+            f"dataset_id: {dataset_id}",
+            f"question: {question}",
+            f"rows: {summary.get('rows')}",
+            f"cols: {summary.get('cols')}",
+            f"missing_rate: {summary.get('missing_rate')}",
+        ],
+        issues,
+        [
+            f"pii: {json.dumps(pii, ensure_ascii=False)}",
+            f"leakage: {json.dumps(leakage, ensure_ascii=False)}",
+        ],
+        context_docs,
+        "\n返却形式: {\"answers\": [{\"text\": string, \"references\": Reference[], \"coverage\": number(0..1)}]}",
+        system=system_prompt,
+        query=f"{question} {_issue_query(issues)}",
+        model=model,
     )
+    _PROMPT_STATS.set(stats)
     return {"system": system_prompt, "user": user_prompt}
 
 
@@ -253,6 +492,7 @@ def _ensure_defaults(report: Dict[str, Any]) -> Dict[str, Any]:
     return data
 
 
+@profiling.traced("rag.retrieve_context")
 def _retrieve_context(report: Dict[str, Any]) -> List[Dict[str, Any]]:
     summary = report.get("summary", {})
     issues = report.get("data_quality_report", {}).get("issues", [])
@@ -283,6 +523,7 @@ def _enrich_references(report: Dict[str, Any], pii: Optional[Dict[str, Any]], le
     return report
 
 
+@profiling.traced("llm.invoke_agent")
 def _invoke_llm_agent(
     dataset_id: str,
     report: Dict[str, Any],
@@ -290,11 +531,63 @@ def _invoke_llm_agent(
     leakage: Optional[Dict[str, Any]],
     context_docs: List[Dict[str, Any]],
 ) -> Optional[Dict[str, Any]]:
-    """Invoke LLM to synthesize insights. Falls back silently if not configured."""
+    """Invoke LLM to synthesize insights. Falls back silently if not configured.
+
+    同一プロンプトの応答はディスクキャッシュ（llm_cache）から返す。hit/miss は
+    ``_LLM_CACHE_STATUS`` に残し、generate_eda_report が evaluation に載せる。
+    AUTOEDA_LLM_HEDGE=1 かつ二次プロバイダが設定済みなら llm_hedge.race でテールをヘッジする。
+    """
 
     provider = config.get_llm_provider()
-    prompt = _build_system_prompt(dataset_id, report, pii, leakage, context_docs)
+    temperature = 0.3
+    api_key, model_name = _resolve_llm(provider)
+
+    prompt = _build_system_prompt(dataset_id, report, pii, leakage, context_docs, model=model_name)
+    cache_key = llm_cache.make_key(provider, model_name, temperature, prompt, dataset_id)
+    text = llm_cache.get(dataset_id, cache_key)
+    cache_hit = text is not None
+    _LLM_CACHE_STATUS.set("hit" if cache_hit else ("miss" if llm_cache.enabled() else None))
+    _LLM_ROUTE.set({"provider": provider, "hedged": False})
+
+    if cache_hit:
+        return _parse_agent_payload(text or "")[1]
+
+    secondary = _hedge_secondary(provider)
+    if secondary is not None:
+        targets = {provider: (api_key, model_name), secondary: _resolve_llm(secondary)}
+
+        def call(name: str, cancel: llm_hedge.CancelEvent) -> Tuple[str, Dict[str, Any]]:
+            key, model = targets[name]
+            parts: List[str] = []
+            # 決着時は勝った側のスレッドから HTTP ストリームを閉じる（最初のチャンク待ちでも即座に切れる）
+            stream = _stream_llm_text(
+                name, key, model, prompt, temperature=temperature, max_output_tokens=1200, on_open=cancel.add_callback
+            )
+            try:
+                for chunk in stream:
+                    if cancel.is_set():
+                        raise llm_hedge.Cancelled(name)
+                    parts.append(chunk)
+            finally:
+                stream.close()  # 負けた側はここで HTTP ストリームを閉じて生成を打ち切る
+            return _parse_agent_payload("".join(parts))
+
+        winner, (text, payload), hedged = llm_hedge.race(provider, secondary, call)
+        _LLM_ROUTE.set({"provider": winner, "hedged": hedged})
+        provider, model_name = winner, targets[winner][1]
+        cache_key = llm_cache.make_key(provider, model_name, temperature, prompt, dataset_id)
+    else:
+        started = time.perf_counter()
+        text, payload = _parse_agent_payload(_agent_text(provider, api_key, model_name, prompt, temperature))
+        llm_hedge.record_latency(provider, time.perf_counter() - started)
 
+    # 解析できた応答だけを保存（壊れた応答を TTL まで再利用しない）
+    llm_cache.put(dataset_id, cache_key, text, provider=provider, model=model_name)
+    return payload
+
+
+def _resolve_llm(provider: str) -> Tuple[str, str]:
+    """Return (api_key, model_name) for ``provider`` or raise RuntimeError when unusable."""
     if provider == "gemini":
         try:
             api_key = config.get_gemini_api_key()
@@ -302,19 +595,38 @@ def _invoke_llm_agent(
             raise RuntimeError(str(exc))
         if genai is None:
             raise RuntimeError("Gemini client library not installed")
+        return api_key, os.getenv("AUTOEDA_GEMINI_MODEL", "gemini-2.5-flash")
+    model_name = os.getenv("AUTOEDA_LLM_MODEL", "gpt-5-nano")
+    try:
+        api_key = config.get_openai_api_key()
+    except config.CredentialsError as exc:
+        raise RuntimeError(str(exc))
+    if OpenAI is None:
+        raise RuntimeError("OpenAI client library not installed")
+    return api_key, model_name
 
-        genai.configure(api_key=api_key)
-        model_name = os.getenv("AUTOEDA_GEMINI_MODEL", "gemini-2.5-flash")
-        generation_config = {
-            "temperature": 0.3,
-            "max_output_tokens": 1200,
-            # 可能ならJSON強制（Gemini 1.5+）
-            "response_mime_type": "application/json",
-        }
-        model = genai.GenerativeModel(model_name, system_instruction=prompt["system"])
+
+def _hedge_secondary(primary: str) -> Optional[str]:
+    if not llm_hedge.enabled():
+        return None
+    secondary = llm_hedge.secondary_for(primary)
+    if secondary is None:
+        return None
+    try:
+        _resolve_llm(secondary)
+    except RuntimeError:
+        return None
+    return secondary
+
+
+def _agent_text(provider: str, api_key: str, model_name: str, prompt: Dict[str, str], temperature: float) -> str:
+    if provider == "gemini":
+        model = llm_clients.gemini_model(genai, api_key, model_name, prompt["system"])
         response = model.generate_content(
             prompt["user"],
-            generation_config=generation_config,
+            # 可能ならJSON強制（Gemini 1.5+）
+            generation_config=_gemini_config(temperature, 1200),
+            request_options={"timeout": llm_clients.call_timeout()},
         )
         text = _extract_gemini_text(response)
         if not text:
@@ -322,42 +634,24 @@ def _invoke_llm_agent(
             if msg:
                 raise RuntimeError(msg)
     else:
-        model_name = os.getenv("AUTOEDA_LLM_MODEL", "gpt-5-nano")
-        try:
-            api_key = config.get_openai_api_key()
-        except config.CredentialsError as exc:
-            raise RuntimeError(str(exc))
-        if OpenAI is None:
-            raise RuntimeError("OpenAI client library not installed")
-
-        client = OpenAI(api_key=api_key)
+        client = llm_clients.openai_client(api_key, OpenAI)
         response = client.responses.create(
-            model=model_name,
-            input=[
-                {
-                    "role": "system",
-                    "content": prompt["system"],
-                },
-                {
-                    "role": "user",
-                    "content": prompt["user"],
-                },
-            ],
-            temperature=0.3,
-            max_output_tokens=1200,
+            **_openai_request(model_name, prompt, temperature=temperature, max_output_tokens=1200)
         )
         text = _extract_text(response)
-
     if not text:
         raise RuntimeError("empty response from LLM")
+    return text
+
 
+def _parse_agent_payload(text: str) -> Tuple[str, Dict[str, Any]]:
+    if not text:
+        raise RuntimeError("empty response from LLM")
     try:
-        payload = json.loads(_coerce_json_string(text))
+        return text, json.loads(_coerce_json_string(text))
     except json.JSONDecodeError as exc:
         raise RuntimeError(f"invalid JSON from LLM: {exc}")
 
-    return payload
-
 
 def _build_system_prompt(
     dataset_id: str,
@@ -365,37 +659,42 @@ def _build_system_prompt(
     pii: Optional[Dict[str, Any]],
     leakage: Optional[Dict[str, Any]],
     context_docs: List[Dict[str, Any]],
+    model: Optional[str] = None,
 ) -> Dict[str, str]:
     issues = report.get("data_quality_report", {}).get("issues", [])
     summary = report.get("summary", {})
-    context_parts = [
-        f"dataset_id: {dataset_id}",
-        f"rows: {summary.get('rows')}",
-        f"cols: {summary.get('cols')}",
-        f"missing_rate: {summary.get('missing_rate')}",
-        f"issues: {json.dumps(issues, ensure_ascii=False)}",
-        f"pii: {json.dumps(pii, ensure_ascii=False)}",
-        f"leakage: {json.dumps(leakage, ensure_ascii=False)}",
-    ]
-    context_excerpt = "\n".join(
-        f"- {doc.get('text', '')[:400]}" for doc in context_docs
-        if doc.get("text")
-    )
     system_prompt = (
         "あなたはAutoEDAアシスタントです。data_quality_reportや統計ツールの出力を基に、"
         "事実に基づいた key_features と next_actions を JSON で返します。引用は tools の evidence_id を参照し、"
         "impact/effort/confidence は 0..1 の数値に正規化してください。 hallucination を避け、"
         "不確実な場合は 'reason' に明記しなさい。"
     )
-    user_prompt = (
-        "\n".join(context_parts)
-        + "\n関連ドキュメント:\n"
-        + context_excerpt
-        + "\n期待するJSONスキーマ: {\"key_features\": string[], \"next_actions\": [{title, reason, impact, effort, confidence, score, dependencies?}], \"references\": Reference[]}"
+    user_prompt, stats = prompt_budget.build_user_prompt(
+        [
+            f"dataset_id: {dataset_id}",
+            f"rows: {summary.get('rows')}",
+            f"cols: {summary.get('cols')}",
+            f"missing_rate: {summary.get('missing_rate')}",
+        ],
+        issues,
+        [
+            f"pii: {json.dumps(pii, ensure_ascii=False)}",
+            f"leakage: {json.dumps(leakage, ensure_ascii=False)}",
+        ],
+        context_docs,
+        "\n期待するJSONスキーマ: {\"key_features\": string[], \"next_actions\": [{title, reason, impact, effort, confidence, score, dependencies?}], \"references\": Reference[]}",
+        system=system_prompt,
+        query=_issue_query(issues),
+        model=model,
     )
+    _PROMPT_STATS.set(stats)
     return {"system": system_prompt, "user": user_prompt}
 
 
+def _issue_query(issues: List[Dict[str, Any]]) -> str:
+    return " ".join(f"{i.get('column')} {i.get('description')}" for i in issues if isinstance(i, dict))
+
+
 def _extract_text(response: Any) -> Optional[str]:  # pragma: no cover - depends on SDK version
     """Robustly extract text from OpenAI Responses/Chat responses.
 
@@ -531,14 +830,21 @@ def _merge_llm_payload(report: Dict[str, Any], payload: Dict[str, Any]) -> Dict[
     return report
 
 
-def _tool_only_enrichment(report: Dict[str, Any], pii: Optional[Dict[str, Any]], leakage: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+def _tool_only_enrichment(
+    report: Dict[str, Any],
+    pii: Optional[Dict[str, Any]],
+    leakage: Optional[Dict[str, Any]],
+    context_docs: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
     if not report.get("key_features"):
         report["key_features"] = _derive_key_features(report)
     if not report.get("next_actions"):
         report["next_actions"] = _derive_actions_from_issues(report, pii, leakage)
+    # 検索語は summary/issues のみに依存するため、取得済みのコンテキストがあれば再検索しない
+    docs = context_docs if context_docs is not None else _retrieve_context(report)
     rag_refs = [
         {"kind": "doc", "locator": doc.get("metadata", {}).get("source", doc.get("id"))}
-        for doc in _retrieve_context(report)
+        for doc in docs
     ]
     if rag_refs:
         report["references"] = _dedup_references(report.get("references", []) + rag_refs)
@@ -683,6 +989,9 @@ def _evaluate(
     llm_latency_ms: Optional[int],
     llm_error: Optional[str],
     fallback_applied: bool,
+    llm_cache: Optional[str] = None,
+    prompt_stats: Optional[Dict[str, Any]] = None,
+    llm_route: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     refs = report.get("references", [])
     referenced_items = sum(1 for ref in refs if ref.get("locator"))
@@ -694,4 +1003,9 @@ def _evaluate(
         "llm_latency_ms": llm_latency_ms,
         "llm_error": llm_error,
         "fallback_applied": fallback_applied,
+        "llm_cache": llm_cache,
+        "prompt_tokens": (prompt_stats or {}).get("prompt_tokens"),
+        "prompt_budget": prompt_stats,
+        "llm_provider": (llm_route or {}).get("provider"),
+        "llm_hedged": bool((llm_route or {}).get("hedged")),
     }
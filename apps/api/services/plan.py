@@ -5,6 +5,7 @@ from typing import Any, Dict, List
 
 from . import tools
 from . import rag
+from . import report_store
 
 
 @dataclass
@@ -27,7 +28,8 @@ def generate_plan(dataset_id: str, goals: str | None = None, top_k: int = 5) ->
     - Use profiling summary and RAG retrieval hints to propose tasks
     - No external calls, deterministic output
     """
-    prof = tools.profile_api(dataset_id)
+    snapshot = report_store.load(dataset_id)
+    prof = snapshot["report"] if snapshot is not None else tools.profile_api(dataset_id)
     docs = rag.retrieve(f"EDA plan for {dataset_id}", top_k=min(3, max(1, top_k)))
     rows = prof["summary"]["rows"]
     cols = prof["summary"]["cols"]
@@ -0,0 +1,195 @@
+"""Hot-path profiling hooks: named spans + on-demand statistical sampling profiler.
+
+- ``span(name)``: 区間計測のコンテキストマネージャ。``autoeda_span_seconds{span=...}``
+  ヒストグラム（/metrics）へ記録する。``AUTOEDA_PROFILING=0`` で無効（計測無し）。
+- ``traced(name)``: 関数全体を span で包むデコレータ。
+- ``sample_stacks(seconds, interval_ms)``: ``sys._current_frames()`` を一定間隔で採取し、
+  flamegraph.pl / speedscope がそのまま読める collapsed stack 形式（``a;b;c N``）を返す。
+  同時実行は 1 本のみ（``ProfilerBusy``）、時間は ``AUTOEDA_PROFILER_MAX_SEC`` で上限。
+- ``record(name)``: リクエスト単位のタイミングツリー。contextvars で有効化され、その内側で
+  開いた span が入れ子のノードとして積まれる（``to_dict()`` / ``flatten_timing()``）。
+  別スレッドへ委譲する場合は ``contextvars.copy_context().run`` で文脈を引き継ぐ。
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from . import prometheus
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_SPAN_SECONDS = prometheus.histogram("autoeda_span_seconds", "Duration of instrumented hot-path spans.", ("span",))
+# 待機中スレッド（ワーカーの Condition.wait 等）はフレームグラフを埋め尽くすので既定で除外
+_IDLE_LEAVES = {"threading", "selectors", "queue", "socket", "concurrent.futures.thread", "asyncio.base_events"}
+_SAMPLER_LOCK = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def enabled() -> bool:
+    return os.environ.get("AUTOEDA_PROFILING", "1") in {"1", "true", "TRUE"}
+
+
+class TimingNode:
+    __slots__ = ("name", "ms", "children")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.ms: Optional[float] = None
+        self.children: List["TimingNode"] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"name": self.name, "ms": None if self.ms is None else round(self.ms, 2)}
+        if self.children:
+            out["children"] = [c.to_dict() for c in self.children]
+        return out
+
+
+_TIMING: "contextvars.ContextVar[Optional[TimingNode]]" = contextvars.ContextVar("autoeda_timing", default=None)
+
+
+class Span:
+    __slots__ = ("name", "started", "elapsed", "_node", "_token")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._node: Optional[TimingNode] = None
+        self._token: Any = None
+
+    def __enter__(self) -> "Span":
+        parent = _TIMING.get()
+        if parent is not None:
+            self._node = TimingNode(self.name)
+            parent.children.append(self._node)
+            self._token = _TIMING.set(self._node)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.elapsed = time.perf_counter() - self.started
+        if self._node is not None:
+            self._node.ms = self.elapsed * 1000.0
+            _TIMING.reset(self._token)
+        if enabled():
+            _SPAN_SECONDS.observe(self.elapsed, (self.name,))
+
+
+def span(name: str) -> Span:
+    return Span(name)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    def deco(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with Span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return deco
+
+
+@contextlib.contextmanager
+def record(name: str = "request") -> Iterator[TimingNode]:
+    """Collect spans opened inside this block into a timing tree rooted at ``name``."""
+    root = TimingNode(name)
+    token = _TIMING.set(root)
+    started = time.perf_counter()
+    try:
+        yield root
+    finally:
+        root.ms = (time.perf_counter() - started) * 1000.0
+        _TIMING.reset(token)
+
+
+def flatten_timing(tree: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """{"name","ms","children"} のツリーを {stage: ms} へ平坦化（同名ノードは合算、ルートは除く）。"""
+    out: Dict[str, float] = {}
+    stack = list((tree or {}).get("children") or [])
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        ms = node.get("ms")
+        if isinstance(ms, (int, float)):
+            out[node.get("name", "?")] = out.get(node.get("name", "?"), 0.0) + float(ms)
+        stack.extend(node.get("children") or [])
+    return out
+
+
+def server_timing(tree: Optional[Dict[str, Any]]) -> str:
+    """``Server-Timing`` ヘッダ値（ブラウザの DevTools でそのまま可視化できる）。"""
+    stages = flatten_timing(tree)
+    parts = [f"{(tree or {}).get('name', 'total')};dur={(tree or {}).get('ms') or 0}"]
+    parts.extend(f"{name};dur={round(ms, 2)}" for name, ms in stages.items())
+    return ", ".join(parts)
+
+
+def _max_seconds() -> float:
+    try:
+        return max(0.1, float(os.environ.get("AUTOEDA_PROFILER_MAX_SEC", "30") or "30"))
+    except ValueError:
+        return 30.0
+
+
+def _frame_label(frame: Any) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+def sample_stacks(seconds: float = 5.0, interval_ms: float = 10.0, *, include_idle: bool = False) -> Dict[str, Any]:
+    """Sample every live thread's Python stack for ``seconds`` and fold into collapsed stacks.
+
+    Returns {"samples", "duration_sec", "interval_ms", "collapsed"}. 採取スレッド自身は除外する。
+    """
+    if not _SAMPLER_LOCK.acquire(blocking=False):
+        raise ProfilerBusy("profiler already running")
+    try:
+        seconds = min(max(0.01, float(seconds)), _max_seconds())
+        interval = max(0.001, float(interval_ms) / 1000.0)
+        me = threading.get_ident()
+        folded: Counter = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while True:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if not include_idle and frame.f_globals.get("__name__") in _IDLE_LEAVES:
+                    continue
+                stack = []
+                f: Optional[Any] = frame
+                while f is not None:
+                    stack.append(_frame_label(f))
+                    f = f.f_back
+                stack.append(f"thread:{names.get(ident, ident)}")
+                folded[";".join(reversed(stack))] += 1
+            samples += 1
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            time.sleep(min(interval, deadline - now))
+        lines = [f"{stack} {n}" for stack, n in folded.most_common()]
+        return {
+            "samples": samples,
+            "duration_sec": round(time.perf_counter() - started, 3),
+            "interval_ms": interval * 1000.0,
+            "collapsed": "\n".join(lines) + ("\n" if lines else ""),
+        }
+    finally:
+        _SAMPLER_LOCK.release()
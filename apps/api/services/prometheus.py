@@ -0,0 +1,294 @@
+"""Prometheus text exposition (0.0.4) for in-process counters, gauges and histograms.
+
+計測側はスレッド毎のシャード（threading.local に紐付く dict）へロック無しで加算し、
+スクレイプ時にだけ全シャードを合算する。書き込みは各スレッドが自分のシャードにしか
+行わないため、ホットパスの競合は発生しない（dict のコピーは GIL 下で原子的）。
+終了したスレッドのシャードは合算時に ``_retired`` へ畳み込んで解放する。
+
+- ``counter`` / ``gauge`` / ``histogram``: ラベル値はタプルで渡す（順序は labelnames）
+- ``gauge_fn``: キュー長などスクレイプ時に読むだけで良い値
+- ``PrometheusMiddleware``: ルート毎のリクエスト数・ステータス・レイテンシ、in-flight
+- ``render()``: ``/metrics`` 用のテキストを返す
+"""
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Sharded:
+    """Per-thread shard bookkeeping shared by all metric types."""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict[LabelValues, Any]]] = []
+        self._retired: Dict[LabelValues, Any] = {}
+        self._guard = threading.Lock()
+
+    def _shard(self) -> Dict[LabelValues, Any]:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard: Dict[LabelValues, Any] = {}
+            self._local.shard = shard
+            with self._guard:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _merge(self, into: Dict[LabelValues, Any], key: LabelValues, value: Any) -> None:
+        into[key] = into.get(key, 0.0) + value
+
+    def _collect(self) -> Dict[LabelValues, Any]:
+        with self._guard:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    for key, value in shard.copy().items():
+                        self._merge(self._retired, key, value)
+            self._shards = alive
+            total: Dict[LabelValues, Any] = {}
+            for key, value in self._retired.items():
+                self._merge(total, key, value)
+            for _, shard in alive:
+                for key, value in shard.copy().items():
+                    self._merge(total, key, value)
+        return total
+
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__()
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def value(self, labels: LabelValues = ()) -> float:
+        return float(self._collect().get(labels, 0.0))
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        return [(self.name, key, value) for key, value in sorted(self._collect().items())]
+
+
+class Gauge(Counter):
+    """inc/dec だけを持つゲージ（in-flight や稼働ワーカー数）。dec は別スレッドでも合算で相殺される。"""
+
+    kind = "gauge"
+
+    def dec(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+
+class GaugeFunc:
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float]) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames: Tuple[str, ...] = ()
+        self.fn = fn
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        try:
+            return [(self.name, (), float(self.fn()))]
+        except Exception:
+            return []
+
+
+class Histogram(_Sharded):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__()
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        shard = self._shard()
+        cell = shard.get(labels)
+        if cell is None:
+            # [bucket counts..., +Inf count, sum]
+            cell = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def _merge(self, into: Dict[LabelValues, Any], key: LabelValues, value: Any) -> None:
+        cur = into.get(key)
+        into[key] = list(value) if cur is None else [a + b for a, b in zip(cur, value)]
+
+    def snapshot(self, labels: LabelValues = ()) -> Dict[str, Any]:
+        cell = self._collect().get(labels)
+        if cell is None:
+            return {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets)}
+        return {"count": sum(cell[:-1]), "sum": cell[-1], "buckets": cell[:-2]}
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        out: List[Tuple[str, LabelValues, float]] = []
+        for key, cell in sorted(self._collect().items()):
+            acc = 0
+            for bound, n in zip(self.buckets + (math.inf,), cell[:-1]):
+                acc += n
+                out.append((self.name + "_bucket", key + (_fmt(bound),), acc))
+            out.append((self.name + "_sum", key, cell[-1]))
+            out.append((self.name + "_count", key, acc))
+        return out
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Any) -> Any:
+        # 再 import やテストでの二重登録は既存メトリクスを返す
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, GaugeFunc):
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def get(self, name: str) -> Optional[Any]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            names = metric.labelnames + (("le",) if metric.kind == "histogram" else ())
+            for sample, values, value in metric.samples():
+                names_for = names if sample.endswith("_bucket") else metric.labelnames
+                lines.append(f"{sample}{_labels(names_for, values)} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+
+def gauge(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help_text, labelnames))
+
+
+def gauge_fn(name: str, help_text: str, fn: Callable[[], float]) -> GaugeFunc:
+    return REGISTRY.register(GaugeFunc(name, help_text, fn))
+
+
+def histogram(name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labelnames, buckets))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: LabelValues) -> str:
+    if not names:
+        return ""
+    parts = []
+    for name, value in zip(names, values):
+        v = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+# ---- HTTP ---------------------------------------------------------------
+
+HTTP_REQUESTS = counter("autoeda_http_requests_total", "HTTP requests by route template, method and status.", ("method", "route", "status"))
+HTTP_LATENCY = histogram("autoeda_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+HTTP_IN_FLIGHT = gauge("autoeda_http_requests_in_flight", "HTTP requests currently being served.", ("method",))
+
+_UNMATCHED = "<unmatched>"
+_ROUTE_TEMPLATES: Dict[Tuple[int, int], Dict[Any, str]] = {}
+
+
+def _route_label(scope: Dict[str, Any]) -> str:
+    """ルーティング後の scope からパステンプレートを得る（生パスはラベル爆発するので使わない）。"""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path:
+        return path
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    routes = getattr(app, "routes", None)
+    if endpoint is None or routes is None:
+        return _UNMATCHED
+    key = (id(app), len(routes))
+    table = _ROUTE_TEMPLATES.get(key)
+    if table is None:
+        table = {}
+        for r in routes:
+            ep = getattr(r, "endpoint", None)
+            if ep is not None and getattr(r, "path", None):
+                table.setdefault(ep, r.path)
+        _ROUTE_TEMPLATES[key] = table
+    return table.get(endpoint, _UNMATCHED)
+
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware (BaseHTTPMiddleware より軽量、ストリーミングも素通し)。"""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope.get("method", "GET")
+        status = [500]
+
+        async def _send(message: Dict[str, Any]) -> None:
+            if message.get("type") == "http.response.start":
+                status[0] = int(message.get("status", 500))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc((method,))
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec((method,))
+            route = _route_label(scope)
+            HTTP_REQUESTS.inc((method, route, str(status[0])))
+            HTTP_LATENCY.observe(elapsed, (method, route))
@@ -0,0 +1,184 @@
+"""Token-budgeted prompt assembly for the LLM agent / QnA prompts.
+
+``issues`` / ``pii`` / ``leakage`` の JSON と RAG 抜粋を無制限に連結すると、列数や issue が多い
+データセットでプロンプトが肥大化し、LLM 呼び出しが遅く・高価になる。ここでは
+
+- tiktoken のエンコーダをモデル毎に 1 度だけ解決してキャッシュ（取得不能時は文字種ベースの概算）
+- issue は重要度（severity → 統計量の大きさ）、文書は問い合わせ語との重なり（同点は検索順）で並べ
+- 固定部（要約・pii・leakage・指示）を確保した残りへ上位から詰め、溢れた文書は末尾を切り詰める
+
+ENV: AUTOEDA_PROMPT_TOKEN_BUDGET=3000（system + user の合計）/ AUTOEDA_PROMPT_DOC_CHARS=400
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_SEVERITY_RANK = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+_DEFAULT_ENCODING = "o200k_base"
+_ENCODERS: Dict[str, Any] = {}
+_ENC_LOCK = threading.Lock()
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+|[^\sA-Za-z0-9_]")
+
+
+def token_budget() -> int:
+    try:
+        return max(256, int(os.environ.get("AUTOEDA_PROMPT_TOKEN_BUDGET", "3000") or "3000"))
+    except ValueError:
+        return 3000
+
+
+def _doc_chars() -> int:
+    try:
+        return max(50, int(os.environ.get("AUTOEDA_PROMPT_DOC_CHARS", "400") or "400"))
+    except ValueError:
+        return 400
+
+
+def _encoder(model: Optional[str]) -> Any:
+    """Resolve (once per model) the tiktoken encoder; ``None`` when unavailable.
+
+    BPE ファイルの取得に失敗した場合も ``None`` をキャッシュし、毎回ネットワークへ行かない。
+    """
+    name = model or ""
+    if name in _ENCODERS:
+        return _ENCODERS[name]
+    with _ENC_LOCK:
+        if name in _ENCODERS:
+            return _ENCODERS[name]
+        enc = None
+        try:
+            import tiktoken  # type: ignore
+
+            try:
+                enc = tiktoken.encoding_for_model(name) if name else tiktoken.get_encoding(_DEFAULT_ENCODING)
+            except KeyError:
+                enc = tiktoken.get_encoding(_DEFAULT_ENCODING)
+        except Exception:
+            enc = None
+        _ENCODERS[name] = enc
+        return enc
+
+
+def tokenizer_name(model: Optional[str] = None) -> str:
+    return "tiktoken" if _encoder(model) is not None else "heuristic"
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    if not text:
+        return 0
+    enc = _encoder(model)
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    # 概算: ASCII は約 4 文字/トークン、CJK 等の非 ASCII は約 1 文字/トークン
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def _issue_magnitude(issue: Dict[str, Any]) -> float:
+    stat = issue.get("statistic") or {}
+    values = [abs(float(v)) for v in stat.values() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    return max(values) if values else 0.0
+
+
+def rank_issues(issues: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Most severe first; ties broken by the largest statistic (e.g. missing_ratio)."""
+    items = [i for i in issues if isinstance(i, dict)]
+    return sorted(items, key=lambda i: (_SEVERITY_RANK.get(str(i.get("severity", "")).lower(), 4), -_issue_magnitude(i)))
+
+
+def _terms(text: str) -> set:
+    return {t.lower() for t in _WORD_RE.findall(text or "")}
+
+
+def rank_docs(docs: Iterable[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
+    """Order docs by term overlap with ``query``; the retriever's order breaks ties."""
+    q = _terms(query)
+    items = [d for d in docs if isinstance(d, dict) and d.get("text")]
+    scored = [(-len(q & _terms(d["text"])), idx, d) for idx, d in enumerate(items)]
+    return [d for _, _, d in sorted(scored, key=lambda s: (s[0], s[1]))]
+
+
+def _truncate_to_tokens(text: str, tokens: int, model: Optional[str]) -> str:
+    if tokens <= 0:
+        return ""
+    enc = _encoder(model)
+    if enc is not None:
+        ids = enc.encode(text, disallowed_special=())
+        return text if len(ids) <= tokens else enc.decode(ids[:tokens])
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid], model) <= tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+def build_user_prompt(
+    head: List[str],
+    issues: List[Dict[str, Any]],
+    tail: List[str],
+    docs: List[Dict[str, Any]],
+    footer: str,
+    *,
+    system: str = "",
+    query: str = "",
+    model: Optional[str] = None,
+    budget: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Assemble ``head + issues + tail + 関連ドキュメント + footer`` within ``budget`` tokens.
+
+    ``head`` / ``tail`` / ``footer`` / ``system`` は常に含める。残りを issue → 文書の順に
+    重要度の高いものから詰める。戻り値は (user_prompt, stats)。
+    """
+    budget = budget or token_budget()
+    ranked_issues = rank_issues(issues)
+    ranked_docs = rank_docs(docs, query)
+    doc_chars = _doc_chars()
+
+    def render(kept_issues: List[Dict[str, Any]], excerpts: List[str]) -> str:
+        lines = list(head) + [f"issues: {json.dumps(kept_issues, ensure_ascii=False)}"] + list(tail)
+        return "\n".join(lines) + "\n関連ドキュメント:\n" + "\n".join(excerpts) + footer
+
+    system_tokens = count_tokens(system, model)
+    base = system_tokens + count_tokens(render([], []), model)
+    remaining = budget - base
+
+    # 文書がある場合は残り枠の 1/3 を文書用に確保（issue だけで使い切らない）。最上位の issue は例外
+    reserve = max(0, remaining) // 3 if ranked_docs else 0
+    kept: List[Dict[str, Any]] = []
+    for issue in ranked_issues:
+        cost = count_tokens(json.dumps(issue, ensure_ascii=False), model) + 1
+        if cost > remaining or (kept and cost > remaining - reserve):
+            break
+        kept.append(issue)
+        remaining -= cost
+
+    excerpts: List[str] = []
+    for doc in ranked_docs:
+        line = f"- {doc['text'][:doc_chars]}"
+        cost = count_tokens(line, model) + 1
+        if cost > remaining:
+            if remaining > 16:
+                excerpts.append(_truncate_to_tokens(line, remaining - 1, model))
+                remaining = 0
+            break
+        excerpts.append(line)
+        remaining -= cost
+
+    user = render(kept, excerpts)
+    stats = {
+        "prompt_tokens": system_tokens + count_tokens(user, model),
+        "budget": budget,
+        "tokenizer": tokenizer_name(model),
+        "issues_included": len(kept),
+        "issues_total": len(ranked_issues),
+        "docs_included": len(excerpts),
+        "docs_total": len(ranked_docs),
+    }
+    return user, stats
@@ -1,19 +1,27 @@
 """Lightweight RAG helper utilities.
 
 Chroma + OpenAI embedding を利用可能な場合は活用し、未設定時は
-インメモリの簡易スコアリングでフォールバックする。
+インメモリの BM25 転置インデックス（``bm25.BM25Index``）でフォールバックする。
+
+``AUTOEDA_RAG_BACKEND``: ``auto``（既定: Chroma → BM25）/ ``local``（オフライン埋め込み + IVF の
+``vector_index.LocalVectorStore``、NumPy 必須。エアギャップ環境向け）/ ``bm25``（常にインメモリ）。
 """
 
 from __future__ import annotations
 
+import copy
 import hashlib
 import os
+from collections import OrderedDict
 from pathlib import Path
 import threading
-from typing import Any, Dict, Iterable, List, Optional
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from apps.api import config
 
+from . import bm25, chunking, corpus_manifest, embedding_cache, local_embeddings, vector_index
+
 try:  # pragma: no cover - optional dependency import
     import chromadb
     from chromadb.utils import embedding_functions
@@ -34,6 +42,20 @@ _chroma_client = None
 _collection = None
 _embedding_fn = None
 _init_lock = threading.Lock()
+# _in_memory_store の BM25 索引。索引したリスト本体と件数が現在のストアと一致しない間は
+# 次の検索時に作り直す（テスト等でストアが差し替えられた場合も追従する）。
+_bm25_index = bm25.BM25Index()
+_bm25_source: Tuple[List[Dict[str, Any]], int] = (_in_memory_store, 0)
+_index_lock = threading.Lock()
+_local_store: Optional[vector_index.LocalVectorStore] = None
+# ベクトルストア検索結果の短期キャッシュ。キーは (ストア, 版, top_k, クエリ)。版は rag 経由の
+# 書き込み（ingest / delete）ごとに進み、count() もストアの版ごとに 1 度だけ取得する。
+# インメモリ BM25 はサブミリ秒なのでキャッシュしない。
+_cache_lock = threading.Lock()
+_result_cache: "OrderedDict[Tuple[str, int, int, str], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+_count_cache: Dict[str, Tuple[int, int]] = {}
+_store_versions: Dict[str, int] = {}
+_cache_stats = {"hits": 0, "misses": 0, "queries": 0, "count_calls": 0}
 
 
 def _ensure_chroma() -> Optional[Any]:
@@ -95,6 +117,37 @@ def _ensure_chroma() -> Optional[Any]:
         return _collection
 
 
+def backend() -> str:
+    value = os.environ.get("AUTOEDA_RAG_BACKEND", "auto").strip().lower()
+    return value if value in {"auto", "local", "bm25"} else "auto"
+
+
+def _local_dir() -> Path:
+    override = os.environ.get("AUTOEDA_RAG_LOCAL_DIR")
+    return Path(override) if override else _DATA_DIR / "local"
+
+
+def _ensure_local() -> Optional[vector_index.LocalVectorStore]:
+    global _local_store
+    if not local_embeddings.available():
+        return None
+    with _init_lock:
+        path = _local_dir()
+        if _local_store is None or _local_store.path != path:
+            _local_store = vector_index.LocalVectorStore(path)
+        return _local_store
+
+
+def _vector_store() -> Optional[Any]:
+    """Collection for the configured backend; ``None`` means the in-memory BM25 fallback."""
+    mode = backend()
+    if mode == "bm25":
+        return None
+    if mode == "local":
+        return _ensure_local()
+    return _ensure_chroma()
+
+
 def ingest(documents: Iterable[Dict[str, Any]]) -> None:
     """Insert documents into the vector store (id, text, metadata)."""
 
@@ -102,78 +155,265 @@ def ingest(documents: Iterable[Dict[str, Any]]) -> None:
     if not docs:
         return
 
-    collection = _ensure_chroma()
+    collection = _vector_store()
     ids = [doc.get("id") or _stable_id(doc.get("text", "")) for doc in docs]
     texts = [doc.get("text", "") for doc in docs]
     metadatas = [doc.get("metadata", {}) for doc in docs]
 
     if collection:
-        collection.upsert(ids=ids, documents=texts, metadatas=metadatas)
+        embeddings = _embed_documents(collection, texts)
+        try:
+            if embeddings is not None:
+                collection.upsert(ids=ids, documents=texts, metadatas=metadatas, embeddings=embeddings)
+            else:
+                collection.upsert(ids=ids, documents=texts, metadatas=metadatas)
+        finally:
+            _bump_version(collection)
+    else:
+        _append_in_memory({"id": id_, "text": text, "metadata": meta} for id_, text, meta in zip(ids, texts, metadatas))
+
+
+def _embedding_model(collection: Any) -> str:
+    if isinstance(collection, vector_index.LocalVectorStore):
+        return local_embeddings.model_name()
+    return os.getenv("AUTOEDA_EMBEDDING_MODEL", "text-embedding-3-small")
+
+
+def _store_key(collection: Any) -> str:
+    if isinstance(collection, vector_index.LocalVectorStore):
+        return f"local:{collection.path}:{_embedding_model(collection)}"
+    return f"chroma:{_DATA_DIR}:{_DEFAULT_COLLECTION}:{_embedding_model(collection)}"
+
+
+def _embed_documents(collection: Any, texts: List[str]) -> Optional[List[List[float]]]:
+    """Embed via ``embedding_cache`` (batched, cached by text hash); None = let the store embed."""
+    if isinstance(collection, vector_index.LocalVectorStore):
+        embed_fn = local_embeddings.embed
+    elif _embedding_fn is not None:
+        embed_fn = _embedding_fn
     else:
-        _in_memory_store.extend({"id": id_, "text": text, "metadata": meta} for id_, text, meta in zip(ids, texts, metadatas))
+        return None
+    try:
+        return embedding_cache.embed(texts, model=_embedding_model(collection), embed_fn=embed_fn)
+    except Exception:
+        return None
+
+
+def _append_in_memory(docs: Iterable[Dict[str, Any]]) -> None:
+    global _bm25_source
+    store = _in_memory_store
+    with _index_lock:
+        in_sync = _bm25_source[0] is store and _bm25_source[1] == len(store)
+        start = len(store)
+        store.extend(docs)
+        if in_sync:  # 索引が最新なら追加分の postings だけ足す
+            for doc in store[start:]:
+                _bm25_index.add(doc.get("text", ""))
+            _bm25_source = (store, len(store))
+
+
+def _in_memory_index() -> Tuple[List[Dict[str, Any]], bm25.BM25Index]:
+    global _bm25_index, _bm25_source
+    store = _in_memory_store
+    with _index_lock:
+        if _bm25_source[0] is not store or _bm25_source[1] != len(store):
+            index = bm25.BM25Index()
+            for doc in store:
+                index.add(doc.get("text", ""))
+            _bm25_index, _bm25_source = index, (store, len(store))
+        return store, _bm25_index
 
 
 def retrieve(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
     """Return top_k documents for the query."""
 
-    collection = _ensure_chroma()
-    if collection:
-        try:
-            total = int(collection.count())
-        except Exception:
-            total = top_k
+    return retrieve_many([query], top_k=top_k)[0]
+
+
+def retrieve_many(queries: Sequence[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+    """Return top_k documents per query; vector-store misses go out in one ``collection.query``."""
+
+    queries = list(queries)
+    collection = _vector_store()
+    if not collection:
+        store, index = _in_memory_index()
+        return [[store[doc] for doc, _ in index.search(q, top_k)] for q in queries]
+
+    key = _store_key(collection)
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    ttl = _cache_ttl()
+    now = time.monotonic()
+    with _cache_lock:
+        version = _store_versions.get(key, 0)
+        for q in dict.fromkeys(queries):
+            hit = _result_cache.get((key, version, top_k, q)) if ttl else None
+            if hit and now - hit[0] < ttl:
+                _result_cache.move_to_end((key, version, top_k, q))
+                results[q] = hit[1]
+        _cache_stats["hits"] += sum(1 for q in queries if q in results)
+        _cache_stats["misses"] += sum(1 for q in queries if q not in results)
+    misses = [q for q in dict.fromkeys(queries) if q not in results]
+    if misses:
+        total = _cached_count(collection, key, version, top_k)
         n_results = max(1, min(top_k, total)) if total else top_k
-        results = collection.query(query_texts=[query], n_results=n_results)
-        docs = results.get("documents", [[]])[0]
-        metadatas = results.get("metadatas", [[]])[0]
-        ids = results.get("ids", [[]])[0]
-        return [
-            {
-                "id": doc_id,
-                "text": doc,
-                "metadata": meta or {},
-            }
-            for doc_id, doc, meta in zip(ids, docs, metadatas)
-            if doc
-        ]
-
-    # fallback naive scoring
-    scored = []
-    terms = set(query.lower().split())
-    for doc in _in_memory_store:
-        text = doc.get("text", "")
-        score = sum(1 for term in terms if term in text.lower())
-        if score > 0:
-            scored.append((score, doc))
-    scored.sort(key=lambda item: item[0], reverse=True)
-    return [doc for _, doc in scored[:top_k]]
-
-
-def load_default_corpus() -> None:
-    """Seed the store with docs/requirements/ design excerpts if available."""
-
-    corpus = []
+        raw = collection.query(query_texts=misses, n_results=n_results)
+        with _cache_lock:
+            _cache_stats["queries"] += 1
+        for i, q in enumerate(misses):
+            docs = _nth(raw.get("documents"), i)
+            metadatas = _nth(raw.get("metadatas"), i)
+            ids = _nth(raw.get("ids"), i)
+            results[q] = [
+                {
+                    "id": doc_id,
+                    "text": doc,
+                    "metadata": meta or {},
+                }
+                for doc_id, doc, meta in zip(ids, docs, metadatas)
+                if doc
+            ]
+        if ttl:
+            with _cache_lock:
+                for q in misses:
+                    _result_cache[(key, version, top_k, q)] = (now, results[q])
+                while len(_result_cache) > _cache_max_entries():
+                    _result_cache.popitem(last=False)
+    # 呼び出し側での変更がキャッシュへ波及しないようコピーして返す
+    return [copy.deepcopy(results[q]) for q in queries]
+
+
+def _nth(rows: Any, i: int) -> List[Any]:
+    return list(rows[i]) if rows and len(rows) > i and rows[i] is not None else []
+
+
+def _cache_ttl() -> float:
+    if os.environ.get("AUTOEDA_RAG_CACHE", "1") not in {"1", "true", "TRUE"}:
+        return 0.0
+    try:
+        return max(0.0, float(os.environ.get("AUTOEDA_RAG_CACHE_TTL_SEC", "60") or "60"))
+    except ValueError:
+        return 60.0
+
+
+def _cache_max_entries() -> int:
+    try:
+        return max(1, int(os.environ.get("AUTOEDA_RAG_CACHE_MAX_ENTRIES", "256") or "256"))
+    except ValueError:
+        return 256
+
+
+def _cached_count(collection: Any, key: str, version: int, fallback: int) -> int:
+    with _cache_lock:
+        cached = _count_cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+    try:
+        total = int(collection.count())
+    except Exception:
+        return fallback
+    with _cache_lock:
+        _cache_stats["count_calls"] += 1
+        _count_cache[key] = (version, total)
+    return total
+
+
+def _bump_version(collection: Any) -> None:
+    key = _store_key(collection)
+    with _cache_lock:
+        _store_versions[key] = _store_versions.get(key, 0) + 1
+
+
+def cache_stats() -> Dict[str, int]:
+    with _cache_lock:
+        return {"entries": len(_result_cache), **_cache_stats}
+
+
+def clear_cache() -> None:
+    """Drop cached retrieval results / counts (e.g. after the store was changed out of band)."""
+    with _cache_lock:
+        _result_cache.clear()
+        _count_cache.clear()
+        _cache_stats.update(hits=0, misses=0, queries=0, count_calls=0)
+
+
+config.register_reset_hook(clear_cache)
+
+
+def load_default_corpus() -> Dict[str, Dict[str, int]]:
+    """Seed the store with docs/requirements/ design excerpts if available.
+
+    各ファイルは ``chunking.chunk_markdown`` で見出し/ウィンドウ単位に分割して投入し、
+    同じ source の古いチャンク（旧版のファイル丸ごと文書を含む）は置き換える。
+    戻り値は source ごとの ``replace_source`` の件数。
+    """
+
     base = Path("docs")
+    summary: Dict[str, Dict[str, int]] = {}
     for name in ("requirements.md", "design.md"):
         path = base / name
         if path.exists():
-            corpus.append(
-                {
-                    "id": f"doc:{name}",
-                    "text": path.read_text(encoding="utf-8"),
-                    "metadata": {"source": name},
-                }
-            )
-    ingest(corpus)
+            summary[name] = replace_source(name, chunking.chunk_markdown(path.read_text(encoding="utf-8"), source=name))
+    return summary
+
+
+def replace_source(source: str, documents: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """Ingest ``documents`` and drop previously stored chunks of ``source`` that are not among them.
+
+    永続ストア（Chroma / local）では ``corpus_manifest`` と照合し、新規・本文変更のチャンクだけを
+    投入する（埋め込みはバッチ + ``embedding_cache``）。戻り値は added / unchanged / removed 件数。
+    """
+
+    global _in_memory_store
+    docs = list(documents)
+    ids = [doc.get("id") or _stable_id(doc.get("text", "")) for doc in docs]
+    collection = _vector_store()
+    if not collection:
+        store = _in_memory_store
+        kept = [doc for doc in store if (doc.get("metadata") or {}).get("source") != source]
+        if len(kept) != len(store):
+            with _index_lock:  # 新しいリストへ差し替え → 次回検索で索引を作り直す
+                _in_memory_store = kept
+        ingest(docs)
+        return {"added": len(docs), "unchanged": 0, "removed": len(store) - len(kept)}
+
+    key = _store_key(collection)
+    hashes = {doc_id: embedding_cache.text_hash(doc.get("text", "")) for doc_id, doc in zip(ids, docs)}
+    previous = corpus_manifest.load_source(key, source)
+    if previous is None:
+        try:
+            existing = collection.get(where={"source": source}).get("ids", []) or []
+        except Exception:
+            existing = []
+    else:
+        existing = list(previous)
+    stale = [doc_id for doc_id in existing if doc_id not in hashes]
+    if stale:
+        try:
+            collection.delete(ids=stale)
+        finally:
+            _bump_version(collection)
+    # マニフェストがあってもストア側が消えている場合に備え、実在する ID を確認する
+    try:
+        present = set(collection.get(ids=ids).get("ids", []) or []) if previous else set()
+    except Exception:
+        present = set()
+    changed = [
+        doc for doc_id, doc in zip(ids, docs)
+        if doc_id not in present or (previous or {}).get(doc_id) != hashes[doc_id]
+    ]
+    ingest(changed)
+    corpus_manifest.record(key, source, hashes)
+    return {"added": len(changed), "unchanged": len(docs) - len(changed), "removed": len(stale)}
 
 
 def evaluate_golden_queries(queries: Iterable[Dict[str, Any]], top_k: int = 5) -> Dict[str, Any]:
     missing: List[str] = []
     coverage: Dict[str, Any] = {}
-    for spec in queries:
+    specs = list(queries)
+    batches = retrieve_many([spec.get("query", "") for spec in specs], top_k=top_k)
+    for spec, results in zip(specs, batches):
         query_id = spec.get("id") or spec.get("query")
         expected_sources = {src for src in spec.get("expects", []) if src}
-        results = retrieve(spec.get("query", ""), top_k=top_k)
         found_sources = {
             (res.get("metadata", {}) or {}).get("source")
             for res in results
@@ -0,0 +1,129 @@
+"""Per-dataset snapshot of the last finalized EDA report.
+
+``/api/eda`` で生成したレポート（+ evaluation / PII / リーク / RAG 文脈）をデータセットの版
+（CSV と .meta.json の mtime/size）と共に保存し、QnA・フォローアップ・計画生成・レシピ出力が
+``profile_api`` 等を再実行せずに再利用する。版が変わった（データ更新・PII/リーク状態の変更）
+スナップショットは読み出し時に破棄され、PII 適用/リーク解消時は ``invalidate`` で明示的に消す。
+
+保存先: ``data/reports/<dataset_id>.json``（AUTOEDA_REPORT_STORE_DIR で変更可）。
+AUTOEDA_REPORT_SNAPSHOTS=0 で無効。
+"""
+from __future__ import annotations
+
+import contextlib
+import copy
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import storage
+
+_DEFAULT_DIR = Path(__file__).resolve().parents[2] / "data" / "reports"
+_LOCK = threading.Lock()
+# snapshot ファイルのパス -> 内容（ディスクの写し。版の照合は毎回行う）
+_MEMO: Dict[str, Dict[str, Any]] = {}
+
+
+def enabled() -> bool:
+    return os.environ.get("AUTOEDA_REPORT_SNAPSHOTS", "1") in {"1", "true", "TRUE"}
+
+
+def store_dir() -> Path:
+    override = os.environ.get("AUTOEDA_REPORT_STORE_DIR")
+    return Path(override) if override else _DEFAULT_DIR
+
+
+def _path(dataset_id: str) -> Path:
+    return store_dir() / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', dataset_id)}.json"
+
+
+def save(
+    dataset_id: str,
+    report: Dict[str, Any],
+    evaluation: Dict[str, Any],
+    *,
+    pii: Optional[Dict[str, Any]] = None,
+    leakage: Optional[Dict[str, Any]] = None,
+    context_docs: Optional[List[Dict[str, Any]]] = None,
+    sample_ratio: Optional[float] = None,
+) -> None:
+    if not enabled():
+        return
+    version = storage.dataset_version(dataset_id, include_meta=True)
+    if not version:  # 実体の無いデータセットは保存しない
+        return
+    snapshot = {
+        "dataset_id": dataset_id,
+        "version": version,
+        "saved_at": time.time(),
+        "sample_ratio": sample_ratio,
+        "report": report,
+        "evaluation": evaluation,
+        "pii": pii,
+        "leakage": leakage,
+        "context_docs": context_docs or [],
+    }
+    path = _path(dataset_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+    except Exception:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+    with _LOCK:
+        _MEMO[str(path)] = json.loads(json.dumps(snapshot, ensure_ascii=False, default=str))
+
+
+def load(dataset_id: str, *, full_only: bool = False) -> Optional[Dict[str, Any]]:
+    """Return a deep copy of the current snapshot, or None when missing/stale.
+
+    ``full_only=True`` はサンプリング無し（sample_ratio 未指定/1.0）のレポートだけを返す。
+    """
+    if not enabled():
+        return None
+    version = storage.dataset_version(dataset_id, include_meta=True)
+    if not version:
+        return None
+    path = _path(dataset_id)
+    with _LOCK:
+        snapshot = _MEMO.get(str(path))
+    if snapshot is None:
+        try:
+            snapshot = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        with _LOCK:
+            _MEMO[str(path)] = snapshot
+    if snapshot.get("version") != version:
+        invalidate(dataset_id)
+        return None
+    ratio = snapshot.get("sample_ratio")
+    if full_only and ratio is not None and float(ratio) < 1.0:
+        return None
+    return copy.deepcopy(snapshot)
+
+
+def invalidate(dataset_id: str) -> bool:
+    path = _path(dataset_id)
+    with _LOCK:
+        _MEMO.pop(str(path), None)
+    try:
+        path.unlink()
+        return True
+    except OSError:
+        return False
+
+
+def clear() -> None:
+    """Drop the in-memory copies (files under store_dir are left as is)."""
+    with _LOCK:
+        _MEMO.clear()
@@ -2,17 +2,27 @@
 
 目的: 将来的な安全実行基盤の足場を用意しつつ、現段階ではテンプレート生成に委譲する。
 制約: NW遮断/timeout/mem制限は最小限のフックのみ（本実装では実行コードを走らせない）。
+実行バックエンド: inline / subprocess / pool（AUTOEDA_SANDBOX_POOL=1 で spawn ワーカープール。
+RLIMIT はワーカープロセス内のみに適用し、API プロセス全体には掛けない）。
 """
 from __future__ import annotations
 
+import ast
 import contextlib
+import hashlib
 import resource
 import socket
+import threading
 import time
-from typing import Any, Dict, Optional, Callable
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Callable
 import os
 import subprocess
 import tempfile
+import textwrap
+from functools import lru_cache
+
+from . import chart_render, colstore, profiling, prometheus, storage
 
 
 class SandboxError(RuntimeError):
@@ -22,6 +32,517 @@ class SandboxError(RuntimeError):
         self.logs = logs
 
 
+_SPAWN_SECONDS = prometheus.histogram(
+    "autoeda_sandbox_spawn_seconds",
+    "Time to fork/exec a sandbox subprocess (Popen incl. preexec rlimits).",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+_POOL: Optional[_WorkerPool] = None
+_POOL_KEY: Optional[tuple] = None
+_POOL_LOCK = threading.Lock()
+
+
+def pool_enabled() -> bool:
+    """Pool バックエンドが有効か（ENV: AUTOEDA_SANDBOX_POOL）。"""
+    return os.environ.get("AUTOEDA_SANDBOX_POOL", "0") in {"1", "true", "TRUE"}
+
+
+@lru_cache(maxsize=1)
+def _render_source() -> str:
+    """生成コードへ埋め込む chart_render のソース（標準ライブラリのみ）。"""
+    with open(chart_render.__file__, "r", encoding="utf-8") as f:
+        return f.read() + "\n"
+
+
+# --- AST policy -------------------------------------------------------------
+# 危険なビルトイン/関数呼び出しを拒否（open() は in.json や csv の参照に必要なため別扱い）
+_BANNED_CALLS = frozenset({"eval", "exec", "compile", "__import__", "input", "breakpoint"})
+# restrict_introspection: 名前空間/属性を動的に辿る呼び出し（ラッパーの内部関数への到達経路）
+_INTROSPECTION_CALLS = frozenset({"globals", "locals", "vars"})
+_ATTR_CALLS = frozenset({"getattr", "setattr", "delattr", "hasattr"})
+# OS 経由の実行/FS破壊/環境変更を拒否
+_BANNED_OS_CALLS = frozenset({
+    "system", "popen", "spawnv", "spawnve", "spawnvp", "spawnvpe",
+    "remove", "unlink", "rmdir", "removedirs", "rename", "renames",
+    "chdir", "chmod", "chown",
+})
+
+
+class SandboxPolicy:
+    """Import allowlist + call denylist applied to code before execution."""
+
+    def __init__(
+        self,
+        name: str,
+        allowed_imports: "frozenset[str]",
+        *,
+        restrict_open: bool = False,
+        restrict_introspection: bool = False,
+    ) -> None:
+        self.name = name
+        self.allowed_imports = allowed_imports
+        # True: open() は読み取り専用かつ 'in.json' / csv_path のみ
+        self.restrict_open = restrict_open
+        # True: dunder 属性（__closure__/__globals__ 等）と globals()/vars()/非定数名の getattr を拒否
+        self.restrict_introspection = restrict_introspection
+        self.key = f"{name}|{','.join(sorted(allowed_imports))}|{int(restrict_open)}|{int(restrict_introspection)}"
+
+
+CODE_EXEC_POLICY = SandboxPolicy(
+    "code_exec",
+    frozenset({"json", "csv", "os", "time", "math", "statistics", "random"}),
+    restrict_open=True,
+    restrict_introspection=True,
+)
+GENERATED_CHART_POLICY = SandboxPolicy(
+    "generated_chart",
+    frozenset({"json", "csv", "os", "builtins", "time", "math", "mmap", "typing"}),
+)
+
+
+class _PolicyViolation(Exception):
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.message = message
+
+
+class _PolicyVisitor(ast.NodeVisitor):
+    """Single-pass validator; stops at the first violation."""
+
+    def __init__(self, policy: SandboxPolicy) -> None:
+        self.policy = policy
+
+    def _check_root(self, name: Optional[str]) -> None:
+        root = (name or "").split(".")[0]
+        if root and root not in self.policy.allowed_imports:
+            raise _PolicyViolation(f"forbidden import: {root}")
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            self._check_root(alias.name)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        self._check_root(node.module)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        func = node.func
+        if isinstance(func, ast.Name):
+            if func.id in _BANNED_CALLS:
+                raise _PolicyViolation(f"forbidden call: {func.id}")
+            if func.id == "open" and self.policy.restrict_open:
+                self._check_open(node)
+            if self.policy.restrict_introspection:
+                if func.id in _INTROSPECTION_CALLS:
+                    raise _PolicyViolation(f"forbidden call: {func.id}")
+                if func.id in _ATTR_CALLS:
+                    name = node.args[1] if len(node.args) >= 2 else None
+                    if not (isinstance(name, ast.Constant) and isinstance(name.value, str) and not name.value.startswith("__")):
+                        raise _PolicyViolation(f"forbidden call: {func.id}")
+        elif isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            if func.value.id == "os" and func.attr in _BANNED_OS_CALLS:
+                raise _PolicyViolation(f"forbidden os call: os.{func.attr}")
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if self.policy.restrict_introspection and node.attr.startswith("__") and node.attr.endswith("__"):
+            raise _PolicyViolation(f"forbidden attribute: {node.attr}")
+        self.generic_visit(node)
+
+    def _check_open(self, node: ast.Call) -> None:
+        # open(): read-only に制限（w/a/+ / x は拒否）。パスは in.json か csv_path のみ許可。
+        mode_arg = None
+        if len(node.args) >= 2 and isinstance(node.args[1], ast.Constant) and isinstance(node.args[1].value, str):
+            mode_arg = node.args[1].value
+        for kw in node.keywords or []:
+            if kw.arg == "mode" and isinstance(kw.value, ast.Constant) and isinstance(kw.value.value, str):
+                mode_arg = kw.value.value
+        if mode_arg and any(x in mode_arg for x in ("w", "a", "+", "x")):
+            raise _PolicyViolation("forbidden open mode")
+        if node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+            if node.args[0].value != "in.json":
+                raise _PolicyViolation("forbidden open path")
+        if node.args and isinstance(node.args[0], ast.Name):
+            if node.args[0].id != "csv_path":
+                raise _PolicyViolation("forbidden open target")
+
+
+# sha256(policy + code) -> 違反理由（None は許可）。LRU。
+_POLICY_CACHE: "OrderedDict[str, Optional[str]]" = OrderedDict()
+_POLICY_LOCK = threading.Lock()
+_POLICY_STATS = {"hits": 0, "misses": 0}
+
+
+def _policy_cache_size() -> int:
+    try:
+        return max(0, int(os.environ.get("AUTOEDA_SANDBOX_POLICY_CACHE", "256") or "0"))
+    except ValueError:
+        return 256
+
+
+def check_policy(code: str, policy: SandboxPolicy) -> None:
+    """Validate ``code`` against ``policy``; raises SandboxError(code="forbidden_import").
+
+    判定結果はコードハッシュ単位でキャッシュし、同一コードの再検証（ノートブック再実行や
+    固定テンプレート）では AST を再構築しない。構文解析に失敗したコードは従来どおり許可
+    （後段の RLIMIT/実行時エラーで担保）。
+    """
+    key = hashlib.sha256(f"{policy.key}\0{code}".encode("utf-8")).hexdigest()
+    with _POLICY_LOCK:
+        if key in _POLICY_CACHE:
+            _POLICY_CACHE.move_to_end(key)
+            _POLICY_STATS["hits"] += 1
+            reason = _POLICY_CACHE[key]
+            if reason is not None:
+                raise SandboxError(reason, code="forbidden_import")
+            return
+        _POLICY_STATS["misses"] += 1
+    reason: Optional[str] = None
+    try:
+        _PolicyVisitor(policy).visit(ast.parse(code))
+    except _PolicyViolation as exc:
+        reason = exc.message
+    except Exception:
+        reason = None
+    limit = _policy_cache_size()
+    if limit:
+        with _POLICY_LOCK:
+            _POLICY_CACHE[key] = reason
+            while len(_POLICY_CACHE) > limit:
+                _POLICY_CACHE.popitem(last=False)
+    if reason is not None:
+        raise SandboxError(reason, code="forbidden_import")
+
+
+def policy_cache_stats() -> Dict[str, int]:
+    with _POLICY_LOCK:
+        return {"size": len(_POLICY_CACHE), **_POLICY_STATS}
+
+
+def reset_policy_cache() -> None:
+    with _POLICY_LOCK:
+        _POLICY_CACHE.clear()
+        _POLICY_STATS.update({"hits": 0, "misses": 0})
+
+
+# ジョブ入力は stdin の 1 行 JSON で渡す（in.json/一時ディレクトリ不要）。sys は名前空間に残さない。
+_STDIN_PRELUDE = (
+    "import json, os, sys as _sb_sys\n"
+    "cfg = json.loads(_sb_sys.stdin.readline() or '{}')\n"
+    "del _sb_sys\n"
+)
+_STDERR_CAP = 64 * 1024
+_NEUTRAL_CWD = os.path.abspath(os.sep)
+
+
+def _max_output_bytes() -> int:
+    """stdout の上限バイト数（ENV: AUTOEDA_SANDBOX_MAX_OUTPUT_BYTES、既定 8MiB）。"""
+    try:
+        n = int(os.environ.get("AUTOEDA_SANDBOX_MAX_OUTPUT_BYTES", "0") or "0")
+    except ValueError:
+        n = 0
+    return n if n > 0 else 8 * 1024 * 1024
+
+
+class _CappedReader:
+    """Drain a child pipe on a thread, keeping at most ``cap`` bytes.
+
+    上限超過時は ``overflow`` を立て、以降は読み捨てる（呼び出し側がプロセスを kill する）。
+    stdout/stderr を並行に読み出すため、パイプ詰まりによるデッドロックも起きない。
+    """
+
+    def __init__(self, stream: Any, cap: int) -> None:
+        self._stream = stream
+        self._cap = cap
+        self._chunks: List[bytes] = []
+        self.size = 0
+        self.overflow = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        with contextlib.suppress(Exception):
+            while True:
+                chunk = self._stream.read1(65536) if hasattr(self._stream, "read1") else self._stream.read(65536)
+                if not chunk:
+                    break
+                if self.size + len(chunk) > self._cap:
+                    self._chunks.append(chunk[: max(0, self._cap - self.size)])
+                    self.size = self._cap
+                    self.overflow = True
+                    continue
+                self._chunks.append(chunk)
+                self.size += len(chunk)
+
+    def text(self, timeout: float = 1.0) -> str:
+        self._thread.join(timeout)
+        return b"".join(self._chunks).decode("utf-8", errors="replace")
+
+
+def _decode_frames(out: str) -> Dict[str, Any]:
+    """stdout を改行区切りフレームとして解釈し、結果 JSON を返す。
+
+    全体が 1 つの JSON ならそれを、そうでなければ最後の JSON オブジェクト行を採用する
+    （途中のデバッグ出力は無視）。見つからなければ ValueError。
+    """
+    import json as _json
+
+    text = out.strip()
+    if not text:
+        return {}
+    try:
+        return _json.loads(text)
+    except ValueError:
+        pass
+    for line in reversed(text.splitlines()):
+        line = line.strip()
+        if line.startswith("{"):
+            with contextlib.suppress(ValueError):
+                return _json.loads(line)
+    raise ValueError("no JSON frame in sandbox output")
+
+
+@lru_cache(maxsize=1)
+def _load_dataset_prelude() -> str:
+    """code_exec 用: ``load_dataset(columns=None, max_rows=None)`` だけを名前空間に置く。
+
+    chart_render のソースは関数スコープ内に閉じ込め、ユーザーコードからは ``read_columns`` /
+    ``read_snapshot``（任意パスを開ける）に届かない。読み込み先はジョブの cfg で束縛し、呼び出し側は
+    パスを指定できない（クロージャ経由の取り出しは ``restrict_introspection`` の AST 検査で拒否）。
+    """
+    return (
+        "def _sb_make_loader(_sb_csv, _sb_snap):\n"
+        + textwrap.indent(_render_source(), "    ")
+        + "    def load_dataset(columns=None, max_rows=None):\n"
+        "        if _sb_snap and os.path.exists(_sb_snap):\n"
+        "            return read_snapshot(_sb_snap, columns, need=1 << 16, max_rows=max_rows)\n"
+        "        return read_columns(_sb_csv, columns, need=1 << 16, max_rows=max_rows)\n"
+        "    return load_dataset\n"
+        "load_dataset = _sb_make_loader(cfg.get('csv_path'), cfg.get('snapshot_path'))\n"
+        "del _sb_make_loader\n"
+    )
+
+
+@lru_cache(maxsize=1)
+def _generated_chart_code() -> str:
+    """生成チャート用コード（chart_render のソース + 実行部）。ジョブ間で不変。"""
+    return _render_source() + textwrap.dedent(
+        r"""
+        import json, os, time
+        kind = cfg.get('kind','bar')
+        csv_path = cfg.get('csv_path')
+        # phase-1 delay (generation)
+        try:
+            d1 = int(os.environ.get('AUTOEDA_SB_TEST_DELAY_MS','0') or '0')
+            if d1>0: time.sleep(d1/1000.0)
+        except Exception:
+            pass
+        width_px = int(cfg.get('width_px') or DEFAULT_WIDTH_PX)
+        height_px = int(cfg.get('height_px') or DEFAULT_HEIGHT_PX)
+        rendered = None
+        snapshot_path = cfg.get('snapshot_path')
+        if snapshot_path and os.path.exists(snapshot_path):
+            try:
+                rendered = render_snapshot(kind, snapshot_path, cfg.get('columns') or None, width_px=width_px, height_px=height_px, max_rows=cfg.get('max_rows'))
+                rendered["meta"]["source"] = "snapshot"
+            except Exception:
+                rendered = None
+        if rendered is None and csv_path and os.path.exists(csv_path):
+            try:
+                rendered = render_csv(kind, csv_path, cfg.get('columns') or None, width_px=width_px, height_px=height_px, max_rows=cfg.get('max_rows'))
+                rendered["meta"]["source"] = "csv"
+            except Exception:
+                rendered = None
+        if rendered is None:
+            rendered = render(kind, {"index": [str(i) for i in range(20)], "value": [str((i%5)+1) for i in range(20)]}, width_px=width_px, height_px=height_px)
+        spec = rendered["spec"]
+        # phase-2 delay (rendering)
+        try:
+            d2 = int(os.environ.get('AUTOEDA_SB_TEST_DELAY2_MS','0') or '0')
+            if d2>0: time.sleep(d2/1000.0)
+        except Exception:
+            pass
+        out = {
+            "language": "python", "library": "vega", "code": "# generated", "meta": rendered["meta"], "outputs": [
+                {"type":"vega","mime":"application/json","content": spec}
+            ]
+        }
+        print(json.dumps(out, ensure_ascii=False))
+        """
+    )
+
+
+def _chart_max_rows() -> Optional[int]:
+    """生成チャートが読み込む最大行数（ENV: AUTOEDA_CHART_MAX_ROWS、0 以下で無制限）。"""
+    try:
+        n = int(os.environ.get("AUTOEDA_CHART_MAX_ROWS", "1000000") or "0")
+    except ValueError:
+        n = 1000000
+    return n if n > 0 else None
+
+
+def _pool_workers() -> int:
+    try:
+        n = int(os.environ.get("AUTOEDA_SANDBOX_POOL_WORKERS", "0") or "0")
+    except ValueError:
+        n = 0
+    return n if n > 0 else max(1, min(4, os.cpu_count() or 1))
+
+
+def _pool_worker_init(mem_limit_mb: int) -> None:
+    """Pool ワーカー初期化: RLIMIT/NW遮断はワーカープロセス内のみに適用する。
+
+    RLIMIT_CPU は累積値でワーカー再利用と相性が悪いため設定しない（時間制限はホスト側で担保）。
+    """
+    with contextlib.suppress(Exception):
+        ml = mem_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (ml, ml))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+
+    def _blocked_socket(*args, **kwargs):  # type: ignore[no-untyped-def]
+        raise SandboxError("network disabled in sandbox")
+
+    socket.socket = _blocked_socket  # type: ignore[assignment]
+
+
+def _pool_worker_main(conn: Any, mem_limit_mb: int) -> None:
+    """ワーカー本体: (fn, args) を 1 件ずつ受け取り (ok, 結果 or 例外) を返す。None で終了。"""
+    _pool_worker_init(mem_limit_mb)
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+        fn, args = msg
+        try:
+            reply = (True, fn(*args))
+        except BaseException as exc:  # noqa: BLE001 - ホスト側で再送出する
+            reply = (False, exc)
+        try:
+            conn.send(reply)
+        except Exception as exc:  # 結果/例外が pickle できない
+            conn.send((False, RuntimeError(f"unpicklable pool result: {exc!r}")))
+
+
+class _PoolWorker:
+    def __init__(self, ctx: Any, mem_limit_mb: int) -> None:
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_pool_worker_main, args=(child, mem_limit_mb), daemon=True)
+        self.proc.start()
+        child.close()
+
+    def stop(self, *, kill: bool) -> None:
+        if kill:
+            with contextlib.suppress(Exception):
+                self.proc.kill()
+        else:
+            with contextlib.suppress(Exception):
+                self.conn.send(None)
+        with contextlib.suppress(Exception):
+            self.conn.close()
+        if kill:
+            with contextlib.suppress(Exception):
+                self.proc.join(timeout=1.0)
+
+
+class _WorkerPool:
+    """spawn ワーカーのプール。1 ワーカー = 同時に 1 ジョブ。
+
+    ProcessPoolExecutor はワーカーが 1 つ落ちるとプール全体が BrokenProcessPool になり、
+    並行ジョブまで巻き込むため、timeout/cancel/クラッシュ時は該当ワーカーだけを捨てて次回補充する。
+    """
+
+    def __init__(self, size: int, mem_limit_mb: int) -> None:
+        import multiprocessing
+
+        # fork はマルチスレッドな API プロセスでは危険なため spawn を使う
+        self._ctx = multiprocessing.get_context("spawn")
+        self._mem_limit_mb = mem_limit_mb
+        self._slots = threading.Semaphore(size)
+        self._lock = threading.Lock()
+        self._idle: List[_PoolWorker] = []
+        self._busy: set = set()
+        self._closed = False
+
+    def checkout(self, timeout: float) -> Optional[_PoolWorker]:
+        """空きワーカーを借りる（timeout 内に空かなければ None）。"""
+        if not self._slots.acquire(timeout=timeout):
+            return None
+        with self._lock:
+            worker = self._idle.pop() if self._idle else None
+        try:
+            if worker is None:
+                worker = _PoolWorker(self._ctx, self._mem_limit_mb)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._busy.add(worker)
+        return worker
+
+    def release(self, worker: _PoolWorker, *, healthy: bool) -> None:
+        with self._lock:
+            self._busy.discard(worker)
+            keep = healthy and not self._closed
+            if keep:
+                self._idle.append(worker)
+        if not keep:
+            worker.stop(kill=not healthy)
+        self._slots.release()
+
+    def shutdown(self, *, kill: bool) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            busy = list(self._busy) if kill else []
+        for worker in idle:
+            worker.stop(kill=kill)
+        for worker in busy:
+            worker.stop(kill=True)
+
+
+def _get_pool(mem_limit_mb: int) -> _WorkerPool:
+    global _POOL, _POOL_KEY
+    key = (mem_limit_mb, _pool_workers())
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_KEY != key:
+            if _POOL is not None:
+                _POOL.shutdown(kill=False)
+            _POOL = _WorkerPool(key[1], mem_limit_mb)
+            _POOL_KEY = key
+        return _POOL
+
+
+def shutdown_pool(*, kill: bool = False) -> None:
+    """Pool を破棄する。kill=True の場合は実行中ワーカーも強制終了する。"""
+    global _POOL, _POOL_KEY
+    with _POOL_LOCK:
+        pool, _POOL, _POOL_KEY = _POOL, None, None
+    if pool is not None:
+        pool.shutdown(kill=kill)
+
+
+def _pool_template_job(spec_hint: Optional[str], dataset_id: Optional[str], columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    # ワーカー側で実行（結果は pickle でホストへ返る）
+    from . import charts as chartsvc
+
+    return chartsvc._template_result(spec_hint, dataset_id, columns)
+
+
+def _pool_exec_job(code: str, cfg: Dict[str, Any], env: Dict[str, str]) -> str:
+    """AST 検査済みの生成コードをワーカー内で実行し、stdout を返す（cfg は in.json の代わりに注入）。"""
+    import io
+
+    for k, v in env.items():
+        os.environ[k] = v
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        exec(compile(code, "<generated-chart>", "exec"), {"__name__": "__sandbox__", "cfg": cfg})
+    return buf.getvalue()
+
+
 class SandboxRunner:
     def __init__(self, *, timeout_sec: float = 10.0, mem_limit_mb: int = 512) -> None:
         self.timeout_sec = timeout_sec
@@ -44,46 +565,134 @@ class SandboxRunner:
                 return False
         return _Guard()
 
-    def _limit_memory(self) -> None:
-        # Unix only; ignore if not supported
-        with contextlib.suppress(Exception):
-            soft = self.mem_limit_mb * 1024 * 1024
-            hard = soft
-            resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+    @profiling.traced("sandbox.exec")
+    def _run_in_pool(self, fn: Callable[..., Any], *args: Any, cancel_check: Optional[Callable[[], bool]] = None, timeout_sec: Optional[float] = None) -> Any:
+        """Run fn on a pooled worker and wait cooperatively (cancel/timeout).
+
+        timeout/cancel/クラッシュ時はこのジョブのワーカーだけを kill する（他の実行中ジョブは継続）。
+        """
+        pool = _get_pool(self.mem_limit_mb)
+        tsec = float(timeout_sec or self.timeout_sec)
+        started = time.perf_counter()
 
-    def run_template(self, *, spec_hint: Optional[str], dataset_id: Optional[str], cancel_check: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        def _check() -> None:
+            if cancel_check and cancel_check():
+                raise SandboxError("cancelled", code="cancelled")
+            if (time.perf_counter() - started) >= tsec:
+                raise SandboxError("timeout", code="timeout")
+
+        worker = None
+        while worker is None:
+            worker = pool.checkout(timeout=0.01)
+            if worker is None:
+                _check()
+        healthy = False
+        try:
+            worker.conn.send((fn, args))
+            while not worker.conn.poll(0.01):
+                _check()
+            ok, value = worker.conn.recv()
+            healthy = True
+        except (EOFError, OSError):
+            # ワーカーが RLIMIT 等で落ちた → テンプレートで黙って置き換えず明示的に失敗させる
+            raise SandboxError("pool worker crashed", code="worker_crashed") from None
+        finally:
+            pool.release(worker, healthy=healthy)
+        if not ok:
+            raise value
+        return value
+
+    @profiling.traced("sandbox.exec")
+    def _run_subprocess(
+        self,
+        script: str,
+        cfg: Dict[str, Any],
+        *,
+        env: Dict[str, str],
+        preexec: Optional[Callable[[], None]] = None,
+        timeout_sec: Optional[float] = None,
+        cancel_check: Optional[Callable[[], bool]] = None,
+        cwd: Optional[str] = None,
+    ) -> "tuple[str, str]":
+        """Spawn ``python3 -I -c script`` with cfg on stdin; stream stdout/stderr with caps.
+
+        Returns (stdout, stderr). cancel/timeout/出力上限超過は SandboxError。
+        """
+        import json as _json
+
+        with profiling.span("sandbox.spawn") as spawn:
+            proc = subprocess.Popen(
+                ["python3", "-I", "-c", _STDIN_PRELUDE + script],
+                cwd=cwd or _NEUTRAL_CWD,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+                preexec_fn=preexec if hasattr(os, "setuid") else None,
+            )
+        _SPAWN_SECONDS.observe(spawn.elapsed)
+        out = _CappedReader(proc.stdout, _max_output_bytes())
+        err = _CappedReader(proc.stderr, _STDERR_CAP)
+        with contextlib.suppress(BrokenPipeError, OSError):
+            proc.stdin.write(_json.dumps(cfg, ensure_ascii=False).encode("utf-8") + b"\n")
+            proc.stdin.close()
+        tsec = float(self.timeout_sec if timeout_sec is None else timeout_sec)
+        started = time.perf_counter()
+        try:
+            while proc.poll() is None:
+                if out.overflow:
+                    raise SandboxError("output limit exceeded", code="output_limit")
+                if cancel_check and cancel_check():
+                    raise SandboxError("cancelled", code="cancelled")
+                if (time.perf_counter() - started) >= tsec:
+                    raise SandboxError("timeout", code="timeout")
+                time.sleep(0.01)
+        except SandboxError:
+            with contextlib.suppress(Exception):
+                proc.kill()
+            with contextlib.suppress(Exception):
+                proc.wait(timeout=1.0)
+            raise
+        stdout, stderr = out.text(), err.text()
+        if out.overflow:
+            raise SandboxError("output limit exceeded", code="output_limit")
+        return stdout, stderr
+
+    def run_template(self, *, spec_hint: Optional[str], dataset_id: Optional[str], columns: Optional[List[str]] = None, cancel_check: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
         # Here we do not execute arbitrary code; just return a template result.
         # charts.py のテンプレート関数を利用する。
+        # NOTE: RLIMIT はプロセス全体に効くため inline では設定しない（pool ワーカー内のみ）。
         from . import charts as chartsvc
 
         t0 = time.perf_counter()
         try:
-            with self._disable_network():
-                self._limit_memory()
-                if cancel_check and cancel_check():
-                    raise SandboxError("cancelled")
-                result = chartsvc._template_result(spec_hint, dataset_id)
+            if cancel_check and cancel_check():
+                raise SandboxError("cancelled")
+            if pool_enabled():
+                result = self._run_in_pool(_pool_template_job, spec_hint, dataset_id, columns, cancel_check=cancel_check)
+                result.setdefault("meta", {})["sandbox"] = "pool"
+            else:
+                with self._disable_network():
+                    result = chartsvc._template_result(spec_hint, dataset_id, columns)
         except SandboxError:
             raise
         except Exception:
             # 非対応環境では無視（フォールバック）
-            result = chartsvc._template_result(spec_hint, dataset_id)
+            result = chartsvc._template_result(spec_hint, dataset_id, columns)
         dur_ms = int((time.perf_counter() - t0) * 1000)
         result.setdefault("meta", {})
         result["meta"].update({"duration_ms": dur_ms})
         return result
 
-    def run_template_subprocess(self, *, spec_hint: Optional[str], dataset_id: Optional[str], cancel_check: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+    def run_template_subprocess(self, *, spec_hint: Optional[str], dataset_id: Optional[str], columns: Optional[List[str]] = None, cancel_check: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
         """Best-effort subprocess isolation（MVP）.
 
-        - FS: 作業は一時ディレクトリ
+        - FS: ジョブ入力は stdin、出力は stdout（上限付き）。一時ディレクトリは作らない
         - NW: 明示ブロックはしない（将来のseccomp等に委ねる）
         - Allowlist: 追加パッケージは使わない（標準ライブラリのみ）
         """
-        import json as _json  # local alias
         code = (
-            "import json, os, time;\n"
-            "cfg=json.loads(open('in.json').read());\n"
+            "import time;\n"
             "kind=cfg.get('kind','bar');\n"
             "delay_ms=int(os.environ.get('AUTOEDA_SB_TEST_DELAY_MS','0') or '0');\n"
             "if delay_ms>0: time.sleep(delay_ms/1000.0);\n"
@@ -93,14 +702,8 @@ class SandboxRunner:
             "if delay2_ms>0: time.sleep(delay2_ms/1000.0);\n"
             "print(json.dumps({'language':'python','library':'vega','code':'# generated','outputs':[{'type':'vega','mime':'application/json','content':spec}]}, ensure_ascii=False))\n"
         )
-        tmpdir = tempfile.mkdtemp(prefix="autoeda_sbx_")
         payload = {"kind": (spec_hint or "bar").lower(), "dataset_id": dataset_id}
-        in_path = os.path.join(tmpdir, "in.json")
-        with open(in_path, "w", encoding="utf-8") as f:
-            f.write(_json.dumps(payload))
         try:
-            # lazy import to avoid cycles
-            from . import charts as chartsvc  # type: ignore
             def _preexec():  # POSIX only
                 with contextlib.suppress(Exception):
                     resource.setrlimit(resource.RLIMIT_AS, (self.mem_limit_mb * 1024 * 1024, self.mem_limit_mb * 1024 * 1024))
@@ -110,14 +713,6 @@ class SandboxRunner:
                         resource.setrlimit(resource.RLIMIT_NPROC, (64, 64))
                     if hasattr(resource, 'RLIMIT_STACK'):
                         resource.setrlimit(resource.RLIMIT_STACK, (8 * 1024 * 1024, 8 * 1024 * 1024))
-                    if hasattr(resource, 'RLIMIT_NPROC'):
-                        resource.setrlimit(resource.RLIMIT_NPROC, (64, 64))
-                    if hasattr(resource, 'RLIMIT_STACK'):
-                        resource.setrlimit(resource.RLIMIT_STACK, (8 * 1024 * 1024, 8 * 1024 * 1024))
-                    if hasattr(resource, 'RLIMIT_NPROC'):
-                        resource.setrlimit(resource.RLIMIT_NPROC, (64, 64))
-                    if hasattr(resource, 'RLIMIT_STACK'):
-                        resource.setrlimit(resource.RLIMIT_STACK, (8 * 1024 * 1024, 8 * 1024 * 1024))
             # Propagate testing delays for both generate and rendering phases
             env = {
                 "PYTHONUNBUFFERED": "1",
@@ -125,34 +720,14 @@ class SandboxRunner:
                 "AUTOEDA_SB_TEST_DELAY_MS": os.environ.get("AUTOEDA_SB_TEST_DELAY_MS", ""),
                 "AUTOEDA_SB_TEST_DELAY2_MS": os.environ.get("AUTOEDA_SB_TEST_DELAY2_MS", ""),
             }
-            proc = subprocess.Popen(["python3", "-I", "-c", code], cwd=tmpdir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env, preexec_fn=_preexec if hasattr(os, 'setuid') else None)
-            started = time.perf_counter()
-            while True:
-                ret = proc.poll()
-                if ret is not None:
-                    break
-                if cancel_check and cancel_check():
-                    with contextlib.suppress(Exception):
-                        proc.kill()
-                    raise SandboxError("cancelled", code="cancelled")
-                if (time.perf_counter() - started) >= self.timeout_sec:
-                    with contextlib.suppress(Exception):
-                        proc.kill()
-                    raise SandboxError("timeout")
-                time.sleep(0.01)
-            out = (proc.stdout.read() if proc.stdout else "").strip()
-            obj = _json.loads(out or "{}")
+            out, _ = self._run_subprocess(code, payload, env=env, preexec=_preexec, cancel_check=cancel_check)
+            obj = _decode_frames(out)
         except SandboxError:
             raise
         except Exception:
             # フォールバック
             from . import charts as chartsvc  # type: ignore
-            obj = chartsvc._template_result(spec_hint, dataset_id)
-        finally:
-            with contextlib.suppress(Exception):
-                for name in os.listdir(tmpdir):
-                    os.remove(os.path.join(tmpdir, name))
-                os.rmdir(tmpdir)
+            obj = chartsvc._template_result(spec_hint, dataset_id, columns)
         return obj
 
     def run_code_exec(self, *, code: str, dataset_id: Optional[str], timeout_sec: Optional[float] = None) -> Dict[str, Any]:
@@ -165,77 +740,31 @@ class SandboxRunner:
         - 出力は print(JSON) 形式で { language, library, outputs: [...]} を期待（安全に失敗→format_error）。
         """
         import json as _json
-        import ast as _ast
         import textwrap
-        tmpdir = tempfile.mkdtemp(prefix="autoeda_exec_")
+        tmpdir: Optional[str] = None
         try:
             user = textwrap.dedent(code or "").strip()
             if not user:
                 raise SandboxError("empty code", code="format_error")
-            # AST allowlist / denylist
-            try:
-                tree = _ast.parse(user)
-                allowed_imports = {"json", "csv", "os", "time", "math", "statistics", "random"}
-                banned_calls = {"eval", "exec", "compile", "__import__", "input", "breakpoint"}
-                banned_os_calls = {"system", "popen", "spawnv", "spawnve", "spawnvp", "spawnvpe",
-                                   "remove", "unlink", "rmdir", "removedirs", "rename", "renames",
-                                   "chdir", "chmod", "chown"}
-                for node in _ast.walk(tree):
-                    if isinstance(node, _ast.Import):
-                        for alias in node.names:
-                            root = (alias.name or "").split(".")[0]
-                            if root not in allowed_imports:
-                                raise SandboxError(f"forbidden import: {root}", code="forbidden_import")
-                    elif isinstance(node, _ast.ImportFrom):
-                        root = (node.module or "").split(".")[0]
-                        if root and root not in allowed_imports:
-                            raise SandboxError(f"forbidden import: {root}", code="forbidden_import")
-                    elif isinstance(node, _ast.Call):
-                        if isinstance(node.func, _ast.Name) and node.func.id in banned_calls:
-                            raise SandboxError(f"forbidden call: {node.func.id}", code="forbidden_import")
-                        if isinstance(node.func, _ast.Attribute) and isinstance(node.func.value, _ast.Name):
-                            if node.func.value.id == 'os' and node.func.attr in banned_os_calls:
-                                raise SandboxError(f"forbidden os call: os.{node.func.attr}", code="forbidden_import")
-                        # open(): read-only に制限（w/a/+ / x は拒否）。パスは in.json か csv_path のみ許可。
-                        if isinstance(node.func, _ast.Name) and node.func.id == 'open':
-                            mode_arg = None
-                            # 位置引数2番目
-                            if len(node.args) >= 2 and isinstance(node.args[1], _ast.Constant) and isinstance(node.args[1].value, str):
-                                mode_arg = node.args[1].value
-                            # キーワード mode
-                            for kw in getattr(node, 'keywords', []) or []:
-                                if kw.arg == 'mode' and isinstance(kw.value, _ast.Constant) and isinstance(kw.value.value, str):
-                                    mode_arg = kw.value.value
-                            if mode_arg and any(x in mode_arg for x in ('w','a','+','x')):
-                                raise SandboxError("forbidden open mode", code="forbidden_import")
-                            # 第1引数がリテラルなら in.json のみ許可
-                            if node.args and isinstance(node.args[0], _ast.Constant) and isinstance(node.args[0].value, str):
-                                if node.args[0].value != 'in.json':
-                                    raise SandboxError("forbidden open path", code="forbidden_import")
-                            # 変数なら csv_path のみ許可
-                            if node.args and isinstance(node.args[0], _ast.Name):
-                                if node.args[0].id != 'csv_path':
-                                    raise SandboxError("forbidden open target", code="forbidden_import")
-            except SandboxError:
-                raise
-            except Exception:
-                # 解析失敗は保守的に許可（後段のRLIMIT/実行で担保）
-                pass
+            # AST allowlist / denylist（判定はコードハッシュでキャッシュ）
+            check_policy(user, CODE_EXEC_POLICY)
 
-            # 付帯コンテキスト（CSVパス）を in.json で渡す
+            # 付帯コンテキスト（CSVパス / 共有スナップショット）は stdin で渡す
+            csv_path = str(storage.dataset_path(dataset_id)) if dataset_id else None
             payload = {
-                "csv_path": os.path.abspath(os.path.join("data", "datasets", f"{dataset_id}.csv")) if dataset_id else None,
+                "csv_path": csv_path,
+                "snapshot_path": colstore.ensure_snapshot(csv_path),
                 "dataset_id": dataset_id,
             }
-            in_path = os.path.join(tmpdir, "in.json")
-            with open(in_path, "w", encoding="utf-8") as f:
-                f.write(_json.dumps(payload))
-
-            wrapper = (
-                "import json, os\n"
-                "cfg=json.loads(open('in.json','r',encoding='utf-8').read())\n"
-                + user + "\n"
-            )
+            # 一時ディレクトリは in.json を明示的に参照するコードのみ（互換用の作業領域）
+            if "in.json" in user:
+                tmpdir = tempfile.mkdtemp(prefix="autoeda_exec_")
+                with open(os.path.join(tmpdir, "in.json"), "w", encoding="utf-8") as f:
+                    f.write(_json.dumps(payload))
+
+            # load_dataset(columns=None, max_rows=None): スナップショットを mmap で読む補助関数。
+            # ラッパー側で定義するため、ユーザーコードの import allowlist は変えない。
+            wrapper = _load_dataset_prelude() + user + "\n"
 
             def _preexec():
                 with contextlib.suppress(Exception):
@@ -250,22 +779,11 @@ class SandboxRunner:
 
             env = {"PYTHONUNBUFFERED": "1", "PATH": "/usr/bin:/bin"}
             tsec = float(timeout_sec or self.timeout_sec)
-            proc = subprocess.Popen(["python3", "-I", "-c", wrapper], cwd=tmpdir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env, preexec_fn=_preexec if hasattr(os, 'setuid') else None)
-            waited = 0.0
-            while True:
-                ret = proc.poll()
-                if ret is not None:
-                    break
-                time.sleep(0.05)
-                waited += 0.05
-                if waited >= tsec:
-                    with contextlib.suppress(Exception):
-                        proc.kill()
-                    raise SandboxError("timeout", code="timeout")
-            out = (proc.stdout.read() if proc.stdout else "").strip()
-            err = (proc.stderr.read() if proc.stderr else "").strip()
+            out, err = self._run_subprocess(wrapper, payload, env=env, preexec=_preexec, timeout_sec=tsec, cwd=tmpdir)
             try:
-                obj = _json.loads(out or "{}")
+                if not out.strip() and err.strip():  # 例外で落ちたコード（NameError 等）は空結果にしない
+                    raise ValueError("no output")
+                obj = _decode_frames(out)
             except Exception:
                 from .security import summarize_logs  # lazy import
                 logs = summarize_logs(err or out, max_lines=6, max_chars=500)
@@ -276,137 +794,36 @@ class SandboxRunner:
         except SandboxError:
             raise
         finally:
-            with contextlib.suppress(Exception):
-                for name in os.listdir(tmpdir):
-                    os.remove(os.path.join(tmpdir, name))
-                os.rmdir(tmpdir)
+            if tmpdir:
+                with contextlib.suppress(Exception):
+                    for name in os.listdir(tmpdir):
+                        os.remove(os.path.join(tmpdir, name))
+                    os.rmdir(tmpdir)
 
-    def run_generated_chart(self, *, job_id: Optional[str], spec_hint: Optional[str], dataset_id: Optional[str], cancel_check: Optional[callable] = None) -> Dict[str, Any]:
+    def run_generated_chart(self, *, job_id: Optional[str], spec_hint: Optional[str], dataset_id: Optional[str], columns: Optional[List[str]] = None, cancel_check: Optional[callable] = None) -> Dict[str, Any]:
         """Execute a constrained Python snippet in a subprocess to emit a Vega-like spec.
 
-        - No third-party imports
+        - No third-party imports（chart_render のソースを埋め込み、標準ライブラリのみで集計/間引き）
         - Read-only CSV under data/datasets/<id>.csv (if present)
         - Time/Memory/File descriptor limits
         - Returns a dict compatible with ChartResult
         """
-        import json as _json
-        import ast as _ast
-        import textwrap
-        tmpdir = tempfile.mkdtemp(prefix="autoeda_exec_")
         try:
+            csv_path = str(storage.dataset_path(dataset_id)) if dataset_id else None
             payload = {
                 "kind": (spec_hint or "bar").lower(),
-                "csv_path": os.path.abspath(os.path.join("data", "datasets", f"{dataset_id}.csv")) if dataset_id else None,
-                "max_rows": 200,
+                "csv_path": csv_path,
+                "snapshot_path": colstore.ensure_snapshot(csv_path),
+                "columns": list(columns or []),
+                "width_px": chart_render.DEFAULT_WIDTH_PX,
+                "height_px": chart_render.DEFAULT_HEIGHT_PX,
+                "max_rows": _chart_max_rows(),
             }
-            in_path = os.path.join(tmpdir, "in.json")
-            with open(in_path, "w", encoding="utf-8") as f:
-                f.write(_json.dumps(payload))
-
-            code = textwrap.dedent(
-                r"""
-                import json, csv, os, time
-                cfg = json.loads(open('in.json','r',encoding='utf-8').read())
-                kind = cfg.get('kind','bar')
-                csv_path = cfg.get('csv_path')
-                # phase-1 delay (generation)
-                try:
-                    d1 = int(os.environ.get('AUTOEDA_SB_TEST_DELAY_MS','0') or '0')
-                    if d1>0: time.sleep(d1/1000.0)
-                except Exception:
-                    pass
-                values = []
-                if csv_path and os.path.exists(csv_path):
-                    try:
-                        with open(csv_path, 'r', encoding='utf-8') as f:
-                            rdr = csv.reader(f)
-                            headers = next(rdr, None)
-                            # choose first numeric-like column if any
-                            col_idx = None
-                            sample = []
-                            for i, row in enumerate(rdr):
-                                if i >= int(cfg.get('max_rows',200)): break
-                                for j, cell in enumerate(row):
-                                    try:
-                                        val = float(cell)
-                                    except Exception:
-                                        val = None
-                                    sample.append((i, j, val))
-                            for _, j, val in sample:
-                                if val is not None:
-                                    col_idx = j; break
-                            if col_idx is None:
-                                # fallback to index-based series
-                                values = [{"x": i, "y": (i%5)+1} for i in range(min(20, len(sample) or 20))]
-                            else:
-                                series = [val for _, j, val in sample if j==col_idx and val is not None]
-                                if not series:
-                                    values = [{"x": i, "y": (i%5)+1} for i in range(20)]
-                                else:
-                                    values = [{"x": i, "y": series[i]} for i in range(min(20, len(series)))]
-                    except Exception:
-                        values = [{"x": i, "y": (i%5)+1} for i in range(20)]
-                else:
-                    values = [{"x": i, "y": (i%5)+1} for i in range(20)]
-
-                spec = {
-                    "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-                    "mark": kind if kind in ("bar","line") else "point",
-                    "data": {"name": "data"},
-                    "encoding": {"x": {"field":"x","type":"quantitative"}, "y": {"field":"y","type":"quantitative"}},
-                    "datasets": {"data": values},
-                    "description": f"generated {kind} chart",
-                }
-                # phase-2 delay (rendering)
-                try:
-                    d2 = int(os.environ.get('AUTOEDA_SB_TEST_DELAY2_MS','0') or '0')
-                    if d2>0: time.sleep(d2/1000.0)
-                except Exception:
-                    pass
-                out = {
-                    "language": "python", "library": "vega", "code": "# generated", "outputs": [
-                        {"type":"vega","mime":"application/json","content": spec}
-                    ]
-                }
-                print(json.dumps(out, ensure_ascii=False))
-                """
-            )
 
-            # Host-side AST scanning (forbidden imports/calls)
-            try:
-                tree = _ast.parse(code)
-                # 明示allowlist（標準ライブラリの一部のみ）
-                allowed_imports = {"json", "csv", "os", "builtins", "time"}
-                # 危険なビルトイン/関数呼び出しを拒否
-                # open() は in.json や csv の参照に必要なため禁止対象から除外
-                banned_calls = {"eval", "exec", "compile", "__import__", "input", "breakpoint"}
-                # OS 経由の実行/FS破壊/環境変更を拒否
-                banned_os_calls = {
-                    "system", "popen", "spawnv", "spawnve", "spawnvp", "spawnvpe",
-                    "remove", "unlink", "rmdir", "removedirs", "rename", "renames",
-                    "chdir", "chmod", "chown",
-                }
-                for node in _ast.walk(tree):
-                    if isinstance(node, _ast.Import):
-                        for alias in node.names:
-                            root = (alias.name or "").split(".")[0]
-                            if root not in allowed_imports:
-                                raise SandboxError(f"forbidden import: {root}", code="forbidden_import")
-                    elif isinstance(node, _ast.ImportFrom):
-                        root = (node.module or "").split(".")[0]
-                        if root and root not in allowed_imports:
-                            raise SandboxError(f"forbidden import: {root}", code="forbidden_import")
-                    elif isinstance(node, _ast.Call):
-                        if isinstance(node.func, _ast.Name) and node.func.id in banned_calls:
-                            raise SandboxError(f"forbidden call: {node.func.id}", code="forbidden_import")
-                        if isinstance(node.func, _ast.Attribute) and isinstance(node.func.value, _ast.Name):
-                            if node.func.value.id == 'os' and node.func.attr in banned_os_calls:
-                                raise SandboxError(f"forbidden os call: os.{node.func.attr}", code="forbidden_import")
-            except SandboxError:
-                raise
-            except Exception:
-                # AST 解析に失敗しても後段のallowlistでガード
-                pass
+            code = _generated_chart_code()
+
+            # Host-side AST scanning (forbidden imports/calls)。固定テンプレートなので 2 回目以降はキャッシュ判定
+            check_policy(code, GENERATED_CHART_POLICY)
 
             def _preexec():  # POSIX only
                 with contextlib.suppress(Exception):
@@ -414,50 +831,33 @@ class SandboxRunner:
                     resource.setrlimit(resource.RLIMIT_CPU, (3, 3))
                     resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
 
-            env = {
-                "PYTHONUNBUFFERED": "1",
-                "PATH": "/usr/bin:/bin",
-                # tests can control cooperative timing via env
+            # tests can control cooperative timing via env
+            delays = {
                 "AUTOEDA_SB_TEST_DELAY_MS": os.environ.get("AUTOEDA_SB_TEST_DELAY_MS", ""),
                 "AUTOEDA_SB_TEST_DELAY2_MS": os.environ.get("AUTOEDA_SB_TEST_DELAY2_MS", ""),
             }
-            proc = subprocess.Popen(["python3", "-I", "-c", code], cwd=tmpdir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env, preexec_fn=_preexec if hasattr(os, 'setuid') else None)
-            waited = 0.0
-            interval = 0.05
-            while True:
-                ret = proc.poll()
-                if ret is not None:
-                    break
-                if cancel_check and cancel_check():
-                    with contextlib.suppress(Exception):
-                        proc.kill()
-                    raise SandboxError("cancelled", code="cancelled")
-                time.sleep(interval)
-                waited += interval
-                if waited >= self.timeout_sec:
-                    with contextlib.suppress(Exception):
-                        proc.kill()
-                    raise SandboxError("timeout", code="timeout")
-            out = (proc.stdout.read() if proc.stdout else "").strip()
-            err = (proc.stderr.read() if proc.stderr else "").strip()
+            if pool_enabled():
+                # Pool: インタプリタ起動なしでワーカー内実行（RLIMIT はワーカーのみ）
+                out = self._run_in_pool(_pool_exec_job, code, payload, delays, cancel_check=cancel_check).strip()
+                err = ""
+                if len(out.encode("utf-8")) > _max_output_bytes():
+                    raise SandboxError("output limit exceeded", code="output_limit")
+            else:
+                env = {"PYTHONUNBUFFERED": "1", "PATH": "/usr/bin:/bin", **delays}
+                out, err = self._run_subprocess(code, payload, env=env, preexec=_preexec, cancel_check=cancel_check)
             try:
-                obj = _json.loads(out or "{}")
+                obj = _decode_frames(out)
             except Exception:
                 from .security import summarize_logs  # lazy import
                 logs = summarize_logs(err or out, max_lines=6, max_chars=500)
                 raise SandboxError("format_error", code="format_error", logs=logs)
             # add meta
             obj.setdefault("meta", {})
-            obj["meta"].update({"engine": "generated", "duration_ms": None})
+            obj["meta"].update({"engine": "generated", "duration_ms": None, "sandbox": "pool" if pool_enabled() else "subprocess"})
             return obj
         except SandboxError:
             raise
         except Exception:
             # fallback to template path
             from . import charts as chartsvc  # type: ignore
-            return chartsvc._template_result(spec_hint, dataset_id)
-        finally:
-            with contextlib.suppress(Exception):
-                for name in os.listdir(tmpdir):
-                    os.remove(os.path.join(tmpdir, name))
-                os.rmdir(tmpdir)
+            return chartsvc._template_result(spec_hint, dataset_id, columns)
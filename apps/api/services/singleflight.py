@@ -0,0 +1,143 @@
+"""Single-flight coalescing of identical in-flight computations.
+
+同じデータセットを複数ユーザーが同時に開くと、同一引数の ``generate_eda_report`` /
+``chart_api`` / ``pii_scan`` / ``recipe_emit`` が並行に走り、CSV 解析や LLM 呼び出しが N 重になる。
+``coalesce(group, key)`` で包んだ関数は、同じキーの計算が実行中なら新たに実行せずその結果を待つ
+（先行呼び出しの例外もそのまま受け取る）。結果は呼び出し側での変更が波及しないようコピーして渡す。
+
+- 待ち時間は ``AUTOEDA_SINGLEFLIGHT_WAIT_SEC``（既定 120 秒）で打ち切り、超過時は自前で実行する
+- ``AUTOEDA_SINGLEFLIGHT=0`` で無効
+- メトリクス: ``autoeda_singleflight_calls_total{group}`` / ``autoeda_singleflight_coalesced_total{group}`` /
+  ``autoeda_singleflight_wait_timeouts_total{group}``（coalesce 率 = coalesced / calls、``stats()`` にも）
+"""
+from __future__ import annotations
+
+import copy
+import functools
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+from . import prometheus
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_CALLS = prometheus.counter("autoeda_singleflight_calls_total", "Calls routed through single-flight groups.", ("group",))
+_COALESCED = prometheus.counter(
+    "autoeda_singleflight_coalesced_total", "Calls served by an identical in-flight computation.", ("group",)
+)
+_TIMEOUTS = prometheus.counter(
+    "autoeda_singleflight_wait_timeouts_total", "Followers that gave up waiting and ran the computation themselves.", ("group",)
+)
+
+
+def enabled() -> bool:
+    return os.environ.get("AUTOEDA_SINGLEFLIGHT", "1") in {"1", "true", "TRUE"}
+
+
+def _wait_sec() -> float:
+    try:
+        return max(0.0, float(os.environ.get("AUTOEDA_SINGLEFLIGHT_WAIT_SEC", "120") or "120"))
+    except ValueError:
+        return 120.0
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "owner")
+
+    def __init__(self, owner: int) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.owner = owner
+
+
+class Group:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"calls": 0, "coalesced": 0, "timeouts": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` unless an identical call (same ``key``) is in flight; then share its outcome."""
+        labels = (self.name,)
+        me = threading.get_ident()
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call(me)
+        _CALLS.inc(labels)
+        assert call is not None
+
+        if leader:
+            try:
+                call.result = fn()
+                return call.result
+            except BaseException as exc:
+                call.error = exc
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+
+        if call.owner == me:  # 同一スレッドの再入は待つと自己デッドロックになる
+            return fn()
+        with self._lock:
+            self._stats["coalesced"] += 1
+        _COALESCED.inc(labels)
+        if not call.done.wait(_wait_sec()):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            _TIMEOUTS.inc(labels)
+            return fn()
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snap: Dict[str, Any] = dict(self._stats, in_flight=len(self._calls))
+        snap["coalesce_ratio"] = round(snap["coalesced"] / snap["calls"], 4) if snap["calls"] else 0.0
+        return snap
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.update(calls=0, coalesced=0, timeouts=0)
+
+
+_GROUPS: Dict[str, Group] = {}
+_GROUPS_LOCK = threading.Lock()
+
+
+def group(name: str) -> Group:
+    with _GROUPS_LOCK:
+        g = _GROUPS.get(name)
+        if g is None:
+            g = _GROUPS[name] = Group(name)
+        return g
+
+
+def coalesce(name: str, key: Callable[..., Hashable]) -> Callable[[F], F]:
+    """Decorator: route calls through ``group(name)`` keyed by ``key(*args, **kwargs)``."""
+    g = group(name)
+
+    def deco(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not enabled():
+                return fn(*args, **kwargs)
+            return g.do(key(*args, **kwargs), functools.partial(fn, *args, **kwargs))
+
+        return wrapper  # type: ignore[return-value]
+
+    return deco
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    with _GROUPS_LOCK:
+        groups = list(_GROUPS.values())
+    return {g.name: g.stats() for g in groups}
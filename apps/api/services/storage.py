@@ -27,6 +27,27 @@ def meta_path(dataset_id: str) -> Path:
     return BASE / f"{dataset_id}{META_SUFFIX}"
 
 
+def dataset_version(dataset_id: str | None, *, include_meta: bool = False) -> str:
+    """CSV の (mtime_ns, size)。データ更新で自然に変わるキャッシュ用の版。
+
+    include_meta=True では .meta.json（PII/リーク状態）の更新も版に含める。CSV が無ければ "" を返す。
+    """
+    if not dataset_id:
+        return ""
+    try:
+        st = dataset_path(dataset_id).stat()
+    except OSError:
+        return ""
+    version = f"{st.st_mtime_ns}:{st.st_size}"
+    if include_meta:
+        try:
+            mst = meta_path(dataset_id).stat()
+            version += f"|{mst.st_mtime_ns}:{mst.st_size}"
+        except OSError:
+            version += "|-"
+    return version
+
+
 def _read_chunks(file_obj, chunk_size: int = 1024 * 1024):
     while True:
         chunk = file_obj.file.read(chunk_size)
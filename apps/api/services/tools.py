@@ -1,7 +1,11 @@
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from fastapi import UploadFile
-from . import storage, recipes
+from . import profiling, storage, recipes, report_store, singleflight
+import contextlib
+import contextvars
 import re
+import threading
+from concurrent.futures import Future
 from collections import Counter
 from datetime import datetime
 from itertools import combinations
@@ -78,6 +82,64 @@ def _mock_report() -> Dict[str, Any]:
     }
 
 
+# リクエスト単位で共有する pandas DataFrame（(path, nrows) -> Future）。
+# 並行オーケストレーション中だけ有効で、profile_api / pii_scan が同じパース結果を読み取り専用で使う。
+_SHARED_FRAMES: "contextvars.ContextVar[Optional[Dict[Tuple[str, Optional[int]], Future]]]" = contextvars.ContextVar("autoeda_shared_frames", default=None)
+_SHARED_FRAMES_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def shared_dataset_scope() -> Iterator[None]:
+    token = _SHARED_FRAMES.set({})
+    try:
+        yield
+    finally:
+        _SHARED_FRAMES.reset(token)
+
+
+def _profile_read_kwargs(sample_ratio: Optional[float]) -> Dict[str, Any]:
+    read_kwargs: Dict[str, Any] = {}
+    if sample_ratio and 0 < sample_ratio < 1:
+        # 粗いサンプル: 先頭n行のみ（本実装では乱択を推奨）
+        read_kwargs["nrows"] = max(10_000, int(200_000 * sample_ratio))
+    return read_kwargs
+
+
+def prefetch_dataset(dataset_id: str, sample_ratio: Optional[float], submit: Callable[..., Any]) -> None:
+    """Start parsing the dataset once (profile_api と同じ範囲) so concurrent tools can share it."""
+    frames = _SHARED_FRAMES.get()
+    path = storage.dataset_path(dataset_id)
+    if frames is None or not path.exists():
+        return
+    nrows = _profile_read_kwargs(sample_ratio).get("nrows")
+    fut: Future = Future()
+    with _SHARED_FRAMES_LOCK:
+        frames[(str(path), nrows)] = fut
+
+    def _parse() -> None:
+        try:
+            import pandas as pd  # type: ignore
+            fut.set_result(pd.read_csv(path, nrows=nrows))
+        except BaseException as exc:
+            fut.set_exception(exc)
+
+    submit(_parse)
+
+
+def _read_csv(path: Path, nrows: Optional[int] = None) -> Any:
+    """pd.read_csv、ただし共有スコープ内で互換な（行数が足りる）パース済みフレームがあれば再利用。"""
+    import pandas as pd  # type: ignore
+    frames = _SHARED_FRAMES.get()
+    if frames:
+        with _SHARED_FRAMES_LOCK:
+            entries = list(frames.items())
+        for (p, n), fut in entries:
+            if p == str(path) and (n is None or (nrows is not None and n >= nrows)):
+                df = fut.result()
+                return df if nrows is None or n == nrows else df.head(nrows)
+    return pd.read_csv(path, nrows=nrows)
+
+
 def profile_api(dataset_id: str, sample_ratio: Optional[float] = None) -> Dict[str, Any]:
     # CSVプロファイル。pandas があれば利用し、無い/失敗時は軽量CSV/モックへフォールバック。
     path = storage.dataset_path(dataset_id)
@@ -88,78 +150,81 @@ def profile_api(dataset_id: str, sample_ratio: Optional[float] = None) -> Dict[s
             import pandas as pd  # type: ignore
             import numpy as np  # type: ignore
             # サンプリング読み込み
-            read_kwargs: Dict[str, Any] = {}
-            if sample_ratio and 0 < sample_ratio < 1:
-                # 粗いサンプル: 先頭n行のみ（本実装では乱択を推奨）
-                read_kwargs["nrows"] = max(10_000, int(200_000 * sample_ratio))
-            df = pd.read_csv(path, **read_kwargs)
-            rows, cols = int(df.shape[0]), int(df.shape[1])
-            missing_rate = float(df.isna().sum().sum()) / float(max(rows * max(cols, 1), 1))
-            # 型推定: pandasのdtypeから概算
-            type_mix = Counter()
-            for dt in df.dtypes:
-                if np.issubdtype(dt, np.integer):
-                    type_mix["int"] += 1
-                elif np.issubdtype(dt, np.floating):
-                    type_mix["float"] += 1
-                else:
-                    type_mix["cat"] += 1
+            read_kwargs = _profile_read_kwargs(sample_ratio)
+            with profiling.span("profile.read_csv"):
+                df = _read_csv(path, **read_kwargs)
+            with profiling.span("profile.infer_types"):
+                rows, cols = int(df.shape[0]), int(df.shape[1])
+                # 型推定: pandasのdtypeから概算
+                type_mix = Counter()
+                for dt in df.dtypes:
+                    if np.issubdtype(dt, np.integer):
+                        type_mix["int"] += 1
+                    elif np.issubdtype(dt, np.floating):
+                        type_mix["float"] += 1
+                    else:
+                        type_mix["cat"] += 1
             # 欠損課題
             issues: List[Dict[str, Any]] = []
-            for col in df.columns:
-                miss = int(df[col].isna().sum())
-                if rows and miss / rows > 0.3:
-                    issues.append({
-                        "severity": "high",
-                        "column": col,
-                        "description": "欠損が多い",
-                        "statistic": {"missing_ratio": round(miss/rows, 2)},
-                        "evidence": make_reference(f"tbl:{col}_missing", "table", f"{dataset_id}:{col}:missing")
-                    })
+            with profiling.span("profile.missing"):
+                missing_rate = float(df.isna().sum().sum()) / float(max(rows * max(cols, 1), 1))
+                for col in df.columns:
+                    miss = int(df[col].isna().sum())
+                    if rows and miss / rows > 0.3:
+                        issues.append({
+                            "severity": "high",
+                            "column": col,
+                            "description": "欠損が多い",
+                            "statistic": {"missing_ratio": round(miss/rows, 2)},
+                            "evidence": make_reference(f"tbl:{col}_missing", "table", f"{dataset_id}:{col}:missing")
+                        })
             # 未来日付
-            for col in df.columns:
-                if df[col].dtype == "object":
-                    try:
-                        dt = pd.to_datetime(df[col], errors="coerce")
-                        future = int((dt > pd.Timestamp.now()).sum())
-                        if future > 0:
-                            issues.append({
-                                "severity": "critical",
-                                "column": col,
-                                "description": "将来日付が含まれている",
-                                "statistic": {"future_dates": future},
-                                "evidence": make_reference(f"tbl:{col}_future_dates", "table", f"{dataset_id}:{col}:future")
-                            })
-                    except Exception:
-                        pass
+            with profiling.span("profile.datetime_scan"):
+                for col in df.columns:
+                    if df[col].dtype == "object":
+                        try:
+                            dt = pd.to_datetime(df[col], errors="coerce")
+                            future = int((dt > pd.Timestamp.now()).sum())
+                            if future > 0:
+                                issues.append({
+                                    "severity": "critical",
+                                    "column": col,
+                                    "description": "将来日付が含まれている",
+                                    "statistic": {"future_dates": future},
+                                    "evidence": make_reference(f"tbl:{col}_future_dates", "table", f"{dataset_id}:{col}:future")
+                                })
+                        except Exception:
+                            pass
             # 分布（最大2列、数値のみ）
-            dists: List[Dict[str, Any]] = []
-            num_cols = [c for c in df.columns if np.issubdtype(df[c].dtype, np.number)]
-            for col in num_cols[:2]:
-                s = df[col].dropna()
-                hist, _ = np.histogram(s, bins=5) if not s.empty else (np.zeros(5, dtype=int), [])
-                dists.append({
-                    "column": col,
-                    "dtype": str(df[col].dtype),
-                    "count": rows,
-                    "missing": int(df[col].isna().sum()),
-                    "histogram": [int(x) for x in hist.tolist()],
-                    "source_ref": make_reference(f"fig:{col}_hist", "figure", f"{dataset_id}:{col}:hist")
-                })
-            # 外れ値（IQRベース、先頭1列のみ）
-            outliers: List[Dict[str, Any]] = []
-            if num_cols:
-                s = df[num_cols[0]].dropna()
-                if not s.empty:
-                    q1, q3 = s.quantile(0.25), s.quantile(0.75)
-                    iqr = q3 - q1
-                    lo, hi = q1 - 1.5 * iqr, q3 + 1.5 * iqr
-                    idx = df.index[(df[num_cols[0]] < lo) | (df[num_cols[0]] > hi)].tolist()[:10]
-                    outliers.append({
-                        "column": num_cols[0],
-                        "indices": [int(i) for i in idx],
-                        "evidence": make_reference(f"tbl:{num_cols[0]}_outliers", "table", f"{dataset_id}:{num_cols[0]}:outliers")
+            with profiling.span("profile.histograms"):
+                dists: List[Dict[str, Any]] = []
+                num_cols = [c for c in df.columns if np.issubdtype(df[c].dtype, np.number)]
+                for col in num_cols[:2]:
+                    s = df[col].dropna()
+                    hist, _ = np.histogram(s, bins=5) if not s.empty else (np.zeros(5, dtype=int), [])
+                    dists.append({
+                        "column": col,
+                        "dtype": str(df[col].dtype),
+                        "count": rows,
+                        "missing": int(df[col].isna().sum()),
+                        "histogram": [int(x) for x in hist.tolist()],
+                        "source_ref": make_reference(f"fig:{col}_hist", "figure", f"{dataset_id}:{col}:hist")
                     })
+            # 外れ値（IQRベース、先頭1列のみ）
+            with profiling.span("profile.outliers"):
+                outliers: List[Dict[str, Any]] = []
+                if num_cols:
+                    s = df[num_cols[0]].dropna()
+                    if not s.empty:
+                        q1, q3 = s.quantile(0.25), s.quantile(0.75)
+                        iqr = q3 - q1
+                        lo, hi = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+                        idx = df.index[(df[num_cols[0]] < lo) | (df[num_cols[0]] > hi)].tolist()[:10]
+                        outliers.append({
+                            "column": num_cols[0],
+                            "indices": [int(i) for i in idx],
+                            "evidence": make_reference(f"tbl:{num_cols[0]}_outliers", "table", f"{dataset_id}:{num_cols[0]}:outliers")
+                        })
 
             references = [make_reference("tbl:summary", "table", dataset_id)]
             references.extend(ref for ref in (dist.get("source_ref") for dist in dists) if ref)
@@ -222,26 +287,27 @@ def profile_api(dataset_id: str, sample_ratio: Optional[float] = None) -> Dict[s
                     except Exception:
                         return "cat", None
 
-            with path.open("r", newline="") as f:
-                reader = csv.DictReader(f)
-                fieldnames = reader.fieldnames or []
-                cols = len(fieldnames)
-                for name in fieldnames:
-                    missing_counts[name] = 0
-                    dtype_votes[name] = {"int": 0, "float": 0, "cat": 0}
-                    numeric_samples[name] = []
-                for row in reader:
-                    rows += 1
-                    for k, v in row.items():
-                        if v is None or v == "":
-                            missing_counts[k] += 1
-                        else:
-                            kind, num = cast_kind(v)
-                            dtype_votes[k][kind] += 1
-                            if num is not None and len(numeric_samples[k]) < 1000:
-                                numeric_samples[k].append(num)
-                    if sample_ratio and rows > int((1.0 - sample_ratio) * 50_000):
-                        break
+            with profiling.span("profile.csv_fallback"):
+                with path.open("r", newline="") as f:
+                    reader = csv.DictReader(f)
+                    fieldnames = reader.fieldnames or []
+                    cols = len(fieldnames)
+                    for name in fieldnames:
+                        missing_counts[name] = 0
+                        dtype_votes[name] = {"int": 0, "float": 0, "cat": 0}
+                        numeric_samples[name] = []
+                    for row in reader:
+                        rows += 1
+                        for k, v in row.items():
+                            if v is None or v == "":
+                                missing_counts[k] += 1
+                            else:
+                                kind, num = cast_kind(v)
+                                dtype_votes[k][kind] += 1
+                                if num is not None and len(numeric_samples[k]) < 1000:
+                                    numeric_samples[k].append(num)
+                        if sample_ratio and rows > int((1.0 - sample_ratio) * 50_000):
+                            break
 
             def pick_dtype(name: str) -> str:
                 votes = dtype_votes.get(name, {})
@@ -320,6 +386,7 @@ def profile_api(dataset_id: str, sample_ratio: Optional[float] = None) -> Dict[s
     except Exception:
         return _mock_report()
 
+@singleflight.coalesce("chart_api", lambda dataset_id, k=5: (dataset_id, k))
 def chart_api(dataset_id: str, k: int = 5) -> List[Dict[str, Any]]:
     """Return up to k chart suggestions ranked by consistency score.
 
@@ -633,9 +700,14 @@ def stats_qna(dataset_id: str, question: str) -> List[Dict[str, Any]]:
 
 def followup(dataset_id: str, question: str) -> List[Dict[str, Any]]:
     answers = stats_qna(dataset_id, question)
+    # 直前の EDA レポートがあればその根拠を引き継ぐ（レポートは再生成しない）
+    snapshot = report_store.load(dataset_id)
+    carried = (snapshot or {}).get("report", {}).get("references", [])[:3]
     for ans in answers:
         ans["text"] = f"フォローアップ: {ans['text']}"
         ans["coverage"] = max(0.85, float(ans.get("coverage", 0.0)))
+        refs = list(ans.get("references") or [])
+        ans["references"] = refs + [r for r in carried if isinstance(r, dict) and r not in refs]
     return answers
 
 
@@ -662,6 +734,8 @@ def prioritize_actions(dataset_id: str, items: List[Dict[str, Any]]) -> List[Dic
     return ranked
 
 
+@singleflight.coalesce("pii_scan", lambda dataset_id, columns=None: (dataset_id, tuple(columns) if columns else None))
+@profiling.traced("pii_scan")
 def pii_scan(dataset_id: str, columns: Optional[List[str]] = None) -> Dict[str, Any]:
     # 互換: columns 指定時は名前ベース。未指定時は内容ベースで簡易検出。
     candidates = {"email", "phone", "ssn"}
@@ -689,8 +763,7 @@ def pii_scan(dataset_id: str, columns: Optional[List[str]] = None) -> Dict[str,
     ssn_re = re.compile(r"\b\d{3}-\d{2}-\d{4}\b")
     hits: Dict[str, set] = {"email": set(), "phone": set(), "ssn": set()}
     try:
-        import pandas as pd  # type: ignore
-        df = pd.read_csv(path, nrows=20_000)
+        df = _read_csv(path, nrows=20_000)
         for col in df.columns:
             s = df[col].astype(str).fillna("")
             sample = "\n".join(s.head(500).tolist())
@@ -728,6 +801,7 @@ def apply_pii_policy(dataset_id: str, mask_policy: str, columns: Optional[List[s
     }
 
 
+@profiling.traced("leakage_scan")
 def leakage_scan(dataset_id: str) -> Dict[str, Any]:
     flagged = ["target_next_month", "rolling_mean_7d", "leak_feature"]
     rules = ["time_causality", "aggregation_trace"]
@@ -749,8 +823,11 @@ def resolve_leakage(dataset_id: str, action: str, columns: List[str]) -> Dict[st
     return leakage_scan(dataset_id)
 
 
+@singleflight.coalesce("recipe_emit", lambda dataset_id: dataset_id)
 def recipe_emit(dataset_id: str) -> Dict[str, Any]:
-    report = profile_api(dataset_id)
+    # サンプリング無しの EDA スナップショットがあれば再プロファイルしない（要約の再現性検証があるため）
+    snapshot = report_store.load(dataset_id, full_only=True)
+    report = snapshot["report"] if snapshot is not None else profile_api(dataset_id)
     artifacts = recipes.build_artifacts(dataset_id, report)
     summary = report.get("summary", {})
     dataset_path = Path(artifacts["dataset_path"])
@@ -0,0 +1,273 @@
+"""In-process IVF (inverted file) ANN index and a Chroma-shaped local vector store.
+
+``AUTOEDA_RAG_BACKEND=local`` のとき ``rag`` は Chroma の代わりに ``LocalVectorStore`` を使う。
+埋め込みは ``local_embeddings``（オフライン）。
+
+- ``IVFIndex``: 球面 k-means（``nlist ≈ √N``、固定シードで決定的）で重心を学習し、クエリは
+  近い重心 ``AUTOEDA_RAG_IVF_NPROBE`` 個のリストだけを内積で走査する（未設定なら ``nlist/4``、
+  最低 8。特徴ハッシュの埋め込みはクラスタ構造が弱く、固定の 8 では ``nlist`` が増えるほど
+  再現率が落ちるため）。件数が ``AUTOEDA_RAG_IVF_MIN``（既定 8192）未満なら全件の厳密検索。追加分は最寄りの重心へ割り当て、
+  学習時の 2 倍を超えたら次の検索時に再学習する
+- ``LocalVectorStore``: ``upsert`` / ``query`` / ``count`` / ``get(where=)`` / ``delete`` を Chroma と
+  同じ形で提供し、``data/rag/local/``（``docs.json`` + ``vectors.npz``）へ原子的に保存する
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from . import local_embeddings
+
+try:  # pragma: no cover - optional dependency import
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+
+def _env_int(name: str, default: int, minimum: int) -> int:
+    try:
+        return max(minimum, int(os.environ.get(name, str(default)) or default))
+    except ValueError:
+        return default
+
+
+class IVFIndex:
+    """IVF over L2-normalised float32 rows (score = inner product)."""
+
+    def __init__(self, dim: int, *, seed: int = 0) -> None:
+        self.dim = dim
+        self.seed = seed
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.centroids: Optional[Any] = None
+        self.assign = np.zeros(0, dtype=np.int32)
+        self._trained_on = 0
+        self._order: Optional[Any] = None
+        self._offsets: Optional[Any] = None
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    # --- 構築 -------------------------------------------------------------
+    def add(self, vectors: Any) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        self.vectors = np.concatenate([self.vectors, vectors]) if len(self) else vectors.copy()
+        if self.centroids is not None:
+            self.assign = np.concatenate([self.assign, self._nearest(vectors)])
+        self._order = None
+
+    def keep(self, mask: Any) -> None:
+        """Drop rows where ``mask`` is False (row numbers shift down)."""
+        self.vectors = self.vectors[mask]
+        if self.centroids is not None:
+            self.assign = self.assign[mask]
+        self._order = None
+
+    def replace(self, rows: Any, vectors: Any) -> None:
+        self.vectors[rows] = vectors
+        if self.centroids is not None:
+            self.assign[rows] = self._nearest(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        self._order = None
+
+    def _nearest(self, vectors: Any) -> Any:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def train(self, iterations: int = 8) -> None:
+        n = len(self)
+        if n < _env_int("AUTOEDA_RAG_IVF_MIN", 8192, 1):
+            self.centroids, self.assign, self._trained_on = None, np.zeros(0, dtype=np.int32), n
+            return
+        nlist = max(1, min(1024, int(n ** 0.5)))
+        rng = np.random.default_rng(self.seed)
+        centroids = self.vectors[rng.choice(n, size=nlist, replace=False)].copy()
+        # 重心の更新は学習用サンプル（最大 nlist×64 行）で行い、最後に全件を割り当てる
+        sample = self.vectors[rng.choice(n, size=min(n, nlist * 64), replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            filled = norms[:, 0] > 0
+            centroids[filled] = sums[filled] / norms[filled]
+        self.centroids = centroids
+        self.assign = self._nearest(self.vectors)
+        self._trained_on = n
+        self._order = None
+
+    def _lists(self) -> None:
+        if self.centroids is None:
+            return
+        self._order = np.argsort(self.assign, kind="stable")
+        counts = np.bincount(self.assign, minlength=len(self.centroids))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    # --- 検索 -------------------------------------------------------------
+    def search(self, queries: Any, top_k: int, nprobe: Optional[int] = None) -> List[List[tuple]]:
+        """Return ``[[(row, score), ...], ...]`` per query, best first."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        n = len(self)
+        if not n or top_k <= 0:
+            return [[] for _ in range(len(queries))]
+        needs_training = self._trained_on == 0 or n > 2 * self._trained_on
+        if needs_training or (self.centroids is None and n >= _env_int("AUTOEDA_RAG_IVF_MIN", 8192, 1)):
+            self.train()
+        if self.centroids is None:
+            return [self._top(np.arange(n), self.vectors @ q, top_k) for q in queries]
+        if self._order is None:
+            self._lists()
+        nlist = len(self.centroids)
+        nprobe = min(nlist, nprobe or _env_int("AUTOEDA_RAG_IVF_NPROBE", 0, 0) or max(8, -(-nlist // 4)))
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+        out = []
+        for q, lists in zip(queries, probes):
+            rows = np.concatenate([self._order[self._offsets[c]:self._offsets[c + 1]] for c in lists])
+            out.append(self._top(rows, self.vectors[rows] @ q, top_k))
+        return out
+
+    @staticmethod
+    def _top(rows: Any, scores: Any, top_k: int) -> List[tuple]:
+        if not len(rows):
+            return []
+        k = min(top_k, len(rows))
+        part = np.argpartition(-scores, k - 1)[:k]
+        best = part[np.argsort(-scores[part], kind="stable")]
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+
+class LocalVectorStore:
+    """Chroma ``Collection`` の一部 API を持つオフラインのベクトルストア。"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self.index = IVFIndex(local_embeddings.dim())
+        self._load()
+
+    # --- 永続化 -----------------------------------------------------------
+    def _load(self) -> None:
+        docs_path, vec_path = self.path / "docs.json", self.path / "vectors.npz"
+        try:
+            docs = json.loads(docs_path.read_text(encoding="utf-8"))
+            with np.load(vec_path) as data:
+                vectors = data["vectors"]
+        except (OSError, ValueError, KeyError):
+            return
+        if docs.get("model") != local_embeddings.model_name() or len(vectors) != len(docs.get("ids", [])):
+            vectors = local_embeddings.embed(docs.get("documents", []))  # 次元変更などは再計算
+        self.ids = list(docs.get("ids", []))
+        self.documents = list(docs.get("documents", []))
+        self.metadatas = list(docs.get("metadatas", []))
+        self._rows = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.index.add(vectors)
+
+    def _save(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "model": local_embeddings.model_name(),
+            "ids": self.ids,
+            "documents": self.documents,
+            "metadatas": self.metadatas,
+        }
+        self._atomic_write(self.path / "vectors.npz", lambda f: np.savez(f, vectors=self.index.vectors))
+        self._atomic_write(
+            self.path / "docs.json", lambda f: f.write(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        )
+
+    @staticmethod
+    def _atomic_write(target: Path, write: Any) -> None:
+        fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, target)
+        except Exception:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+            raise
+
+    # --- Chroma 互換 API ---------------------------------------------------
+    def count(self) -> int:
+        return len(self.ids)
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        embeddings: Optional[Any] = None,
+    ) -> None:
+        ids, documents = list(ids), list(documents)
+        metadatas = list(metadatas or [{} for _ in ids])
+        vectors = local_embeddings.embed(documents) if embeddings is None else np.asarray(embeddings, dtype=np.float32)
+        # バッチ内で重複した id は後勝ちで 1 件に畳む（同じ本文の id 無し文書は _stable_id が一致する）
+        latest = {doc_id: i for i, doc_id in enumerate(ids)}
+        with self._lock:
+            new_src: List[int] = []
+            replace_rows: List[int] = []
+            replace_src: List[int] = []
+            for doc_id, i in latest.items():
+                row = self._rows.get(doc_id)
+                if row is None:
+                    new_src.append(i)
+                else:
+                    replace_rows.append(row)
+                    replace_src.append(i)
+            # 索引を先に更新し、成功してから一覧を書き換える（途中で失敗しても不整合を残さない）
+            if replace_rows:
+                self.index.replace(np.asarray(replace_rows), vectors[replace_src])
+            if new_src:
+                self.index.add(vectors[new_src])
+            for row, i in zip(replace_rows, replace_src):
+                self.documents[row], self.metadatas[row] = documents[i], metadatas[i] or {}
+            for i in new_src:
+                self._rows[ids[i]] = len(self.ids)
+                self.ids.append(ids[i])
+                self.documents.append(documents[i])
+                self.metadatas.append(metadatas[i] or {})
+            self._save()
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            drop = {self._rows[doc_id] for doc_id in ids if doc_id in self._rows}
+            if not drop:
+                return
+            mask = np.ones(len(self.ids), dtype=bool)
+            mask[list(drop)] = False
+            self.index.keep(mask)
+            keep = [i for i in range(len(self.ids)) if i not in drop]
+            self.ids = [self.ids[i] for i in keep]
+            self.documents = [self.documents[i] for i in keep]
+            self.metadatas = [self.metadatas[i] for i in keep]
+            self._rows = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            self._save()
+
+    def get(self, where: Optional[Dict[str, Any]] = None, ids: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        with self._lock:
+            rows = range(len(self.ids)) if ids is None else [self._rows[i] for i in ids if i in self._rows]
+            if where:
+                rows = [r for r in rows if all(self.metadatas[r].get(k) == v for k, v in where.items())]
+            rows = list(rows)
+            return {
+                "ids": [self.ids[r] for r in rows],
+                "documents": [self.documents[r] for r in rows],
+                "metadatas": [self.metadatas[r] for r in rows],
+            }
+
+    def query(self, query_texts: Sequence[str], n_results: int = 5) -> Dict[str, Any]:
+        vectors = local_embeddings.embed(list(query_texts))
+        with self._lock:
+            hits = self.index.search(vectors, n_results)
+            return {
+                "ids": [[self.ids[r] for r, _ in row] for row in hits],
+                "documents": [[self.documents[r] for r, _ in row] for row in hits],
+                "metadatas": [[self.metadatas[r] for r, _ in row] for row in hits],
+                "distances": [[1.0 - s for _, s in row] for row in hits],
+            }
@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_rag_state(monkeypatch, tmp_path):
+    # ingest を通るテストがリポジトリ内の data/rag/（埋め込みキャッシュ / マニフェスト）へ書かないようにする
+    monkeypatch.setenv("AUTOEDA_EMBEDDING_CACHE_DIR", str(tmp_path / "rag-embeddings"))
+    monkeypatch.setenv("AUTOEDA_RAG_MANIFEST", str(tmp_path / "rag-manifest.json"))
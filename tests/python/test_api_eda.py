@@ -78,3 +78,42 @@ def test_api_eda_records_metrics(monkeypatch):
     assert event["groundedness"] == 0.91
     assert event["fallback_applied"] is False
     assert "duration_ms" in event
+
+
+def test_api_eda_attaches_timing_tree_and_debug_header(monkeypatch):
+    from apps.api.services import profiling
+
+    payload = {
+        "summary": {"rows": 10, "cols": 2, "missing_rate": 0.0, "type_mix": {"int": 2}},
+        "distributions": [],
+        "key_features": [],
+        "outliers": [],
+        "data_quality_report": {"issues": []},
+        "next_actions": [],
+        "references": [],
+    }
+
+    def fake_generate(dataset_id, sample_ratio=None):
+        with profiling.span("profile"):
+            with profiling.span("profile.read_csv"):
+                pass
+        with profiling.span("llm.invoke_agent"):
+            pass
+        return payload, {"groundedness": 1.0}
+
+    monkeypatch.setattr(orchestrator, "generate_eda_report", fake_generate)
+    recorded = {}
+    monkeypatch.setattr(metrics, "record_event", lambda name, **props: recorded.setdefault(name, props))
+    monkeypatch.setattr(metrics, "persist_event", lambda payload: None)
+
+    client = TestClient(app)
+    resp = client.post("/api/eda", json={"dataset_id": "ds_api"})
+    assert "Server-Timing" not in resp.headers
+    timing = recorded["EDAReportGenerated"]["timing"]
+    assert timing["name"] == "eda"
+    assert [c["name"] for c in timing["children"]] == ["profile", "llm.invoke_agent"]
+    assert timing["children"][0]["children"][0]["name"] == "profile.read_csv"
+
+    resp = client.post("/api/eda", json={"dataset_id": "ds_api"}, headers={"X-Debug-Timing": "1"})
+    assert resp.status_code == 200
+    assert "profile.read_csv;dur=" in resp.headers["Server-Timing"]
@@ -0,0 +1,99 @@
+import math
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.getcwd())
+from apps.api.services import chart_render, charts as chartsvc, storage
+from apps.api.services.sandbox import SandboxRunner
+
+
+@pytest.fixture
+def large_dataset(tmp_path, monkeypatch):
+    def dataset_path(dataset_id: str) -> Path:
+        return tmp_path / f"{dataset_id}.csv"
+
+    monkeypatch.setattr(storage, "dataset_path", dataset_path)
+    lines = ["t,value,segment"]
+    for i in range(50_000):
+        lines.append(f"{i},{math.sin(i / 500.0) * 100 + (i % 7)},{'AB'[i % 2]}")
+    dataset_path("ds_big").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return "ds_big"
+
+
+def test_lttb_keeps_endpoints_and_budget():
+    pts = [(float(i), float((i * 37) % 101)) for i in range(10_000)]
+    out = chart_render.lttb(pts, 200)
+    assert len(out) == 200
+    assert out[0] == pts[0] and out[-1] == pts[-1]
+    assert [p[0] for p in out] == sorted(p[0] for p in out)
+
+
+def test_min_max_downsample_preserves_spike():
+    pts = [(float(i), 0.0) for i in range(5_000)]
+    pts[2_345] = (2_345.0, 999.0)
+    out = chart_render.min_max_downsample(pts, 100)
+    assert len(out) <= 200
+    assert (2_345.0, 999.0) in out
+
+
+def test_histogram_and_bin2d_conserve_counts():
+    values = [float(i % 97) for i in range(10_000)]
+    assert sum(b["count"] for b in chart_render.histogram(values, 30)) == 10_000
+    cells = chart_render.bin2d([(v, v * 2) for v in values], 30, 20)
+    assert sum(c["count"] for c in cells) == 10_000
+
+
+def test_histogram_handles_range_overflow_and_non_finite():
+    bins = chart_render.histogram([1e308, -1e308, 0.0, float("nan"), float("inf")], 4)
+    assert [b["count"] for b in bins] == [1, 0, 1, 1]
+    assert bins[0]["bin_start"] == -1e308 and bins[-1]["bin_end"] == 1e308
+    cells = chart_render.bin2d([(1e308, 0.0), (-1e308, 1.0), (float("nan"), 2.0)], 2, 2)
+    assert [(c["x0"], c["count"]) for c in cells] == [(-1e308, 1), (0.0, 1)]
+
+
+def test_template_result_binds_requested_columns(large_dataset):
+    res = chartsvc._template_result("line", large_dataset, ["t", "value"])
+    spec = res["outputs"][1]["content"]
+    assert res["outputs"][0]["mime"] == "image/svg+xml"
+    assert res["meta"]["rows"] == 50_000
+    assert res["meta"]["columns"] == ["t", "value"]
+    assert len(spec["datasets"]["data"]) <= spec["width"]
+    assert spec["encoding"]["y"]["title"] == "value"
+
+
+def test_template_scatter_switches_to_2d_bins(large_dataset):
+    res = chartsvc._template_result("scatter", large_dataset, ["t", "value"])
+    spec = res["outputs"][1]["content"]
+    assert spec["mark"] == "rect"
+    assert sum(c["count"] for c in spec["datasets"]["data"]) == 50_000
+
+
+def test_template_bar_counts_categories(large_dataset):
+    res = chartsvc._template_result("bar", large_dataset, ["segment"])
+    data = res["outputs"][1]["content"]["datasets"]["data"]
+    assert {d["category"]: d["count"] for d in data} == {"A": 25_000, "B": 25_000}
+
+
+def test_generated_chart_renders_downsampled_spec(large_dataset, monkeypatch):
+    monkeypatch.delenv("AUTOEDA_SANDBOX_POOL", raising=False)
+    monkeypatch.setenv("AUTOEDA_SB_TEST_DELAY_MS", "0")
+    monkeypatch.setenv("AUTOEDA_SB_TEST_DELAY2_MS", "0")
+    obj = SandboxRunner(timeout_sec=10.0).run_generated_chart(job_id=None, spec_hint="line", dataset_id=large_dataset, columns=["t", "value"])
+    spec = obj["outputs"][0]["content"]
+    assert obj["meta"]["engine"] == "generated"
+    assert obj["meta"]["rows"] == 50_000
+    assert obj["meta"]["downsample"] in {"lttb", "minmax+lttb"}
+    assert len(spec["datasets"]["data"]) == chart_render.DEFAULT_WIDTH_PX
+
+
+def test_svg_escapes_column_names(tmp_path, monkeypatch):
+    import xml.etree.ElementTree as ET
+
+    monkeypatch.setattr(storage, "dataset_path", lambda dataset_id: tmp_path / f"{dataset_id}.csv")
+    (tmp_path / "ds_amp.csv").write_text('"R&D <cost>",x\n' + "".join(f"{i},{i * 2}\n" for i in range(50)), encoding="utf-8")
+    res = chartsvc._template_result("bar", "ds_amp", ["R&D <cost>"])
+    svg = res["outputs"][0]["content"]
+    assert ET.fromstring(svg).find("{http://www.w3.org/2000/svg}text").text == "Bar (R&D <cost>)"
@@ -0,0 +1,81 @@
+import math
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.getcwd())
+from apps.api.services import chart_render, charts as chartsvc, colstore, storage
+from apps.api.services.sandbox import SandboxRunner
+
+
+@pytest.fixture
+def snap_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("AUTOEDA_SNAPSHOT_DIR", str(tmp_path / "snap"))
+    monkeypatch.delenv("AUTOEDA_SANDBOX_POOL", raising=False)
+
+    def dataset_path(dataset_id: str) -> Path:
+        return tmp_path / f"{dataset_id}.csv"
+
+    monkeypatch.setattr(storage, "dataset_path", dataset_path)
+    rows = ["x,y,label"] + [f"{i},{'' if i % 10 == 0 else i * 0.5},名前{i % 3}" for i in range(1_000)]
+    dataset_path("ds_snap").write_text("\n".join(rows) + "\n", encoding="utf-8")
+    colstore.clear()
+    yield dataset_path("ds_snap")
+    colstore.clear()
+
+
+def test_snapshot_roundtrip_is_typed_and_zero_copy(snap_env):
+    path = colstore.ensure_snapshot(str(snap_env))
+    assert path and path.endswith(".aeds")
+    assert not os.access(path, os.W_OK) or os.geteuid() == 0
+    cols = chart_render.read_snapshot(path, ["x", "y", "label"])
+    assert isinstance(cols["x"], memoryview) and cols["x"].format == "d"
+    assert cols["x"][999] == 999.0
+    assert math.isnan(cols["y"][0]) and cols["y"][3] == 1.5
+    assert cols["label"][4] == "名前1"
+    assert len(cols["label"]) == 1_000
+
+
+def test_snapshot_built_once_per_file_version(snap_env, monkeypatch):
+    calls = {"n": 0}
+    real = colstore.build_snapshot
+
+    def _counting(csv_path, out_path):
+        calls["n"] += 1
+        return real(csv_path, out_path)
+
+    monkeypatch.setattr(colstore, "build_snapshot", _counting)
+    first = colstore.ensure_snapshot(str(snap_env))
+    for _ in range(5):
+        assert colstore.ensure_snapshot(str(snap_env)) == first
+    assert calls["n"] == 1
+
+    snap_env.write_text("x,y\n1,2\n", encoding="utf-8")
+    second = colstore.ensure_snapshot(str(snap_env))
+    assert second != first and calls["n"] == 2
+    assert not os.path.exists(first)
+
+
+def test_template_and_generated_charts_read_snapshot(snap_env, monkeypatch):
+    monkeypatch.setenv("AUTOEDA_SB_TEST_DELAY_MS", "0")
+    monkeypatch.setenv("AUTOEDA_SB_TEST_DELAY2_MS", "0")
+    tpl = chartsvc._template_result("bar", "ds_snap", ["label"])
+    assert tpl["meta"]["source"] == "snapshot"
+    assert {d["category"] for d in tpl["outputs"][1]["content"]["datasets"]["data"]} == {"名前0", "名前1", "名前2"}
+    gen = SandboxRunner(timeout_sec=10.0).run_generated_chart(job_id=None, spec_hint="line", dataset_id="ds_snap", columns=["x", "y"])
+    assert gen["meta"]["source"] == "snapshot"
+    assert gen["meta"]["rows"] == 1_000
+    # y の欠損（NaN）100 行を除いた 900 点を画素予算まで LTTB で間引く
+    assert gen["meta"]["downsample"] == "lttb"
+    assert len(gen["outputs"][0]["content"]["datasets"]["data"]) == chart_render.DEFAULT_WIDTH_PX
+
+
+def test_code_exec_load_dataset_helper(snap_env):
+    code = (
+        "cols = load_dataset(['x', 'label'])\n"
+        "print(json.dumps({'language': 'python', 'library': 'none', 'outputs': [{'type': 'text', 'mime': 'text/plain', 'content': str(sum(cols['x'])) + ':' + cols['label'][2]}]}))\n"
+    )
+    obj = SandboxRunner(timeout_sec=10.0).run_code_exec(code=code, dataset_id="ds_snap")
+    assert obj["outputs"][0]["content"] == f"{float(sum(range(1_000)))}:名前2"
@@ -0,0 +1,114 @@
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from apps.api import config as app_config
+from apps.api.services import llm_cache, orchestrator, storage
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("AUTOEDA_LLM_CACHE_DIR", str(tmp_path / "llm_cache"))
+    monkeypatch.delenv("AUTOEDA_LLM_CACHE", raising=False)
+    monkeypatch.setattr(storage, "dataset_path", lambda dsid: tmp_path / f"{dsid}.csv")
+    llm_cache.clear()
+    yield tmp_path / "llm_cache"
+    llm_cache.clear()
+
+
+def test_key_ignores_semantic_noise():
+    base = {"system": "You are EDA.\nReturn JSON.", "user": '{"dataset": "ds", "updated_at": "2025-01-01T00:00:00"}'}
+    noisy = {
+        "user": '{"dataset":  "ds", "updated_at": "2026-10-19T09:30:00"}\n\n',
+        "system": "You are  EDA.\r\n\n\nReturn ＪＳＯＮ.",
+    }
+    assert llm_cache.make_key("openai", "m", 0.3, base, "ds") == llm_cache.make_key("openai", "m", 0.3, noisy, "ds")
+    assert llm_cache.make_key("openai", "m", 0.3, base, "ds") != llm_cache.make_key("openai", "m", 0.2, base, "ds")
+    assert llm_cache.make_key("openai", "m", 0.3, base, "ds") != llm_cache.make_key("gemini", "m", 0.3, base, "ds")
+
+
+def test_dataset_change_changes_key(cache_dir):
+    csv = cache_dir.parent / "ds_v.csv"
+    csv.write_text("a\n1\n", encoding="utf-8")
+    prompt = {"system": "s", "user": "u"}
+    k1 = llm_cache.make_key("openai", "m", 0.3, prompt, "ds_v")
+    csv.write_text("a\n1\n2\n", encoding="utf-8")
+    assert llm_cache.make_key("openai", "m", 0.3, prompt, "ds_v") != k1
+
+
+def test_ttl_expiry(monkeypatch):
+    llm_cache.put("ds", "k", "cached")
+    assert llm_cache.get("ds", "k") == "cached"
+    monkeypatch.setenv("AUTOEDA_LLM_CACHE_TTL_SEC", "0")
+    time.sleep(0.01)
+    assert llm_cache.get("ds", "k") is None
+    assert llm_cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_survives_restart(monkeypatch, cache_dir):
+    monkeypatch.setenv("AUTOEDA_LLM_CACHE_MAX_ENTRIES", "2")
+    llm_cache.put("ds", "a", "A")
+    llm_cache.put("ds", "b", "B")
+    past = time.time() - 60
+    os.utime(cache_dir / "ds" / "a.json", (past, past))
+    os.utime(cache_dir / "ds" / "b.json", (past + 1, past + 1))
+    # 再起動相当: 索引を捨てて mtime から復元
+    llm_cache._INDEX_DIR = None
+    assert llm_cache.get("ds", "a") == "A"  # a を最新に
+    llm_cache.put("ds", "c", "C")
+    assert llm_cache.get("ds", "b") is None
+    assert llm_cache.get("ds", "a") == "A" and llm_cache.get("ds", "c") == "C"
+    assert llm_cache.stats()["evictions"] == 1
+
+
+def test_invalidate_dataset_is_scoped():
+    llm_cache.put("ds_a", "k1", "x")
+    llm_cache.put("ds_a", "k2", "y")
+    llm_cache.put("ds_b", "k1", "z")
+    assert llm_cache.invalidate_dataset("ds_a") == 2
+    assert llm_cache.get("ds_a", "k1") is None
+    assert llm_cache.get("ds_b", "k1") == "z"
+
+
+def test_eda_report_reports_cache_hit(monkeypatch, tmp_path):
+    creds = tmp_path / "credentials.json"
+    creds.write_text(json.dumps({"llm": {"provider": "openai", "openai": {"api_key": "dummy"}}}), encoding="utf-8")
+    monkeypatch.setenv("AUTOEDA_CREDENTIALS_FILE", str(creds))
+    app_config.reset_cache()
+    report = {
+        "summary": {"rows": 10, "cols": 1, "missing_rate": 0.0, "type_mix": {"int": 1}},
+        "distributions": [],
+        "data_quality_report": {"issues": []},
+        "key_features": [],
+        "next_actions": [],
+        "references": [],
+    }
+    monkeypatch.setattr(orchestrator.tools, "profile_api", lambda *a, **k: json.loads(json.dumps(report)))
+    monkeypatch.setattr(orchestrator.tools, "pii_scan", lambda *a, **k: {"detected_fields": [], "mask_policy": "MASK"})
+    monkeypatch.setattr(orchestrator.tools, "leakage_scan", lambda *a, **k: {"flagged_columns": [], "rules_matched": []})
+    monkeypatch.setattr(orchestrator, "_retrieve_context", lambda report: [])
+    monkeypatch.setattr(orchestrator.rag, "load_default_corpus", lambda: None)
+    monkeypatch.setattr(orchestrator, "_rag_seeded", True)
+    calls = []
+
+    class DummyResponses:
+        def create(self, **kwargs):
+            calls.append(kwargs)
+            text = json.dumps({"key_features": ["cached insight"], "next_actions": [], "references": []})
+            return SimpleNamespace(output=[SimpleNamespace(content=[SimpleNamespace(type="output_text", text=text)])])
+
+    monkeypatch.setattr(orchestrator, "OpenAI", lambda *a, **k: SimpleNamespace(responses=DummyResponses()))
+
+    first, ev1 = orchestrator.generate_eda_report("ds_cache")
+    second, ev2 = orchestrator.generate_eda_report("ds_cache")
+    assert len(calls) == 1
+    assert (ev1["llm_cache"], ev2["llm_cache"]) == ("miss", "hit")
+    assert second["key_features"] == first["key_features"] == ["cached insight"]
+
+    llm_cache.invalidate_dataset("ds_cache")
+    _, ev3 = orchestrator.generate_eda_report("ds_cache")
+    assert ev3["llm_cache"] == "miss" and len(calls) == 2
+    app_config.reset_cache()
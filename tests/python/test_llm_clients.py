@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from apps.api import config as app_config
+from apps.api.services import llm_clients, orchestrator
+
+_HANDSHAKE_SEC = 0.05
+
+
+class _StubProvider(BaseHTTPRequestHandler):
+    """Minimal /v1/responses stand-in; a per-connection delay emulates TCP+TLS setup."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        type(self).connections += 1
+        time.sleep(_HANDSHAKE_SEC)
+        super().setup()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        text = json.dumps({"key_features": ["stub"], "next_actions": [], "references": []})
+        body = json.dumps({
+            "id": "resp_1",
+            "object": "response",
+            "created_at": 0,
+            "model": "stub",
+            "status": "completed",
+            "output": [{"type": "message", "id": "msg_1", "role": "assistant", "status": "completed",
+                        "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_provider(tmp_path, monkeypatch):
+    pytest.importorskip("openai")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    creds = tmp_path / "credentials.json"
+    creds.write_text(json.dumps({"llm": {"provider": "openai", "openai": {"api_key": "sk-stub"}}}), encoding="utf-8")
+    monkeypatch.setenv("AUTOEDA_CREDENTIALS_FILE", str(creds))
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setenv("AUTOEDA_LLM_MAX_RETRIES", "0")
+    monkeypatch.setenv("AUTOEDA_LLM_CACHE", "0")  # 毎回プロバイダへ到達させる
+    _StubProvider.connections = 0
+    app_config.reset_cache()
+    yield server
+    app_config.reset_cache()
+    server.shutdown()
+    server.server_close()
+
+
+def _invoke():
+    return orchestrator._invoke_llm_agent("ds_stub", {"summary": {}}, None, None, [])
+
+
+def test_registry_reuses_connection_across_calls(stub_provider):
+    from openai import OpenAI
+
+    calls = 5
+    assert _invoke()["key_features"] == ["stub"]  # 初回はクライアント生成・SDK の遅延 import を含む
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        assert _invoke()["key_features"] == ["stub"]
+    pooled = time.perf_counter() - t0
+    assert _StubProvider.connections == 1
+    assert llm_clients.stats() == {"clients": 1, "created": 1, "reused": calls}
+
+    # 旧挙動: 呼び出し毎に新しいクライアント（= 新しいコネクション）
+    _StubProvider.connections = 0
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        client = OpenAI(api_key="sk-stub", max_retries=0)
+        client.responses.create(model="stub", input="hi")
+        client.close()
+    fresh = time.perf_counter() - t0
+    assert _StubProvider.connections == calls
+    # 接続確立（_HANDSHAKE_SEC）を毎回払わない分だけ速い
+    assert pooled < fresh - (calls - 1) * _HANDSHAKE_SEC
+
+
+def test_reset_cache_drops_clients(stub_provider):
+    _invoke()
+    assert llm_clients.stats()["clients"] == 1
+    app_config.reset_cache()
+    assert llm_clients.stats()["clients"] == 0
+    _invoke()
+    assert _StubProvider.connections == 2
+
+
+def test_gemini_configure_once_per_key(monkeypatch):
+    class DummyGenAI:
+        def __init__(self):
+            self.configured = []
+
+        def configure(self, api_key=None):
+            self.configured.append(api_key)
+
+        def GenerativeModel(self, name, system_instruction=None):
+            return (name, system_instruction)
+
+    genai = DummyGenAI()
+    app_config.reset_cache()
+    for prompt in ("a", "b", "c"):
+        assert llm_clients.gemini_model(genai, "gm-1", "m", prompt) == ("m", prompt)
+    llm_clients.gemini_model(genai, "gm-2", "m", "d")
+    assert genai.configured == ["gm-1", "gm-2"]
+    app_config.reset_cache()
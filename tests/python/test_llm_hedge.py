@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from apps.api import config as app_config
+from apps.api.services import llm_hedge, orchestrator
+
+
+@pytest.fixture(autouse=True)
+def hedge_env(monkeypatch):
+    monkeypatch.setenv("AUTOEDA_LLM_HEDGE_DELAY_SEC", "0.05")
+    llm_hedge.reset()
+    yield
+    llm_hedge.reset()
+
+
+def _slow(result, seconds, log):
+    def call(cancel):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            if cancel.wait(0.005):
+                log.append("cancelled")
+                raise llm_hedge.Cancelled()
+        return result
+
+    return call
+
+
+def test_fast_primary_is_not_hedged():
+    log = []
+    calls = {"openai": _slow("a", 0.0, log), "gemini": _slow("b", 0.0, log)}
+    assert llm_hedge.race("openai", "gemini", lambda name, cancel: calls[name](cancel)) == ("openai", "a", False)
+    assert llm_hedge.stats()["hedged"] == 0
+
+
+def test_slow_primary_is_hedged_and_loser_cancelled():
+    log = []
+    calls = {"openai": _slow("a", 1.0, log), "gemini": _slow("b", 0.01, log)}
+    t0 = time.perf_counter()
+    winner = llm_hedge.race("openai", "gemini", lambda name, cancel: calls[name](cancel))
+    assert winner == ("gemini", "b", True)
+    assert time.perf_counter() - t0 < 0.5
+    for _ in range(100):
+        if log:
+            break
+        time.sleep(0.01)
+    assert log == ["cancelled"]
+    stats = llm_hedge.stats()
+    assert (stats["calls"], stats["hedged"], stats["secondary_wins"]) == (1, 1, 1)
+    assert stats["hedge_rate"] == 1.0 and stats["win_rate"] == 1.0
+
+
+def test_invalid_secondary_does_not_beat_slow_primary():
+    def call(name, cancel):
+        if name == "gemini":
+            raise RuntimeError("invalid JSON from LLM")
+        time.sleep(0.15)
+        return "a"
+
+    assert llm_hedge.race("openai", "gemini", call) == ("openai", "a", True)
+    assert llm_hedge.stats()["primary_wins"] == 1
+
+
+def test_pool_queue_time_does_not_fire_hedge():
+    release = threading.Event()
+    blockers = [llm_hedge._pool().submit(release.wait) for _ in range(llm_hedge._pool()._max_workers)]
+    out = {}
+    t = threading.Thread(target=lambda: out.update(r=llm_hedge.race("openai", "gemini", lambda name, cancel: name)))
+    t.start()
+    time.sleep(0.2)  # 一次はプール待ち（既定の待ち時間 0.05 秒を超える）
+    release.set()
+    t.join(5)
+    for f in blockers:
+        f.result()
+    assert out["r"] == ("openai", "openai", False)
+    assert llm_hedge.stats()["hedged"] == 0
+
+
+def test_saturated_pool_falls_back_to_direct_call(monkeypatch):
+    monkeypatch.setenv("AUTOEDA_LLM_HEDGE_QUEUE_SEC", "0.05")
+    release = threading.Event()
+    blockers = [llm_hedge._pool().submit(release.wait) for _ in range(llm_hedge._pool()._max_workers)]
+    calls = []
+    try:
+        t0 = time.perf_counter()
+        out = llm_hedge.race("openai", "gemini", lambda name, cancel: calls.append(name) or name)
+        assert time.perf_counter() - t0 < 1.0
+    finally:
+        release.set()
+        for f in blockers:
+            f.result()
+    assert out == ("openai", "openai", False)
+    time.sleep(0.05)
+    assert calls == ["openai"]  # キューから取り下げるので二重には呼ばれない
+    assert llm_hedge.stats()["direct"] == 1
+
+
+def test_loser_stream_is_closed_from_deciding_thread():
+    closed = threading.Event()
+
+    def call(name, cancel):
+        if name == "gemini":
+            return "b"
+        cancel.add_callback(closed.set)
+        if not closed.wait(5.0):  # 最初のチャンク待ちでブロックしている一次
+            return "a"
+        raise llm_hedge.Cancelled(name)
+
+    assert llm_hedge.race("openai", "gemini", call) == ("gemini", "b", True)
+    assert closed.wait(1.0)
+
+
+def test_hedge_delay_tracks_recent_latency_quantile(monkeypatch):
+    monkeypatch.setenv("AUTOEDA_LLM_HEDGE_MIN_SAMPLES", "10")
+    assert llm_hedge.hedge_delay("openai") == 0.05
+    for i in range(1, 101):
+        llm_hedge.record_latency("openai", i / 100)
+    assert llm_hedge.hedge_delay("openai") == pytest.approx(0.95, abs=0.011)
+    monkeypatch.setenv("AUTOEDA_LLM_HEDGE_QUANTILE", "0.5")
+    assert llm_hedge.hedge_delay("openai") == pytest.approx(0.5, abs=0.011)
+
+
+def test_eda_report_takes_hedged_secondary(monkeypatch, tmp_path):
+    creds = tmp_path / "credentials.json"
+    creds.write_text(
+        json.dumps({"llm": {"provider": "openai", "openai": {"api_key": "sk"}, "gemini": {"api_key": "gm"}}}),
+        encoding="utf-8",
+    )
+    monkeypatch.setenv("AUTOEDA_CREDENTIALS_FILE", str(creds))
+    monkeypatch.setenv("AUTOEDA_LLM_HEDGE", "1")
+    monkeypatch.setenv("AUTOEDA_LLM_CACHE", "0")
+    app_config.reset_cache()
+    report = {"summary": {"rows": 1, "cols": 1}, "data_quality_report": {"issues": []}}
+    monkeypatch.setattr(orchestrator.tools, "profile_api", lambda *a, **k: json.loads(json.dumps(report)))
+    monkeypatch.setattr(orchestrator.tools, "pii_scan", lambda *a, **k: None)
+    monkeypatch.setattr(orchestrator.tools, "leakage_scan", lambda *a, **k: None)
+    monkeypatch.setattr(orchestrator, "_retrieve_context", lambda report: [])
+    monkeypatch.setattr(orchestrator, "_rag_seeded", True)
+    closed = threading.Event()
+
+    class SlowStream:
+        def __iter__(self):
+            # 最初のトークン前で読み取りが止まっている状態（close されるまで返らない）
+            if closed.wait(5.0):
+                raise OSError("stream closed")
+            yield SimpleNamespace(type="response.output_text.delta", delta='{"key_features": ["openai"]}')
+
+        def close(self):
+            closed.set()
+
+    monkeypatch.setattr(
+        orchestrator,
+        "OpenAI",
+        lambda *a, **k: SimpleNamespace(responses=SimpleNamespace(create=lambda **kw: SlowStream())),
+    )
+
+    class FastModel:
+        def generate_content(self, prompt, **kwargs):
+            assert kwargs["stream"] is True
+            return iter([SimpleNamespace(text='{"key_features": '), SimpleNamespace(text='["gemini"]}')])
+
+    genai = SimpleNamespace(configure=lambda api_key=None: None, GenerativeModel=lambda name, system_instruction=None: FastModel())
+    monkeypatch.setattr(orchestrator, "genai", genai)
+
+    result, evaluation = orchestrator.generate_eda_report("ds_hedge")
+    assert result["key_features"] == ["gemini"]
+    assert (evaluation["llm_provider"], evaluation["llm_hedged"]) == ("gemini", True)
+    assert closed.wait(1.0)  # 負けた OpenAI ストリームは最初のチャンクを待たずに閉じられる
+    app_config.reset_cache()
@@ -1,7 +1,10 @@
 import json
 import math
+import os
 from pathlib import Path
 
+import pytest
+
 from apps.api.services import metrics
 
 
@@ -63,3 +66,195 @@ def test_bootstrap_from_events_reconstructs_store(tmp_path):
     metrics.bootstrap_from_events(metrics.load_event_log())
     snapshot = metrics.slo_snapshot()
     assert snapshot["events"]["EDAReportGenerated"]["count"] == 2
+
+
+def test_histogram_memory_is_bounded_and_p95_accurate():
+    values = [float(v) for v in range(1, 100_001)]
+    for value in values:
+        metrics.record_event("ChartJobFinished", duration_ms=value)
+
+    stats = metrics._STORE["ChartJobFinished"]
+    assert len(stats.total.duration.counts) < 700
+    p95 = metrics.slo_snapshot()["events"]["ChartJobFinished"]["p95"]
+    assert math.isclose(p95, 95_000, rel_tol=0.01)
+
+
+def test_histograms_merge_like_concatenated_samples():
+    a, b = metrics.LogHistogram(), metrics.LogHistogram()
+    for v in range(1, 500):
+        a.add(float(v))
+    for v in range(500, 1000):
+        b.add(float(v))
+    a.merge(b)
+    assert a.count == 999 and a.min == 1 and a.max == 999
+    assert math.isclose(a.quantile(0.5), 500, rel_tol=0.01)
+
+
+def test_non_finite_values_are_ignored():
+    for raw in ("nan", "inf", "-inf", float("nan")):
+        metrics.record_event("ChartJobFinished", duration_ms=raw, groundedness=raw)
+    metrics.record_event("ChartJobFinished", duration_ms=100)
+
+    h = metrics.LogHistogram()
+    h.add(math.inf)
+    h.add(math.nan)
+    assert h.count == 0
+    snap = metrics.slo_snapshot()["events"]["ChartJobFinished"]
+    assert math.isclose(snap["p95"], 100, rel_tol=0.01)
+
+
+def test_slo_snapshot_sliding_windows(monkeypatch):
+    now = 1_700_000_000.0
+    monkeypatch.setattr(metrics.time, "time", lambda: now)
+    metrics.record_event("EDAReportGenerated", duration_ms=9000, groundedness=0.5, timestamp=now - 30 * 60)
+    metrics.record_event("EDAReportGenerated", duration_ms=100, groundedness=0.95, timestamp=now)
+
+    recent = metrics.slo_snapshot("1m")["events"]["EDAReportGenerated"]
+    hour = metrics.slo_snapshot("1h")["events"]["EDAReportGenerated"]
+    lifetime = metrics.slo_snapshot()["events"]["EDAReportGenerated"]
+    assert recent == {"count": 1, "p95": 100, "groundedness_min": 0.95}
+    assert hour["count"] == 2 and hour["groundedness_min"] == 0.5
+    assert lifetime["count"] == 2
+
+    monkeypatch.setattr(metrics.time, "time", lambda: now + 2 * 3600)
+    assert metrics.slo_snapshot("1h")["events"]["EDAReportGenerated"]["count"] == 0
+    assert metrics.slo_snapshot()["events"]["EDAReportGenerated"]["count"] == 2
+
+
+def test_slo_snapshot_rejects_unknown_window():
+    with pytest.raises(ValueError):
+        metrics.slo_snapshot("2d")
+
+
+def _append(path: Path, *records: dict) -> None:
+    with path.open("a", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec) + "\n")
+
+
+def test_event_index_reads_only_appended_lines(tmp_path, monkeypatch):
+    log = tmp_path / "events.jsonl"
+    metrics.set_event_log_path(log)
+    _append(log, *[{"event_name": "ChartJobFinished", "status": "succeeded"} for _ in range(50)])
+    assert metrics.slo_snapshot()["breakdown"]["ChartJobFinished"]["total"] == 50
+
+    calls = {"n": 0}
+    real_loads = json.loads
+
+    def _counting(raw, *a, **k):
+        calls["n"] += 1
+        return real_loads(raw, *a, **k)
+
+    monkeypatch.setattr(metrics.json, "loads", _counting)
+    _append(log, {"event_name": "ChartJobFinished", "status": "failed", "error_code": "timeout"})
+    breakdown = metrics.slo_snapshot()["breakdown"]["ChartJobFinished"]
+    assert calls["n"] == 1
+    assert breakdown["total"] == 51 and breakdown["failure_by_code"] == {"timeout": 1}
+
+
+def test_event_index_ignores_partial_line_until_complete(tmp_path):
+    log = tmp_path / "events.jsonl"
+    metrics.set_event_log_path(log)
+    _append(log, {"event_name": "ChartBatchFinished", "status": "ok"})
+    with log.open("a", encoding="utf-8") as f:
+        f.write('{"event_name": "ChartBatchFinished", "sta')
+    assert metrics.slo_snapshot()["breakdown"]["ChartBatchFinished"]["total"] == 1
+    with log.open("a", encoding="utf-8") as f:
+        f.write('tus": "ok"}\n')
+    assert metrics.slo_snapshot()["breakdown"]["ChartBatchFinished"]["total"] == 2
+
+
+def test_event_index_restarts_after_rewrite(tmp_path):
+    log = tmp_path / "events.jsonl"
+    metrics.set_event_log_path(log)
+    _append(log, *[{"event_name": "ChartJobFinished", "status": "ok"} for _ in range(5)])
+    assert metrics.slo_snapshot()["breakdown"]["ChartJobFinished"]["total"] == 5
+    log.write_text(json.dumps({"event_name": "ChartJobFinished", "status": "failed"}) + "\n", encoding="utf-8")
+    breakdown = metrics.slo_snapshot()["breakdown"]["ChartJobFinished"]
+    assert breakdown["total"] == 1 and breakdown["failures"] == 1
+
+
+def test_recent_batch_snapshots_ring_per_dataset(tmp_path, monkeypatch):
+    monkeypatch.setenv("AUTOEDA_METRICS_SNAPSHOT_RING", "5")
+    log = tmp_path / "events.jsonl"
+    metrics.set_event_log_path(log)
+    for i in range(20):
+        _append(log, {"event_name": "ChartBatchSnapshot", "timestamp": f"2024-01-01T00:00:{i:02d}Z", "dataset_id": "ds_a" if i % 2 else "ds_b", "served": i, "total": 20})
+    assert [s["served"] for s in metrics.recent_batch_snapshots(limit=3)] == [17, 18, 19]
+    assert [s["served"] for s in metrics.recent_batch_snapshots(limit=12, dataset_id="ds_a")] == [11, 13, 15, 17, 19]
+    assert metrics.recent_batch_snapshots(limit=3, dataset_id="ds_none") == []
+
+
+def test_persist_event_is_buffered_and_flushed_on_read(tmp_path, monkeypatch):
+    monkeypatch.setenv("AUTOEDA_METRICS_FLUSH_MS", "60000")
+    log = tmp_path / "events.jsonl"
+    metrics.set_event_log_path(log)
+    for i in range(3):
+        metrics.persist_event({"event_name": "ChartJobFinished", "duration_ms": i, "status": "ok"})
+    assert not log.exists()  # リクエスト経路では書かない
+    assert [r["duration_ms"] for r in metrics.load_event_log()] == [0, 1, 2]
+
+
+def test_rotation_keeps_reads_and_breakdown_continuous(tmp_path, monkeypatch):
+    monkeypatch.setenv("AUTOEDA_METRICS_ROTATE_BYTES", "200")
+    monkeypatch.setenv("AUTOEDA_METRICS_BATCH", "1")
+    log = tmp_path / "events.jsonl"
+    metrics.set_event_log_path(log)
+    for i in range(10):
+        metrics.persist_event({"event_name": "ChartJobFinished", "seq": i, "status": "succeeded"})
+        metrics.flush_events()
+        if i == 4:
+            assert metrics.slo_snapshot()["breakdown"]["ChartJobFinished"]["total"] == 5
+    assert len(metrics.rotated_segments(log)) >= 2
+    assert [r["seq"] for r in metrics.load_event_log()] == list(range(10))
+    assert metrics.slo_snapshot()["breakdown"]["ChartJobFinished"]["total"] == 10
+
+
+def test_compact_segments_rolls_into_hourly_aggregates(tmp_path):
+    log = tmp_path / "events.jsonl"
+    seg = tmp_path / "events.jsonl.20240101T120000-0000"
+    _append(seg, *[
+        {"event_name": "ChartJobFinished", "timestamp": f"2024-01-01T10:{m:02d}:00Z", "duration_ms": 100 + m, "status": "succeeded"}
+        for m in range(30)
+    ])
+    _append(seg, {"event_name": "ChartJobFinished", "timestamp": "2024-01-01T11:05:00Z", "duration_ms": 900, "status": "failed", "error_code": "timeout"})
+    os.utime(seg, (0, 0))
+
+    result = metrics.compact_segments(log, older_than_sec=3600)
+    assert result["events"] == 31 and not seg.exists()
+    rows = {r["hour"]: r for r in metrics.load_event_log(metrics.hourly_aggregate_path(log))}
+    assert rows["2024-01-01T10:00:00Z"]["count"] == 30
+    assert math.isclose(rows["2024-01-01T10:00:00Z"]["duration_ms"]["p95"], 127.55, rel_tol=0.01)
+    assert rows["2024-01-01T11:00:00Z"]["error_codes"] == {"timeout": 1}
+
+
+def test_compacted_history_still_feeds_slo_checks_and_breakdown(tmp_path, monkeypatch):
+    from apps.api.scripts import check_slo
+
+    log = tmp_path / "events.jsonl"
+    seg = tmp_path / "events.jsonl.20240101T000000-0000"
+    _append(seg, {"event_name": "EDAReportGenerated", "timestamp": "2024-01-01T00:00:00Z", "duration_ms": 20_000, "groundedness": 0.95})
+    _append(seg, {"event_name": "ChartJobFinished", "timestamp": "2024-01-01T00:01:00Z", "status": "failed", "error_code": "timeout"})
+    _append(log, {"event_name": "EDAReportGenerated", "duration_ms": 100, "groundedness": 0.95})
+    _append(log, {"event_name": "ChartJobFinished", "status": "succeeded"})
+    os.utime(seg, (0, 0))
+    metrics.compact_segments(log, older_than_sec=3600)
+    assert not seg.exists()
+
+    monkeypatch.delenv(check_slo.OUTPUT_ENV, raising=False)
+    assert check_slo.main([str(log)]) == 1
+    assert metrics.slo_snapshot()["events"]["EDAReportGenerated"]["count"] == 2
+
+    metrics.set_event_log_path(log)
+    breakdown = metrics.slo_snapshot()["breakdown"]["ChartJobFinished"]
+    assert (breakdown["total"], breakdown["failures"], breakdown["failure_by_code"]) == (2, 1, {"timeout": 1})
+
+
+def test_check_slo_reads_rotated_segments(tmp_path, monkeypatch):
+    from apps.api.scripts import check_slo
+
+    log = tmp_path / "events.jsonl"
+    _append(tmp_path / "events.jsonl.20240101T000000-0000", {"event_name": "EDAReportGenerated", "duration_ms": 20_000, "groundedness": 0.95})
+    _append(log, {"event_name": "EDAReportGenerated", "duration_ms": 100, "groundedness": 0.95})
+    monkeypatch.delenv(check_slo.OUTPUT_ENV, raising=False)
+    assert check_slo.main([str(log)]) == 1
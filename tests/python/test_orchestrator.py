@@ -8,8 +8,9 @@ from apps.api.services import orchestrator
 
 
 @pytest.fixture(autouse=True)
-def reset_config(monkeypatch):
+def reset_config(monkeypatch, tmp_path):
     monkeypatch.delenv("AUTOEDA_LLM_MODEL", raising=False)
+    monkeypatch.setenv("AUTOEDA_LLM_CACHE_DIR", str(tmp_path / "llm_cache"))
     monkeypatch.delenv("AUTOEDA_CREDENTIALS_FILE", raising=False)
     app_config.reset_cache()
     monkeypatch.setattr(orchestrator.rag, "load_default_corpus", lambda: None)
@@ -108,6 +109,7 @@ def test_generate_eda_report_with_llm(monkeypatch, patch_tools, credentials_file
 
     assert evaluation["llm_error"] is None
     assert evaluation["llm_latency_ms"] is not None
+    assert evaluation["prompt_tokens"] == evaluation["prompt_budget"]["prompt_tokens"] > 0
     assert report["key_features"] == ["LLM 派生の洞察"]
     assert report["next_actions"][0]["title"] == "LLM Action"
     assert any(ref["locator"] == "llm:analysis" for ref in report["references"])
@@ -188,3 +190,63 @@ def test_generate_eda_report_marks_fallback(monkeypatch, patch_tools):
 
     assert evaluation["fallback_applied"] is True
     assert evaluation["groundedness"] >= 0.9
+
+
+def _slow(value, delay=0.2):
+    def _fn(*args, **kwargs):
+        import time
+
+        time.sleep(delay)
+        return value() if callable(value) else value
+
+    return _fn
+
+
+def test_concurrent_fanout_overlaps_tool_stages(monkeypatch):
+    from apps.api.services import profiling
+    import time
+
+    monkeypatch.setattr(orchestrator.tools, "profile_api", _slow(fake_profile_report))
+    monkeypatch.setattr(orchestrator.tools, "pii_scan", _slow({"detected_fields": ["email"], "mask_policy": "MASK"}))
+    monkeypatch.setattr(orchestrator.tools, "leakage_scan", _slow({"flagged_columns": ["target_next_month"]}))
+    monkeypatch.setattr(orchestrator, "_retrieve_context", _slow([]))
+    monkeypatch.setattr(orchestrator, "_invoke_llm_agent", lambda *args, **kwargs: None)
+
+    monkeypatch.setenv("AUTOEDA_EDA_CONCURRENT", "0")
+    t0 = time.perf_counter()
+    seq_report, _ = orchestrator.generate_eda_report("ds_fanout")
+    sequential = time.perf_counter() - t0
+
+    monkeypatch.setenv("AUTOEDA_EDA_CONCURRENT", "1")
+    t0 = time.perf_counter()
+    with profiling.record("eda") as root:
+        par_report, _ = orchestrator.generate_eda_report("ds_fanout")
+    concurrent = time.perf_counter() - t0
+
+    # profile(0.2) → RAG(0.2) が律速。pii/leakage は profile と重なる
+    assert sequential >= 0.8
+    assert concurrent < 0.6
+    assert par_report == seq_report
+    assert "profile" in [c.name for c in root.children]
+
+
+def test_concurrent_fanout_parses_dataset_once(tmp_path, monkeypatch):
+    pd = pytest.importorskip("pandas")
+    from apps.api.services import storage
+
+    monkeypatch.setattr(storage, "dataset_path", lambda dsid: tmp_path / f"{dsid}.csv")
+    (tmp_path / "ds_shared.csv").write_text("email,amount\na@example.com,1\nb@example.com,2\n", encoding="utf-8")
+    calls = {"n": 0}
+    real = pd.read_csv
+
+    def _counting(*args, **kwargs):
+        calls["n"] += 1
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(pd, "read_csv", _counting)
+    monkeypatch.setattr(orchestrator, "_retrieve_context", lambda report: [])
+    monkeypatch.setattr(orchestrator, "_invoke_llm_agent", lambda *args, **kwargs: None)
+    monkeypatch.setenv("AUTOEDA_EDA_CONCURRENT", "1")
+    report, _ = orchestrator.generate_eda_report("ds_shared")
+    assert calls["n"] == 1
+    assert report["summary"]["rows"] == 2
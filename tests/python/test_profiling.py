@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from apps.api.main import app
+from apps.api.services import profiling, prometheus, storage, tools
+
+
+def _busy_loop_marker(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1_000))
+
+
+def test_spans_feed_histogram(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "dataset_path", lambda dsid: tmp_path / f"{dsid}.csv")
+    (tmp_path / "ds_prof.csv").write_text("a,b\n1,x\n2,y\n", encoding="utf-8")
+    hist = prometheus.REGISTRY.get("autoeda_span_seconds")
+    # pandas 有無で read_csv か csv_fallback のどちらかを通る
+    stages = (("profile.read_csv",), ("profile.csv_fallback",))
+    before = sum(hist.snapshot(k)["count"] for k in stages)
+    tools.profile_api("ds_prof")
+    tools.pii_scan("ds_prof")
+    assert sum(hist.snapshot(k)["count"] for k in stages) == before + 1
+    assert hist.snapshot(("pii_scan",))["count"] >= 1
+
+
+def test_span_exposes_elapsed_even_when_disabled(monkeypatch):
+    monkeypatch.setenv("AUTOEDA_PROFILING", "0")
+    hist = prometheus.REGISTRY.get("autoeda_span_seconds")
+    with profiling.span("t.disabled") as sp:
+        time.sleep(0.01)
+    assert sp.elapsed >= 0.01
+    assert hist.snapshot(("t.disabled",))["count"] == 0
+
+
+def test_sampler_collapses_live_thread_stacks():
+    stop = threading.Event()
+    t = threading.Thread(target=_busy_loop_marker, args=(stop,), name="busy")
+    t.start()
+    try:
+        res = profiling.sample_stacks(0.2, 5)
+    finally:
+        stop.set()
+        t.join()
+    assert res["samples"] >= 2
+    line = next(l for l in res["collapsed"].splitlines() if "_busy_loop_marker" in l)
+    stack, count = line.rsplit(" ", 1)
+    assert stack.startswith("thread:busy;") and int(count) >= 1
+
+
+def test_sampler_rejects_concurrent_runs():
+    assert profiling._SAMPLER_LOCK.acquire()
+    try:
+        with pytest.raises(profiling.ProfilerBusy):
+            profiling.sample_stacks(0.01)
+    finally:
+        profiling._SAMPLER_LOCK.release()
+
+
+def test_admin_profile_endpoint_is_guarded(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.delenv("AUTOEDA_ADMIN_PROFILER", raising=False)
+    assert client.get("/api/admin/profile", params={"seconds": 0.05}).status_code == 404
+    monkeypatch.setenv("AUTOEDA_ADMIN_PROFILER", "1")
+    monkeypatch.delenv("AUTOEDA_ADMIN_TOKEN", raising=False)
+    assert client.get("/api/admin/profile", params={"seconds": 0.05}).status_code == 404
+    monkeypatch.setenv("AUTOEDA_ADMIN_TOKEN", "s3cret")
+    assert client.get("/api/admin/profile", params={"seconds": 0.05}).status_code == 403
+    res = client.get("/api/admin/profile", params={"seconds": 0.05, "idle": True}, headers={"X-Admin-Token": "s3cret"})
+    assert res.status_code == 200
+    assert int(res.headers["X-Profile-Samples"]) >= 1
+    assert "thread:" in res.text
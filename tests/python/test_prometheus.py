@@ -0,0 +1,88 @@
+import re
+import threading
+
+from fastapi.testclient import TestClient
+
+from apps.api.main import app
+from apps.api.services import charts as chartsvc
+from apps.api.services import prometheus
+
+
+def _sample(text: str, name: str, **labels: str) -> float:
+    for line in text.splitlines():
+        if not line.startswith(name + "{") and not line.startswith(name + " "):
+            continue
+        if all(f'{k}="{v}"' in line for k, v in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"sample {name} {labels} not found")
+
+
+def test_counters_merge_per_thread_shards():
+    c = prometheus.Counter("t_total", "test", ("k",))
+    h = prometheus.Histogram("t_seconds", "test", buckets=(0.1, 1.0))
+
+    def _work():
+        for _ in range(1_000):
+            c.inc(("a",))
+            h.observe(0.05)
+
+    threads = [threading.Thread(target=_work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    c.inc(("a",))
+    assert c.value(("a",)) == 4_001
+    snap = h.snapshot()
+    assert snap["count"] == 4_000 and snap["buckets"] == [4_000, 0]
+    # 終了スレッドのシャードは畳み込まれても値は保たれる
+    assert c.value(("a",)) == 4_001 and len(c._shards) == 1
+
+
+def test_metrics_endpoint_exposes_route_templates():
+    client = TestClient(app)
+    client.get("/health")
+    client.get("/api/charts/jobs/does-not-exist")
+    client.get("/no/such/route")
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = res.text
+    assert _sample(text, "autoeda_http_requests_total", method="GET", route="/health", status="200") >= 1
+    # パスパラメータは生値ではなくテンプレートで集約される
+    assert _sample(text, "autoeda_http_requests_total", route="/api/charts/jobs/{job_id}", status="404") >= 1
+    assert "does-not-exist" not in text
+    assert _sample(text, "autoeda_http_requests_total", route="<unmatched>", status="404") >= 1
+    assert _sample(text, "autoeda_http_request_duration_seconds_bucket", route="/health", le="+Inf") >= 1
+    assert _sample(text, "autoeda_http_requests_in_flight", method="GET") == 1  # /metrics 自身
+    assert "# TYPE autoeda_http_request_duration_seconds histogram" in text
+    for name in ("autoeda_charts_queue_depth", "autoeda_charts_worker_utilization", "autoeda_charts_workers_busy"):
+        assert re.search(rf"^# TYPE {name} gauge$", text, re.M)
+
+
+def test_chart_generation_records_sandbox_time(monkeypatch):
+    monkeypatch.setattr(chartsvc, "_ASYNC", False)
+    before = chartsvc._SANDBOX_SECONDS.snapshot(("inline",))["count"]
+    chartsvc.generate({"spec_hint": "bar", "dataset_id": None})
+    assert chartsvc._SANDBOX_SECONDS.snapshot(("inline",))["count"] == before + 1
+    text = prometheus.render()
+    assert _sample(text, "autoeda_charts_sandbox_seconds_count", mode="inline") >= 1
+
+
+def test_pool_template_runs_are_labelled_pool(monkeypatch):
+    from apps.api.services import sandbox
+
+    monkeypatch.setattr(chartsvc, "_ASYNC", False)
+    monkeypatch.setenv("AUTOEDA_SANDBOX_POOL", "1")
+    monkeypatch.setenv("AUTOEDA_SANDBOX_POOL_WORKERS", "1")
+    before = {m: chartsvc._SANDBOX_SECONDS.snapshot((m,))["count"] for m in ("pool", "inline")}
+    try:
+        chartsvc.generate({"spec_hint": "bar", "dataset_id": None})
+    finally:
+        sandbox.shutdown_pool(kill=True)
+    assert chartsvc._SANDBOX_SECONDS.snapshot(("pool",))["count"] == before["pool"] + 1
+    assert chartsvc._SANDBOX_SECONDS.snapshot(("inline",))["count"] == before["inline"]
+
+
+def test_label_values_are_escaped():
+    assert prometheus._labels(("a",), ('x"y\\z\n',)) == '{a="x\\"y\\\\z\\n"}'
@@ -0,0 +1,88 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from apps.api.services import orchestrator, prompt_budget
+
+
+@pytest.fixture
+def heuristic(monkeypatch):
+    """tiktoken の BPE が取得できない環境（オフライン）と同じ条件に固定する。"""
+    monkeypatch.setattr(prompt_budget, "_ENCODERS", {"": None, "m": None})
+
+
+def _issues(n):
+    sev = ["low", "medium", "high", "critical"]
+    return [
+        {"severity": sev[i % 4], "column": f"col_{i}", "description": "欠損が多い" * 3, "statistic": {"missing_ratio": (i % 10) / 10}}
+        for i in range(n)
+    ]
+
+
+def test_rank_issues_by_severity_then_statistic():
+    ranked = prompt_budget.rank_issues(
+        [
+            {"severity": "low", "column": "a", "statistic": {"missing_ratio": 0.9}},
+            {"severity": "high", "column": "b", "statistic": {"missing_ratio": 0.2}},
+            {"severity": "high", "column": "c", "statistic": {"missing_ratio": 0.6}},
+            {"severity": "critical", "column": "d"},
+        ]
+    )
+    assert [i["column"] for i in ranked] == ["d", "c", "b", "a"]
+
+
+def test_rank_docs_prefers_overlap_and_keeps_retriever_order():
+    docs = [{"text": "generic doc"}, {"text": "price column missing"}, {"text": "another generic"}]
+    assert [d["text"] for d in prompt_budget.rank_docs(docs, "price missing")] == [
+        "price column missing",
+        "generic doc",
+        "another generic",
+    ]
+
+
+def test_heuristic_counts_cjk_per_char(heuristic):
+    assert prompt_budget.count_tokens("abcdefgh", "m") == 2
+    assert prompt_budget.count_tokens("欠損率", "m") == 3
+    assert prompt_budget.tokenizer_name("m") == "heuristic"
+
+
+def test_build_respects_budget_and_keeps_most_severe(heuristic):
+    docs = [{"text": f"doc {i} " + "要件" * 300} for i in range(5)]
+    user, stats = prompt_budget.build_user_prompt(
+        ["dataset_id: ds"], _issues(200), ["pii: null"], docs, "\nfooter", system="sys", model="m", budget=1200
+    )
+    assert stats["prompt_tokens"] <= 1200
+    assert 0 < stats["issues_included"] < stats["issues_total"] == 200
+    assert stats["docs_included"] >= 1
+    assert '"severity": "critical"' in user and '"severity": "low"' not in user
+    assert user.endswith("\nfooter")
+
+
+def test_encoder_is_resolved_once_per_model(monkeypatch):
+    calls = []
+
+    class Enc:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+
+    def encoding_for_model(name):
+        calls.append(name)
+        raise KeyError(name)
+
+    fake = SimpleNamespace(encoding_for_model=encoding_for_model, get_encoding=lambda name: calls.append(name) or Enc())
+    monkeypatch.setitem(sys.modules, "tiktoken", fake)
+    monkeypatch.setattr(prompt_budget, "_ENCODERS", {})
+    for _ in range(3):
+        assert prompt_budget.count_tokens("a b c", "gemini-x") == 3
+    assert calls == ["gemini-x", "o200k_base"]
+    assert prompt_budget.tokenizer_name("gemini-x") == "tiktoken"
+
+
+def test_eda_prompt_reports_tokens(heuristic, monkeypatch):
+    monkeypatch.setenv("AUTOEDA_PROMPT_TOKEN_BUDGET", "800")
+    report = {"summary": {"rows": 10, "cols": 200}, "data_quality_report": {"issues": _issues(300)}}
+    prompt = orchestrator._build_system_prompt("ds", report, None, None, [], model="m")
+    stats = orchestrator._PROMPT_STATS.get()
+    assert stats["prompt_tokens"] <= 800 and stats["issues_included"] < 300
+    assert prompt_budget.count_tokens(prompt["system"], "m") + prompt_budget.count_tokens(prompt["user"], "m") == stats["prompt_tokens"]
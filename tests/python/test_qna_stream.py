@@ -0,0 +1,117 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from apps.api import config as app_config
+from apps.api.main import app
+from apps.api.services import orchestrator
+from apps.api.services.json_stream import AnswerStreamParser
+
+_PAYLOAD = {
+    "answers": [
+        {"text": "欠損は {price} 列に集中 \"注意\"", "references": [{"kind": "table", "locator": "tbl:price"}], "coverage": 0.9},
+        {"text": "外れ値は [少数]", "references": [], "coverage": 0.7},
+    ]
+}
+
+
+def test_parser_emits_each_answer_when_it_closes():
+    text = "```json\n" + json.dumps(_PAYLOAD, ensure_ascii=False) + "\n```"
+    second_start = text.index('{"text": "外れ値')
+    parser = AnswerStreamParser()
+    seen = []
+    for i, ch in enumerate(text):
+        for ans in parser.feed(ch):
+            seen.append((i, ans))
+    assert [a for _, a in seen] == _PAYLOAD["answers"]
+    # 1 件目は 2 件目の開始より前に確定している
+    assert seen[0][0] < second_start
+
+
+def test_parser_accepts_top_level_array_and_ignores_nested_refs():
+    parser = AnswerStreamParser()
+    out = parser.feed('[{"text": "a", "references": [{"kind": "doc", "locator": "x"}]}]')
+    assert out == [{"text": "a", "references": [{"kind": "doc", "locator": "x"}]}]
+    single = AnswerStreamParser()
+    assert single.feed('{"text": "b", "references": [{"kind": "doc", "locator": "y"}]}') == []
+
+
+@pytest.fixture
+def qna_env(monkeypatch, tmp_path):
+    creds = tmp_path / "credentials.json"
+    creds.write_text(json.dumps({"llm": {"provider": "openai", "openai": {"api_key": "dummy"}}}), encoding="utf-8")
+    monkeypatch.setenv("AUTOEDA_CREDENTIALS_FILE", str(creds))
+    monkeypatch.setenv("AUTOEDA_LLM_CACHE_DIR", str(tmp_path / "llm_cache"))
+    app_config.reset_cache()
+    report = {"summary": {"rows": 1, "cols": 1, "missing_rate": 0.0}, "data_quality_report": {"issues": []}}
+    monkeypatch.setattr(orchestrator.tools, "profile_api", lambda *a, **k: dict(report))
+    monkeypatch.setattr(orchestrator.tools, "pii_scan", lambda *a, **k: None)
+    monkeypatch.setattr(orchestrator.tools, "leakage_scan", lambda *a, **k: None)
+    monkeypatch.setattr(orchestrator.tools, "stats_qna", lambda *a, **k: [{"text": "tool", "references": [], "coverage": 0.5}])
+    monkeypatch.setattr(orchestrator, "_retrieve_context", lambda report: [])
+    yield
+    app_config.reset_cache()
+
+
+def _install_stream(monkeypatch, chunks, fail_after=None):
+    def create(**kwargs):
+        assert kwargs["stream"] is True
+        for i, chunk in enumerate(chunks):
+            if fail_after is not None and i == fail_after:
+                raise RuntimeError("connection reset")
+            yield SimpleNamespace(type="response.output_text.delta", delta=chunk)
+        yield SimpleNamespace(type="response.completed")
+
+    monkeypatch.setattr(orchestrator, "OpenAI", lambda *a, **k: SimpleNamespace(responses=SimpleNamespace(create=create)))
+
+
+def _chunks(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_stream_qna_yields_answers_before_stream_ends(monkeypatch, qna_env):
+    chunks = _chunks(json.dumps(_PAYLOAD, ensure_ascii=False))
+    _install_stream(monkeypatch, chunks)
+    events = list(orchestrator.stream_qna("ds_stream", "欠損は？"))
+    types = [e["type"] for e in events]
+    assert types.count("delta") == len(chunks)
+    assert [e["answer"]["text"] for e in events if e["type"] == "answer"] == [a["text"] for a in _PAYLOAD["answers"]]
+    last_delta = max(i for i, t in enumerate(types) if t == "delta")
+    assert types.index("answer") < last_delta
+    done = events[-1]
+    assert (done["type"], done["fallback"], done["llm_cache"], done["error"]) == ("done", False, "miss", None)
+    assert done["prompt_tokens"] > 0
+    # 同じ質問はキャッシュから再生される
+    again = list(orchestrator.stream_qna("ds_stream", "欠損は？"))
+    assert again[-1]["llm_cache"] == "hit"
+    assert len([e for e in again if e["type"] == "answer"]) == 2
+
+
+def test_stream_qna_falls_back_only_when_stream_fails(monkeypatch, qna_env):
+    _install_stream(monkeypatch, ['{"answers": [{"te', 'xt": "llm"}]}'], fail_after=1)
+    events = list(orchestrator.stream_qna("ds_stream", "q"))
+    assert [e["answer"]["text"] for e in events if e["type"] == "answer"] == ["tool"]
+    assert events[-1]["fallback"] is True and "connection reset" in events[-1]["error"]
+
+    # 回答を送出した後の失敗ではフォールバック回答を混ぜない
+    text = json.dumps(_PAYLOAD, ensure_ascii=False)
+    cut = text.index('{"text": "外れ値')
+    _install_stream(monkeypatch, [text[:cut], text[cut:]], fail_after=1)
+    events = list(orchestrator.stream_qna("ds_stream2", "q"))
+    assert [e["answer"]["text"] for e in events if e["type"] == "answer"] == [_PAYLOAD["answers"][0]["text"]]
+    assert events[-1]["fallback"] is False and events[-1]["error"]
+
+
+def test_api_qna_stream_returns_ndjson(monkeypatch, qna_env):
+    _install_stream(monkeypatch, _chunks(json.dumps(_PAYLOAD, ensure_ascii=False)))
+    client = TestClient(app)
+    with client.stream("POST", "/api/qna/stream", json={"dataset_id": "ds_api", "question": "q"}) as res:
+        assert res.status_code == 200
+        assert res.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in res.iter_lines() if line]
+    answers = [e["answer"] for e in lines if e["type"] == "answer"]
+    assert [a["text"] for a in answers] == [a["text"] for a in _PAYLOAD["answers"]]
+    assert answers[0]["references"][0]["locator"] == "tbl:price"
+    assert lines[-1]["type"] == "done"
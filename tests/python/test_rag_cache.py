@@ -0,0 +1,68 @@
+from apps.api.services import rag
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+        self.queries = []
+        self.counts = 0
+
+    def count(self):
+        self.counts += 1
+        return len(self.docs)
+
+    def upsert(self, ids, documents, metadatas, embeddings=None):
+        self.docs.update({i: (d, m) for i, d, m in zip(ids, documents, metadatas)})
+
+    def query(self, query_texts, n_results):
+        self.queries.append(list(query_texts))
+        hits = [[i for i, (d, _) in self.docs.items() if any(w in d for w in q.split())][:n_results] for q in query_texts]
+        return {
+            "ids": hits,
+            "documents": [[self.docs[i][0] for i in row] for row in hits],
+            "metadatas": [[self.docs[i][1] for i in row] for row in hits],
+        }
+
+
+def _fake(monkeypatch):
+    fake = FakeCollection()
+    monkeypatch.setattr(rag, "_vector_store", lambda: fake)
+    monkeypatch.setattr(rag, "_store_key", lambda collection: "fake")
+    monkeypatch.setattr(rag, "_embedding_fn", None)
+    rag.clear_cache()
+    rag.ingest([
+        {"id": "a", "text": "欠損 の 要件", "metadata": {"source": "requirements.md"}},
+        {"id": "b", "text": "相関 の 設計", "metadata": {"source": "design.md"}},
+    ])
+    return fake
+
+
+def test_repeated_queries_are_served_from_cache(monkeypatch):
+    fake = _fake(monkeypatch)
+    first = rag.retrieve("欠損")
+    first[0]["metadata"]["source"] = "mutated"  # 返り値はコピー
+    assert rag.retrieve("欠損")[0]["metadata"]["source"] == "requirements.md"
+    assert len(fake.queries) == 1 and fake.counts == 1
+    assert rag.cache_stats()["hits"] == 1
+
+    rag.ingest([{"id": "c", "text": "欠損 の 補完", "metadata": {}}])  # 書き込みで版が進む
+    assert [d["id"] for d in rag.retrieve("欠損")] == ["a", "c"]
+    assert len(fake.queries) == 2 and fake.counts == 2
+    rag.clear_cache()
+
+
+def test_retrieve_many_batches_misses_into_one_query(monkeypatch):
+    fake = _fake(monkeypatch)
+    rag.retrieve("相関", top_k=2)
+    results = rag.retrieve_many(["欠損", "相関", "欠損", "存在しない"], top_k=2)
+    assert [[d["id"] for d in r] for r in results] == [["a"], ["b"], ["a"], []]
+    assert fake.queries == [["相関"], ["欠損", "存在しない"]]
+    assert fake.counts == 1
+
+
+def test_ttl_zero_disables_cache(monkeypatch):
+    monkeypatch.setenv("AUTOEDA_RAG_CACHE_TTL_SEC", "0")
+    fake = _fake(monkeypatch)
+    rag.retrieve("欠損")
+    rag.retrieve("欠損")
+    assert len(fake.queries) == 2 and fake.counts == 1
@@ -0,0 +1,52 @@
+from apps.api.services import chunking, rag
+
+DOC = """# 設計
+
+概要。
+
+## 3.1 プロファイル
+
+```python
+# コード中の見出しもどきは区切らない
+```
+
+## 3.2 チャート
+
+整合性のしきい値は 0.95。
+"""
+
+
+def test_chunks_follow_headings_with_stable_ids():
+    chunks = chunking.chunk_markdown(DOC, source="design.md")
+    assert [c["metadata"]["section"] for c in chunks] == ["設計", "設計 > 3.1 プロファイル", "設計 > 3.2 チャート"]
+    assert "見出しもどき" in chunks[1]["text"]
+    assert chunks[2]["text"].startswith("## 3.2 チャート")
+    assert all(c["id"].startswith("design.md#") for c in chunks)
+
+    again = chunking.chunk_markdown(DOC.replace("概要。", "概要（改訂）。"), source="design.md")
+    assert chunks[0]["id"] != again[0]["id"]  # 変わった節だけ ID が変わる
+    assert [c["id"] for c in chunks[1:]] == [c["id"] for c in again[1:]]
+
+
+def test_long_sections_use_overlapping_windows():
+    body = "## 長い節\n" + "".join(f"文{i:03d}の説明です。" for i in range(60))
+    chunks = chunking.chunk_markdown(body, source="x.md", size=120, overlap=30)
+    assert len(chunks) > 5
+    assert all(c["text"].startswith("## 長い節") for c in chunks)
+    first, second = chunks[0]["text"], chunks[1]["text"].split("\n", 1)[1]
+    assert first.endswith("。") and second[:10] in first  # 重なりあり、文の途中で切らない
+
+
+def test_default_corpus_is_ingested_as_sections(monkeypatch, tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "design.md").write_text(DOC, encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(rag, "chromadb", None)
+    monkeypatch.setattr(rag, "_in_memory_store", [{"id": "doc:design.md", "text": DOC, "metadata": {"source": "design.md"}}])
+
+    rag.load_default_corpus()
+    rag.load_default_corpus()  # 再投入しても重複しない
+    assert len(rag._in_memory_store) == 3
+    top = rag.retrieve("整合性 しきい値", top_k=1)[0]
+    assert top["metadata"] == {"source": "design.md", "section": "設計 > 3.2 チャート", "chunk": 2}
+    assert "概要" not in top["text"]
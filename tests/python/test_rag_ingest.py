@@ -0,0 +1,70 @@
+import shutil
+
+import pytest
+
+from apps.api.services import embedding_cache, local_embeddings, rag
+
+pytest.importorskip("numpy")
+
+DOC = "# 設計\n\n## 欠損\n\n欠損率の閾値は 0.3。\n\n## 相関\n\n相関係数 0.9 以上はリーク候補。\n"
+
+
+@pytest.fixture
+def local_backend(monkeypatch, tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "design.md").write_text(DOC, encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("AUTOEDA_RAG_BACKEND", "local")
+    monkeypatch.setenv("AUTOEDA_RAG_LOCAL_DIR", str(tmp_path / "local"))
+    monkeypatch.setenv("AUTOEDA_RAG_MANIFEST", str(tmp_path / "manifest.json"))
+    monkeypatch.setenv("AUTOEDA_EMBEDDING_CACHE_DIR", str(tmp_path / "embeddings"))
+    monkeypatch.setenv("AUTOEDA_EMBEDDING_BATCH", "2")
+    embedded = []
+    real = local_embeddings.embed
+
+    def counting(texts):
+        embedded.append(len(texts))
+        return real(texts)
+
+    monkeypatch.setattr(local_embeddings, "embed", counting)
+
+    def restart():  # プロセス再起動相当: メモリ上の状態だけ捨てる
+        monkeypatch.setattr(rag, "_local_store", None)
+        embedding_cache.clear()
+        embedded.clear()
+
+    restart()
+    yield tmp_path, embedded, restart
+    embedding_cache.clear()
+
+
+def test_unchanged_corpus_is_not_reembedded(local_backend):
+    tmp_path, embedded, restart = local_backend
+    first = rag.load_default_corpus()["design.md"]
+    assert first == {"added": 3, "unchanged": 0, "removed": 0}
+    assert embedded == [2, 1]  # バッチ幅 2 でまとめて呼ぶ
+
+    restart()
+    assert rag.load_default_corpus()["design.md"] == {"added": 0, "unchanged": 3, "removed": 0}
+    assert embedded == []
+    assert rag.retrieve("相関係数 リーク", top_k=1)[0]["metadata"]["section"] == "設計 > 相関"
+
+
+def test_only_changed_chunks_are_reingested(local_backend):
+    tmp_path, embedded, restart = local_backend
+    rag.load_default_corpus()
+    (tmp_path / "docs" / "design.md").write_text(DOC.replace("0.3", "0.4"), encoding="utf-8")
+    restart()
+    assert rag.load_default_corpus()["design.md"] == {"added": 1, "unchanged": 2, "removed": 1}
+    assert embedded == [1]
+    assert rag._ensure_local().count() == 3
+
+
+def test_wiped_store_is_rebuilt_from_embedding_cache(local_backend):
+    tmp_path, embedded, restart = local_backend
+    rag.load_default_corpus()
+    shutil.rmtree(tmp_path / "local")
+    restart()
+    assert rag.load_default_corpus()["design.md"]["added"] == 3
+    assert embedded == []  # 埋め込みはキャッシュから
+    assert embedding_cache.stats()["hits"] == 3
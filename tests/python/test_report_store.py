@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from apps.api import config as app_config
+from apps.api.main import app
+from apps.api.services import orchestrator, plan, report_store, storage, tools
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "BASE", tmp_path / "datasets")
+    monkeypatch.setenv("AUTOEDA_REPORT_STORE_DIR", str(tmp_path / "reports"))
+    monkeypatch.setenv("AUTOEDA_LLM_CACHE_DIR", str(tmp_path / "llm_cache"))
+    monkeypatch.delenv("AUTOEDA_CREDENTIALS_FILE", raising=False)
+    storage.ensure_dirs()
+    storage.dataset_path("ds_snap").write_text("id,price\n1,10\n2,\n3,30\n", encoding="utf-8")
+    report_store.clear()
+    app_config.reset_cache()
+    yield
+    report_store.clear()
+    app_config.reset_cache()
+
+
+def _report():
+    return {"summary": {"rows": 3, "cols": 2}, "references": [{"kind": "table", "locator": "tbl:price"}]}
+
+
+def test_snapshot_roundtrip_and_version_checks():
+    report_store.save("ds_snap", _report(), {"groundedness": 1.0}, sample_ratio=0.5)
+    snap = report_store.load("ds_snap")
+    assert snap["report"]["summary"]["rows"] == 3 and snap["evaluation"] == {"groundedness": 1.0}
+    snap["report"]["summary"]["rows"] = 999  # 返り値はコピー
+    assert report_store.load("ds_snap")["report"]["summary"]["rows"] == 3
+    assert report_store.load("ds_snap", full_only=True) is None
+
+    storage.update_pii_metadata("ds_snap", masked_fields=["price"], mask_policy="MASK")
+    assert report_store.load("ds_snap") is None
+    assert not report_store._path("ds_snap").exists()
+
+
+def test_snapshot_follows_dataset_rewrites():
+    report_store.save("ds_snap", _report(), {})
+    storage.dataset_path("ds_snap").write_text("id,price\n1,10\n", encoding="utf-8")
+    assert report_store.load("ds_snap") is None
+    report_store.save("ds_missing", _report(), {})
+    assert not report_store._path("ds_missing").exists()
+
+
+def test_eda_snapshot_is_reused_downstream(monkeypatch, tmp_path):
+    monkeypatch.setattr(orchestrator.rag, "load_default_corpus", lambda: None)
+    monkeypatch.setattr(orchestrator, "_rag_seeded", True)
+    monkeypatch.setattr(orchestrator, "_retrieve_context", lambda report: [])
+    report, _ = orchestrator.generate_eda_report("ds_snap")
+    assert report_store.load("ds_snap", full_only=True) is not None
+
+    def boom(*args, **kwargs):
+        raise AssertionError("profile_api should not run when a snapshot exists")
+
+    creds = tmp_path / "credentials.json"
+    creds.write_text('{"llm": {"provider": "openai", "openai": {"api_key": "sk"}}}', encoding="utf-8")
+    monkeypatch.setenv("AUTOEDA_CREDENTIALS_FILE", str(creds))
+    app_config.reset_cache()
+    monkeypatch.setattr(tools, "profile_api", boom)
+    monkeypatch.setattr(plan.rag, "retrieve", lambda *a, **k: [])
+    provider, _, _, prompt = orchestrator._prepare_qna("ds_snap", "欠損は？")
+    assert "rows: 3" in prompt["user"]
+    assert plan.generate_plan("ds_snap")["tasks"][0]["why"].startswith("行数=3")
+    refs = tools.followup("ds_snap", "次は？")[0]["references"]
+    assert all(r in refs for r in report["references"][:3])
+
+
+def test_pii_apply_invalidates_snapshot():
+    report_store.save("ds_snap", _report(), {})
+    client = TestClient(app)
+    res = client.post("/api/pii/apply", json={"dataset_id": "ds_snap", "mask_policy": "MASK", "columns": ["price"]})
+    assert res.status_code == 200
+    assert not report_store._path("ds_snap").exists()
+    assert report_store.load("ds_snap") is None
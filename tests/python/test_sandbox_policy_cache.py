@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.getcwd())
+from apps.api.services import sandbox
+from apps.api.services.sandbox import (
+    CODE_EXEC_POLICY,
+    GENERATED_CHART_POLICY,
+    SandboxError,
+    check_policy,
+    policy_cache_stats,
+    reset_policy_cache,
+)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    reset_policy_cache()
+    yield
+    reset_policy_cache()
+
+
+def test_repeat_code_skips_ast_parse(monkeypatch):
+    code = "import math\nprint(math.pi)\n"
+    check_policy(code, CODE_EXEC_POLICY)
+
+    def _boom(*a, **k):
+        raise AssertionError("ast.parse should not run for cached code")
+
+    monkeypatch.setattr(sandbox.ast, "parse", _boom)
+    check_policy(code, CODE_EXEC_POLICY)
+    assert policy_cache_stats()["hits"] == 1
+
+
+def test_denied_verdict_and_reason_are_cached():
+    for _ in range(2):
+        with pytest.raises(SandboxError) as ei:
+            check_policy("import subprocess\n", CODE_EXEC_POLICY)
+        assert ei.value.code == "forbidden_import"
+        assert "subprocess" in str(ei.value)
+    stats = policy_cache_stats()
+    assert stats["misses"] == 1 and stats["hits"] == 1
+
+
+def test_verdict_is_scoped_per_policy():
+    # mmap は生成チャート用ポリシーのみ許可
+    check_policy("import mmap\n", GENERATED_CHART_POLICY)
+    with pytest.raises(SandboxError):
+        check_policy("import mmap\n", CODE_EXEC_POLICY)
+
+
+def test_nested_violation_found_in_single_pass():
+    code = "def f():\n    if True:\n        return [os.system('ls') for _ in range(1)]\n"
+    with pytest.raises(SandboxError) as ei:
+        check_policy(code, CODE_EXEC_POLICY)
+    assert "os.system" in str(ei.value)
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setenv("AUTOEDA_SANDBOX_POLICY_CACHE", "3")
+    for i in range(10):
+        check_policy(f"x = {i}\n", CODE_EXEC_POLICY)
+    assert policy_cache_stats()["size"] == 3
@@ -0,0 +1,88 @@
+import os
+import resource
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.getcwd())
+from apps.api.services import sandbox
+from apps.api.services.sandbox import SandboxRunner, SandboxError
+
+
+@pytest.fixture
+def pool_mode(monkeypatch):
+    monkeypatch.setenv("AUTOEDA_SANDBOX_POOL", "1")
+    monkeypatch.setenv("AUTOEDA_SANDBOX_POOL_WORKERS", "1")
+    yield
+    sandbox.shutdown_pool(kill=True)
+
+
+def test_pool_template_does_not_limit_host_process(pool_mode):
+    before = resource.getrlimit(resource.RLIMIT_AS)
+    obj = SandboxRunner(timeout_sec=30.0).run_template(spec_hint="line", dataset_id="ds_x")
+    assert obj["outputs"]
+    assert obj["meta"]["sandbox"] == "pool"
+    assert resource.getrlimit(resource.RLIMIT_AS) == before
+
+
+def test_inline_template_does_not_limit_host_process(monkeypatch):
+    monkeypatch.delenv("AUTOEDA_SANDBOX_POOL", raising=False)
+    before = resource.getrlimit(resource.RLIMIT_AS)
+    SandboxRunner(mem_limit_mb=64).run_template(spec_hint="bar", dataset_id="ds_x")
+    assert resource.getrlimit(resource.RLIMIT_AS) == before
+
+
+def test_pool_generated_chart_returns_pickled_result(pool_mode):
+    obj = SandboxRunner(timeout_sec=30.0).run_generated_chart(job_id=None, spec_hint="line", dataset_id="ds_x")
+    assert obj["outputs"][0]["type"] == "vega"
+    assert obj["meta"]["sandbox"] == "pool"
+
+
+def test_pool_generated_chart_cancel(pool_mode, monkeypatch):
+    runner = SandboxRunner(timeout_sec=30.0)
+    # warm up the worker so that cancel timing is not dominated by spawn
+    runner.run_template(spec_hint="bar", dataset_id="ds_x")
+    monkeypatch.setenv("AUTOEDA_SB_TEST_DELAY_MS", "2000")
+    flag = {"v": False}
+    t = threading.Thread(target=lambda: (time.sleep(0.05), flag.__setitem__("v", True)))
+    t.start()
+    with pytest.raises(SandboxError) as ei:
+        runner.run_generated_chart(job_id=None, spec_hint="bar", dataset_id="ds_x", cancel_check=lambda: flag["v"])
+    t.join()
+    assert ei.value.code == "cancelled"
+
+
+def test_pool_timeout_kills_only_its_own_worker(monkeypatch):
+    monkeypatch.setenv("AUTOEDA_SANDBOX_POOL", "1")
+    monkeypatch.setenv("AUTOEDA_SANDBOX_POOL_WORKERS", "2")
+    runner = SandboxRunner(timeout_sec=30.0)
+    try:
+        results = {}
+
+        def _job(name, seconds, timeout_sec):
+            try:
+                results[name] = runner._run_in_pool(time.sleep, seconds, timeout_sec=timeout_sec)
+            except Exception as exc:  # noqa: BLE001
+                results[name] = exc
+
+        slow = threading.Thread(target=_job, args=("slow", 30, 3.0))
+        ok = threading.Thread(target=_job, args=("ok", 4.0, 30.0))
+        slow.start()
+        ok.start()
+        slow.join()
+        ok.join()
+        assert isinstance(results["slow"], SandboxError) and results["slow"].code == "timeout"
+        assert results["ok"] is None
+        # 同じプールで後続ジョブも実行できる
+        obj = runner.run_generated_chart(job_id=None, spec_hint="bar", dataset_id="ds_x")
+        assert obj["meta"]["sandbox"] == "pool"
+    finally:
+        sandbox.shutdown_pool(kill=True)
+
+
+def test_pool_worker_crash_is_reported(pool_mode):
+    with pytest.raises(SandboxError) as ei:
+        SandboxRunner(timeout_sec=30.0)._run_in_pool(os._exit, 1)
+    assert ei.value.code == "worker_crashed"
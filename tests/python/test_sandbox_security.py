@@ -60,3 +60,33 @@ def test_timeout_is_enforced():
         assert False, "expected timeout"
     except SandboxError as exc:
         assert getattr(exc, 'code', None) == 'timeout'
+
+
+def test_code_exec_cannot_reach_chart_render_readers():
+    sb = SandboxRunner(timeout_sec=5.0)
+    code = (
+        "import json\n"
+        "cols = read_columns('/etc/passwd', ['root'], need=1)\n"
+        "print(json.dumps({'language':'python','library':'vega','outputs':[{'type':'text','mime':'text/plain','content':str(cols)}]}))\n"
+    )
+    try:
+        out = sb.run_code_exec(code=code, dataset_id=None, timeout_sec=5)
+        assert False, f"expected SandboxError, got {out}"
+    except SandboxError as exc:
+        assert getattr(exc, 'code', None) == 'format_error'
+        logs = str(getattr(exc, "logs", "") or "")
+        assert "read_columns" in logs and "root:" not in logs
+
+
+def test_code_exec_closure_introspection_forbidden():
+    sb = SandboxRunner()
+    for code in (
+        "f = load_dataset.__closure__[0].cell_contents\n",
+        "f = getattr(load_dataset, '__globals__')\n",
+        "f = vars()\n",
+    ):
+        try:
+            sb.run_code_exec(code=code, dataset_id=None, timeout_sec=1)
+            assert False, f"expected forbidden_import: {code}"
+        except SandboxError as exc:
+            assert getattr(exc, 'code', None) == 'forbidden_import'
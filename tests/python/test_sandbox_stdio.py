@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.getcwd())
+from apps.api.services import sandbox
+from apps.api.services.sandbox import SandboxRunner, SandboxError
+
+_RESULT = "print(json.dumps({'language': 'python', 'library': 'none', 'outputs': [{'type': 'text', 'mime': 'text/plain', 'content': 'ok'}]}))\n"
+
+
+def test_code_exec_uses_stdin_without_tempdir(monkeypatch):
+    def _no_tmp(*a, **k):
+        raise AssertionError("mkdtemp should not be called")
+
+    monkeypatch.setattr(sandbox.tempfile, "mkdtemp", _no_tmp)
+    obj = SandboxRunner(timeout_sec=10.0).run_code_exec(code="x = cfg.get('dataset_id')\n" + _RESULT, dataset_id="ds_x")
+    assert obj["outputs"][0]["content"] == "ok"
+
+
+def test_output_cap_kills_huge_prints(monkeypatch):
+    monkeypatch.setenv("AUTOEDA_SANDBOX_MAX_OUTPUT_BYTES", "4096")
+    with pytest.raises(SandboxError) as ei:
+        SandboxRunner(timeout_sec=10.0).run_code_exec(code="while True:\n    print('x' * 1000)\n", dataset_id=None)
+    assert ei.value.code == "output_limit"
+
+
+def test_debug_lines_before_result_frame_are_ignored():
+    obj = SandboxRunner(timeout_sec=10.0).run_code_exec(code="print('debug')\n" + _RESULT, dataset_id=None)
+    assert obj["outputs"][0]["content"] == "ok"
+
+
+def test_result_larger_than_pipe_buffer_is_streamed():
+    # 64KiB のパイプバッファを超える結果でも子プロセスが詰まらず完了する
+    code = "print(json.dumps({'language': 'python', 'library': 'none', 'outputs': [{'type': 'text', 'mime': 'text/plain', 'content': 'y' * 500000}]}))\n"
+    obj = SandboxRunner(timeout_sec=10.0).run_code_exec(code=code, dataset_id=None)
+    assert len(obj["outputs"][0]["content"]) == 500000
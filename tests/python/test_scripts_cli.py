@@ -2,6 +2,8 @@ import json
 import os
 from pathlib import Path
 
+import pytest
+
 from apps.api.scripts import check_rag, check_slo
 
 
@@ -44,3 +46,63 @@ def test_check_slo_main_outputs_file(monkeypatch, tmp_path):
     assert exit_code == 0
     payload = json.loads(output.read_text(encoding="utf-8"))
     assert payload["violations"]["EDAReportGenerated"]["p95_exceeded"] is False
+
+
+def test_check_slo_gates_on_stage_budgets(monkeypatch, tmp_path):
+    events = tmp_path / "events.jsonl"
+    timing = {"name": "eda", "ms": 900, "children": [
+        {"name": "profile", "ms": 300, "children": [{"name": "profile.read_csv", "ms": 250}]},
+        {"name": "llm.invoke_agent", "ms": 600},
+    ]}
+    events.write_text(json.dumps({
+        "event_name": "EDAReportGenerated",
+        "duration_ms": 900,
+        "groundedness": 0.95,
+        "timing": timing,
+    }) + "\n", encoding="utf-8")
+    output = tmp_path / "slo.json"
+    monkeypatch.setenv(check_slo.OUTPUT_ENV, str(output))
+    monkeypatch.delenv(check_slo.STAGE_BUDGETS_ENV, raising=False)
+
+    assert check_slo.main([str(events)]) == 0
+    stages = json.loads(output.read_text(encoding="utf-8"))["stage_violations"]["EDAReportGenerated"]
+    assert stages["profile.read_csv"]["p95"] == pytest.approx(250, rel=0.02)
+    assert stages["profile.read_csv"]["exceeded"] is False
+
+    monkeypatch.setenv(check_slo.STAGE_BUDGETS_ENV, json.dumps({"EDAReportGenerated": {"llm.invoke_agent": 100}}))
+    assert check_slo.main([str(events)]) == 1
+    stages = json.loads(output.read_text(encoding="utf-8"))["stage_violations"]["EDAReportGenerated"]
+    assert stages["llm.invoke_agent"]["exceeded"] is True
+
+
+def test_check_rag_reports_recall_mrr_and_latency(monkeypatch):
+    monkeypatch.setenv("AUTOEDA_RAG_BACKEND", "bm25")
+    monkeypatch.setattr(check_rag.rag, "_in_memory_store", [])
+    check_rag.rag.ingest([
+        {"id": "r", "text": "引用被覆率 0.8 を満たす", "metadata": {"source": "requirements.md"}},
+        {"id": "d1", "text": "整合性 の 説明", "metadata": {"source": "design.md"}},
+        {"id": "d2", "text": "チャート 整合性 0.95", "metadata": {"source": "charts.md"}},
+    ])
+    report = check_rag.evaluate([
+        {"id": "coverage", "query": "引用被覆率", "expects": ["requirements.md"]},
+        {"id": "charts", "query": "チャート 整合性 0.95", "expects": ["design.md"]},
+        {"id": "absent", "query": "存在しない", "expects": ["docs.md"]},
+    ], top_k=3, workers=3)
+    assert report["missing"] == ["absent"]
+    metrics = report["metrics"]
+    assert metrics["per_query"]["charts"]["rank"] == 2
+    assert metrics["mrr"] == round((1 + 0.5) / 3, 4)
+    assert metrics["recall@3"] == round(2 / 3, 4)
+    assert metrics["latency_ms"]["count"] == 3 and metrics["latency_ms"]["p95"] >= metrics["latency_ms"]["p50"]
+
+
+def test_check_rag_bench_mode(monkeypatch, tmp_path):
+    output = tmp_path / "bench.json"
+    monkeypatch.setenv(check_rag.OUTPUT_ENV, str(output))
+    store = check_rag.rag._in_memory_store
+    assert check_rag.main(["--bench", "--bench-docs", "300", "--bench-queries", "20", "--backends", "bm25,local"]) == 0
+    results = {row["backend"]: row for row in json.loads(output.read_text(encoding="utf-8"))["backends"]}
+    assert results["bm25"]["self_hit@5"] == 1.0 and results["bm25"]["qps"] > 0
+    assert "build_sec" in results["bm25"] and results["bm25"]["latency_ms"]["count"] == 20
+    assert "local" in results
+    assert check_rag.rag._in_memory_store is store and os.environ.get("AUTOEDA_RAG_BACKEND") is None
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from apps.api.services import orchestrator, singleflight
+
+
+def _run_together(n, fn):
+    barrier = threading.Barrier(n)
+
+    def task(i):
+        barrier.wait()
+        if i:
+            time.sleep(0.02)  # 先頭の呼び出しが確実にリーダーになるように
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return [f.result() for f in [pool.submit(task, i) for i in range(n)]]
+
+
+def test_identical_calls_share_one_execution():
+    group = singleflight.Group("t.share")
+    runs = []
+
+    def work():
+        runs.append(1)
+        time.sleep(0.2)
+        return {"rows": [1, 2, 3]}
+
+    results = _run_together(5, lambda: group.do(("ds", None), work))
+    assert len(runs) == 1
+    assert all(r == {"rows": [1, 2, 3]} for r in results)
+    assert len({id(r) for r in results}) == 5  # 後続にはコピーを渡す
+    stats = group.stats()
+    assert (stats["calls"], stats["coalesced"], stats["in_flight"]) == (5, 4, 0)
+    assert stats["coalesce_ratio"] == 0.8
+
+
+def test_followers_receive_leader_error():
+    group = singleflight.Group("t.error")
+
+    def work():
+        time.sleep(0.1)
+        raise ValueError("bad csv")
+
+    def call():
+        try:
+            group.do("k", work)
+        except ValueError as exc:
+            return str(exc)
+
+    assert _run_together(3, call) == ["bad csv"] * 3
+
+
+def test_wait_is_bounded(monkeypatch):
+    monkeypatch.setenv("AUTOEDA_SINGLEFLIGHT_WAIT_SEC", "0.05")
+    group = singleflight.Group("t.bounded")
+    runs = []
+
+    def work():
+        runs.append(1)
+        n = len(runs)
+        time.sleep(0.3 if n == 1 else 0)
+        return n
+
+    results = _run_together(2, lambda: group.do("k", work))
+    assert len(runs) == 2 and sorted(results) == [1, 2]
+    assert group.stats()["timeouts"] == 1
+
+
+def test_concurrent_eda_requests_profile_once(monkeypatch, tmp_path):
+    monkeypatch.delenv("AUTOEDA_CREDENTIALS_FILE", raising=False)
+    monkeypatch.setenv("AUTOEDA_REPORT_SNAPSHOTS", "0")
+    monkeypatch.setattr(orchestrator.rag, "load_default_corpus", lambda: None)
+    monkeypatch.setattr(orchestrator, "_rag_seeded", True)
+    monkeypatch.setattr(orchestrator, "_retrieve_context", lambda report: [])
+    monkeypatch.setattr(orchestrator.tools, "pii_scan", lambda *a, **k: None)
+    monkeypatch.setattr(orchestrator.tools, "leakage_scan", lambda *a, **k: None)
+    monkeypatch.setattr(orchestrator.tools, "prefetch_dataset", lambda *a, **k: None)
+    calls = []
+
+    def profile(dataset_id, sample_ratio=None):
+        calls.append(dataset_id)
+        time.sleep(0.2)
+        return {"summary": {"rows": 1, "cols": 1}, "data_quality_report": {"issues": []}}
+
+    monkeypatch.setattr(orchestrator.tools, "profile_api", profile)
+    before = singleflight.group("eda").stats()["coalesced"]
+    results = _run_together(4, lambda: orchestrator.generate_eda_report("ds_sf"))
+    assert calls == ["ds_sf"]
+    assert len({id(r[0]) for r in results}) == 4
+    assert singleflight.group("eda").stats()["coalesced"] - before == 3
+
+
+def test_disabled_runs_every_call(monkeypatch):
+    monkeypatch.setenv("AUTOEDA_SINGLEFLIGHT", "0")
+    runs = []
+
+    @singleflight.coalesce("t.disabled", lambda x: x)
+    def work(x):
+        runs.append(x)
+        time.sleep(0.05)
+        return x
+
+    _run_together(3, lambda: work(1))
+    assert len(runs) == 3